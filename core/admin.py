@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Profissional, Cliente
+from .models import User, Profissional, Cliente, HorarioDisponivel, ExcecaoDisponibilidade, Agendamento
+from .search import buscar_profissionais, buscar_usuarios
+from .validators import normalizar_cpf
 
 
 @admin.register(User)
@@ -11,7 +13,9 @@ class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'nome', 'sobrenome', 'tipo_usuario', 
                    'cpf', 'is_active', 'criado_em')
     list_filter = ('tipo_usuario', 'sexo', 'is_active', 'is_staff', 'criado_em')
-    search_fields = ('username', 'email', 'nome', 'sobrenome', 'cpf')
+    # Exibe a caixa de busca; a consulta é feita por get_search_results
+    search_fields = ('busca', 'cpf')
+    search_help_text = 'Nome, sobrenome, username ou email (palavras ou seu início), ou CPF.'
     ordering = ('nome', 'sobrenome')
     
     fieldsets = (
@@ -33,6 +37,39 @@ class CustomUserAdmin(UserAdmin):
                       'tipo_usuario', 'sexo', 'cpf', 'data_nascimento', 'telefone', 'endereco'),
         }),
     )
+    
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Busca pelos índices: documento de busca normalizado (nome,
+        sobrenome, username e email, sem acentos nem maiúsculas) ou CPF
+        completo, com ou sem pontuação, em vez de icontains em cada coluna
+        """
+        termo = search_term.strip()
+        if not termo:
+            return queryset, False
+        resultado = buscar_usuarios(queryset, termo)
+        cpf = normalizar_cpf(termo)
+        if cpf:
+            resultado |= queryset.filter(cpf=cpf)
+        return resultado, False
+
+
+class HorarioDisponivelInline(admin.TabularInline):
+    """
+    Horários semanais do profissional
+    """
+    model = HorarioDisponivel
+    extra = 0
+    fields = ('dia_semana', 'inicio', 'fim')
+
+
+class ExcecaoDisponibilidadeInline(admin.TabularInline):
+    """
+    Bloqueios e horários extras do profissional
+    """
+    model = ExcecaoDisponibilidade
+    extra = 0
+    fields = ('inicio', 'fim', 'disponivel', 'motivo')
 
 
 @admin.register(Profissional)
@@ -46,6 +83,7 @@ class ProfissionalAdmin(admin.ModelAdmin):
     search_fields = ('usuario__nome', 'usuario__sobrenome', 'registro_profissional', 
                     'especialidade', 'clinica')
     ordering = ('usuario__nome', 'usuario__sobrenome')
+    inlines = [HorarioDisponivelInline, ExcecaoDisponibilidadeInline]
     
     fieldsets = (
         ('Usuário', {
@@ -64,6 +102,11 @@ class ProfissionalAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('usuario')
+    
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return buscar_profissionais(queryset, search_term), False
 
 
 @admin.register(Cliente)
@@ -93,3 +136,20 @@ class ClienteAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('usuario')
+
+
+@admin.register(Agendamento)
+class AgendamentoAdmin(admin.ModelAdmin):
+    """
+    Admin para o modelo Agendamento
+    """
+    list_display = ('inicio', 'fim', 'profissional', 'cliente', 'status')
+    list_filter = ('status',)
+    search_fields = ('profissional__usuario__nome', 'profissional__usuario__sobrenome',
+                    'cliente__usuario__nome', 'cliente__usuario__sobrenome')
+    ordering = ('-inicio',)
+    date_hierarchy = 'inicio'
+    raw_id_fields = ('profissional', 'cliente')
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('profissional__usuario', 'cliente__usuario')
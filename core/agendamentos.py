@@ -0,0 +1,95 @@
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_date
+from rest_framework import serializers
+
+from .disponibilidade import agendamentos_sobrepostos, fuso_agenda
+from .models import Agendamento
+
+
+# Restrições criadas pela migração 0008: sobreposição de agendamentos do
+# mesmo profissional e duração máxima, verificadas pelo próprio banco
+RESTRICAO_CONFLITO = 'core_agendamento_sem_conflito'
+RESTRICAO_DURACAO = 'core_agendamento_duracao_maxima'
+
+_HORAS_MAXIMAS = int(Agendamento.DURACAO_MAXIMA.total_seconds() // 3600)
+
+
+class ConflitoAgenda(Exception):
+    """
+    O profissional já tem um agendamento que se sobrepõe ao horário
+    """
+    mensagem = 'O profissional já tem um agendamento neste horário.'
+
+
+def validar_intervalo(inicio, fim):
+    """
+    Erros de validação de um intervalo de agendamento
+    """
+    if fim <= inicio:
+        raise serializers.ValidationError({'fim': ['O fim deve ser posterior ao início.']})
+    if fim - inicio > Agendamento.DURACAO_MAXIMA:
+        raise serializers.ValidationError(
+            {'fim': [f'O agendamento deve ter no máximo {_HORAS_MAXIMAS} horas.']}
+        )
+
+
+def gravar(agendamento, **kwargs):
+    """
+    Salva o agendamento; a sobreposição é verificada pelo próprio banco,
+    na mesma escrita, e chega como ConflitoAgenda
+    """
+    try:
+        with transaction.atomic():
+            agendamento.save(**kwargs)
+    except IntegrityError as exc:
+        if RESTRICAO_CONFLITO in str(exc):
+            raise ConflitoAgenda(ConflitoAgenda.mensagem) from exc
+        raise
+    return agendamento
+
+
+def remarcar(agendamento, inicio, fim):
+    anterior = agendamento.inicio, agendamento.fim
+    agendamento.inicio, agendamento.fim = inicio, fim
+    try:
+        return gravar(agendamento, update_fields=['inicio', 'fim', 'atualizado_em'])
+    except ConflitoAgenda:
+        agendamento.inicio, agendamento.fim = anterior
+        raise
+
+
+def cancelar(agendamento):
+    agendamento.status = 'cancelado'
+    return gravar(agendamento, update_fields=['status', 'atualizado_em'])
+
+
+def janela_da_agenda(params):
+    """
+    (início, fim) do dia ou da semana (segunda a domingo) de `?data=`, no
+    AGENDA_TIME_ZONE; `?periodo=dia|semana`, padrão dia
+    """
+    try:
+        data = parse_date(params.get('data') or '')
+    except ValueError:
+        data = None
+    if data is None:
+        raise serializers.ValidationError({'data': ['Informe a data no formato AAAA-MM-DD.']})
+    periodo = params.get('periodo') or 'dia'
+    if periodo not in ('dia', 'semana'):
+        raise serializers.ValidationError({'periodo': ['Use "dia" ou "semana".']})
+    if periodo == 'semana':
+        data -= timedelta(days=data.weekday())
+    fuso = fuso_agenda()
+    inicio = datetime.combine(data, time(), tzinfo=fuso)
+    fim = datetime.combine(data + timedelta(days=1 if periodo == 'dia' else 7), time(), tzinfo=fuso)
+    return inicio, fim
+
+
+def agenda(profissional_id, inicio, fim, using=None):
+    """
+    Agendamentos do profissional no intervalo, em uma consulta
+    """
+    queryset = Agendamento.objects.using(using).filter(profissional_id=profissional_id)
+    return agendamentos_sobrepostos(queryset, inicio, fim).order_by('inicio')
@@ -0,0 +1,222 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import alogin
+from django.contrib.auth.signals import user_logged_in
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import exceptions, status
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .authentication import CachedTokenAuthentication, aautenticar
+from .conditional import aplicar_validadores, avalidador_lista, gerar_etag, nao_modificado, ultima_alteracao
+from .hashing import ahash_password, averificar_senha
+from .models import User
+from .pagination import KnownCountPaginator
+from .routers import leitura_em_replica
+from .serializers import CredenciaisSerializer, UserCreateSerializer, UserSerializer
+from .tokens import emitir_token, tokens_assinados
+from .views import registrar
+
+
+def resposta_json(dados, status=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(dados), status=status, content_type='application/json')
+
+
+def api_assincrona(view):
+    """
+    Decorador das views assíncronas: entrega à view um Request do DRF (para
+    `data` e `query_params`) e converte as exceções da API em respostas
+    JSON, como o exception handler do DRF
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        requisicao = Request(
+            request,
+            parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+            authenticators=(),
+        )
+        try:
+            return await view(requisicao, *args, **kwargs)
+        except exceptions.APIException as exc:
+            dados = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = resposta_json(dados, status=exc.status_code)
+            if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                response['WWW-Authenticate'] = CachedTokenAuthentication.keyword
+            return response
+    return wrapper
+
+
+async def autenticar(request):
+    """
+    Autentica a requisição pelo token (sem sessão) e preenche
+    `request.user`/`request.auth`
+    """
+    resultado = await aautenticar(request)
+    if resultado is None:
+        raise exceptions.NotAuthenticated()
+    request.user, request.auth = resultado
+
+
+async def atoken_de_acesso(user):
+    """
+    `views.token_de_acesso` com o ORM assíncrono
+    """
+    if tokens_assinados():
+        return emitir_token(user)
+    token, created = await Token.objects.aget_or_create(user=user)
+    return token.key
+
+
+@csrf_exempt
+@require_POST
+@api_assincrona
+async def login_user(request):
+    """
+    Login de usuários (ASGI). A verificação da senha roda no pool de hashing,
+    sem ocupar o event loop
+    """
+    serializer = CredenciaisSerializer(data=request.data)
+    if not serializer.is_valid():
+        return resposta_json(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    username = serializer.validated_data['username']
+    password = serializer.validated_data['password']
+
+    user = await User.objects.filter(**{User.USERNAME_FIELD: username}).afirst()
+    if user is None:
+        # Mesmo custo de um usuário existente, como o ModelBackend
+        await ahash_password(password)
+        correta = atualizar = False
+    else:
+        correta, atualizar = await averificar_senha(password, user.password)
+    if not correta or not user.is_active:
+        return resposta_json(
+            {'non_field_errors': ['Credenciais inválidas.']}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if atualizar:
+        # Hasher ou iterações mudaram: grava o hash novo, como check_password()
+        user.password = await ahash_password(password)
+        await user.asave(update_fields=['password'])
+
+    if getattr(settings, 'AUTH_TOKEN_ONLY', True):
+        await user_logged_in.asend(sender=user.__class__, request=request, user=user)
+    else:
+        await alogin(request._request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
+    return resposta_json({
+        'user': UserSerializer(user).data,
+        'token': await atoken_de_acesso(user),
+    })
+
+
+@csrf_exempt
+@require_POST
+@api_assincrona
+async def register_user(request):
+    """
+    Registro de usuários (ASGI), com o hash da senha calculado no pool de
+    hashing antes da gravação
+    """
+    serializer = UserCreateSerializer(data=request.data)
+    if not await sync_to_async(serializer.is_valid)():
+        return resposta_json(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    senha_hash = await ahash_password(serializer.validated_data['password'])
+    user, token = await sync_to_async(registrar)(serializer, senha_hash=senha_hash)
+    return resposta_json({
+        'user': UserSerializer(user).data,
+        'token': token,
+    }, status=status.HTTP_201_CREATED)
+
+
+@require_GET
+@api_assincrona
+async def user_profile(request):
+    """
+    Perfil do usuário logado (ASGI)
+    """
+    await autenticar(request)
+    ultima = request.user.atualizado_em
+    etag = gerar_etag(request, ultima)
+    response = nao_modificado(request, etag, ultima)
+    if response is not None:
+        return response
+    return aplicar_validadores(resposta_json(UserSerializer(request.user).data), etag, ultima)
+
+
+def leitura_assincrona(viewset_class, action):
+    """
+    View assíncrona para a action `list` ou `retrieve` de uma ViewSet do
+    diretório. Reaproveita da ViewSet permissões, queryset, filtros,
+    `?fields=`/`?exclude=`, paginação e serializers, com as consultas no ORM
+    assíncrono e ETag como no ConditionalGetMixin.
+
+    A paginação por cursor e a contagem estimada são delegadas à ViewSet
+    síncrona; o cache de respostas do diretório não é usado aqui.
+    """
+    sincrona = viewset_class.as_view({'get': action})
+
+    @require_GET
+    @api_assincrona
+    async def view(request, pk=None):
+        await autenticar(request)
+        viewset = viewset_class(action_map={'get': action}, action=action)
+        viewset.request, viewset.args, viewset.format_kwarg = request, (), None
+        viewset.kwargs = {} if pk is None else {viewset.lookup_field: pk}
+        viewset.headers = {}
+        viewset.check_permissions(request)
+
+        paginator = viewset.paginator
+        if action == 'list' and {
+            getattr(paginator, 'cursor_query_param', None), getattr(paginator, 'count_query_param', None)
+        } & set(request.query_params):
+            return await sync_to_async(sincrona)(request._request)
+
+        with leitura_em_replica(request.user):
+            queryset = viewset.filter_queryset(viewset.get_queryset())
+            if action == 'list':
+                return await listar(request, viewset, queryset)
+            return await detalhar(request, viewset, queryset, pk)
+
+    view.__name__ = f'{viewset_class.__name__}_{action}'
+    return view
+
+
+async def listar(request, viewset, queryset):
+    paginator = viewset.paginator
+    ultima, total = await avalidador_lista(queryset, viewset.validator_fields)
+    etag = gerar_etag(request, ultima, total)
+    response = nao_modificado(request, etag)
+    if response is not None:
+        return response
+
+    # A contagem do validador substitui o COUNT(*) da paginação
+    paginador = KnownCountPaginator(queryset, paginator.get_page_size(request), count=total)
+    numero = paginator.get_page_number(request, paginador)
+    try:
+        page = paginador.page(numero)
+    except InvalidPage as exc:
+        raise exceptions.NotFound(paginator.invalid_page_message.format(page_number=numero, message=str(exc)))
+    page.object_list = [obj async for obj in page.object_list]
+    paginator.page, paginator.request = page, request
+
+    dados = viewset.get_serializer(page.object_list, many=True).data
+    return aplicar_validadores(resposta_json(paginator.get_paginated_response(dados).data), etag, ultima)
+
+
+async def detalhar(request, viewset, queryset, pk):
+    instance = await queryset.filter(pk=pk).afirst()
+    if instance is None:
+        raise exceptions.NotFound()
+    viewset.check_object_permissions(request, instance)
+
+    ultima = ultima_alteracao(instance, viewset.validator_fields)
+    etag = gerar_etag(request, ultima)
+    response = nao_modificado(request, etag, ultima)
+    if response is not None:
+        return response
+    return aplicar_validadores(resposta_json(viewset.get_serializer(instance).data), etag, ultima)
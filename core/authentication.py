@@ -0,0 +1,144 @@
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db.models import F
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from .metrics import registro
+from .tokens import eh_token_assinado, verificar_token
+
+
+def get_token_cache():
+    return caches[getattr(settings, 'AUTH_TOKEN_CACHE_ALIAS', 'default')]
+
+
+def _token_cache_key(key):
+    return 'auth:token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _usuario_cache_key(user_id):
+    return f'auth:usuario:{user_id}'
+
+
+def invalidar_token(key):
+    """
+    Remove do cache a resolução token→usuário de uma chave
+    """
+    get_token_cache().delete(_token_cache_key(key))
+
+
+def invalidar_usuario(user_id):
+    """
+    Remove do cache os tokens resolvidos para o usuário
+    """
+    cache = get_token_cache()
+    chaves = [_usuario_cache_key(user_id)]
+    cache_key = cache.get(_user_cache_key(user_id))
+    if cache_key:
+        chaves += [cache_key, _user_cache_key(user_id)]
+    cache.delete_many(chaves)
+
+
+def revogar_tokens(user):
+    """
+    Invalida todos os tokens assinados já emitidos para o usuário
+    """
+    type(user).objects.filter(pk=user.pk).update(versao_token=F('versao_token') + 1)
+    invalidar_usuario(user.pk)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication com cache da resolução token→usuário.
+
+    O cache usado é o alias `AUTH_TOKEN_CACHE_ALIAS` (LRU limitado por
+    MAX_ENTRIES, com TTL em TIMEOUT). Entradas são invalidadas ao salvar
+    ou excluir o usuário, ao excluir o token e no logout.
+
+    Tokens assinados (core.tokens) são verificados sem consulta: a
+    assinatura e a expiração vêm no próprio token e a versão é comparada
+    com a do usuário em cache.
+    """
+
+    def authenticate_credentials(self, key):
+        if eh_token_assinado(key):
+            return self.autenticar_assinado(key)
+        cache = get_token_cache()
+        cache_key = _token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            user, token = cached
+            if user.is_active:
+                registro.incrementar('auth_token_cache_total', result='hit')
+                return user, token
+
+        registro.incrementar('auth_token_cache_total', result='miss')
+        user, token = super().authenticate_credentials(key)
+        cache.set_many({
+            cache_key: (user, token),
+            _user_cache_key(user.pk): cache_key,
+        })
+        return user, token
+
+    def autenticar_assinado(self, key):
+        user_id, versao = verificar_token(key)
+        cache = get_token_cache()
+        user = cache.get(_usuario_cache_key(user_id))
+        if user is None:
+            registro.incrementar('auth_token_cache_total', result='miss')
+            user = get_user_model().objects.filter(pk=user_id).first()
+            if user is None:
+                raise exceptions.AuthenticationFailed('Token inválido.')
+            cache.set(_usuario_cache_key(user_id), user)
+        else:
+            registro.incrementar('auth_token_cache_total', result='hit')
+        return _conferir_versao(user, versao), key
+
+
+def _conferir_versao(user, versao):
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed('Usuário inativo ou excluído.')
+    if user.versao_token != versao:
+        raise exceptions.AuthenticationFailed('Token revogado.')
+    return user
+
+
+async def aautenticar(request):
+    """
+    Autenticação por token das views assíncronas: (user, token), None sem
+    credenciais ou AuthenticationFailed. Tokens assinados usam o ORM
+    assíncrono; tokens do DRF, a CachedTokenAuthentication em uma thread
+    """
+    partes = get_authorization_header(request).split()
+    if not partes or partes[0].lower() != CachedTokenAuthentication.keyword.lower().encode():
+        return None
+    if len(partes) != 2:
+        raise exceptions.AuthenticationFailed('Cabeçalho de token inválido.')
+    try:
+        key = partes[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed('Cabeçalho de token inválido.')
+
+    if not eh_token_assinado(key):
+        return await sync_to_async(CachedTokenAuthentication().authenticate_credentials)(key)
+
+    user_id, versao = verificar_token(key)
+    cache = get_token_cache()
+    user = await cache.aget(_usuario_cache_key(user_id))
+    if user is None:
+        registro.incrementar('auth_token_cache_total', result='miss')
+        user = await get_user_model().objects.filter(pk=user_id).afirst()
+        if user is None:
+            raise exceptions.AuthenticationFailed('Token inválido.')
+        await cache.aset(_usuario_cache_key(user_id), user)
+    else:
+        registro.incrementar('auth_token_cache_total', result='hit')
+    return _conferir_versao(user, versao), key
@@ -0,0 +1,608 @@
+import importlib.util
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.backends.signals import connection_created
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .cleanup import excluir_sem_sinais
+from .directory_cache import invalidar_diretorio
+from .disponibilidade import novos_horarios
+from .models import User, Profissional, Cliente, HorarioDisponivel
+from .search import documento_profissional, documento_usuario
+from .stats import reconstruir_estatisticas
+from .validators import digitos_verificadores_cpf, formatar_cpf
+
+
+PREFIXO = 'bench'
+SENHA = 'bench-senha-123'
+
+NOMES_F = [
+    'Maria', 'Ana', 'Francisca', 'Antônia', 'Adriana', 'Juliana', 'Márcia', 'Fernanda',
+    'Patrícia', 'Aline', 'Sandra', 'Camila', 'Amanda', 'Bruna', 'Jéssica', 'Letícia',
+    'Júlia', 'Luciana', 'Vanessa', 'Mariana', 'Gabriela', 'Beatriz', 'Larissa', 'Renata',
+]
+NOMES_M = [
+    'José', 'João', 'Antônio', 'Francisco', 'Carlos', 'Paulo', 'Pedro', 'Lucas',
+    'Luiz', 'Marcos', 'Luís', 'Gabriel', 'Rafael', 'Daniel', 'Marcelo', 'Bruno',
+    'Eduardo', 'Felipe', 'Raimundo', 'Rodrigo', 'Gustavo', 'Thiago', 'Mateus', 'Vinícius',
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+    'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes',
+    'Soares', 'Fernandes', 'Vieira', 'Barbosa', 'Rocha', 'Dias', 'Nascimento', 'Andrade',
+    'Moreira', 'Nunes', 'Marques', 'Machado', 'Mendes', 'Freitas', 'Cardoso', 'Ramos',
+    'Gonçalves', 'Santana', 'Teixeira', 'Araújo', 'Conceição', 'Pinto', 'Cavalcanti', 'Moura',
+]
+CIDADES = [
+    'São Paulo', 'Rio de Janeiro', 'Belo Horizonte', 'Salvador', 'Fortaleza', 'Curitiba',
+    'Recife', 'Porto Alegre', 'Goiânia', 'Belém', 'Campinas', 'Florianópolis',
+]
+# (especialidade, peso)
+ESPECIALIDADES = [
+    ('Ortopedia', 30), ('Esportiva', 15), ('Neurologia', 12), ('Geriatria', 10),
+    ('Respiratória', 8), ('Pediatria', 8), ('Dermatofuncional', 5),
+    ('Uroginecologia', 5), ('Cardiovascular', 4), ('Reumatologia', 3),
+]
+FORMACOES = [
+    'Fisioterapia - USP', 'Fisioterapia - UFMG', 'Fisioterapia - UFRJ', 'Fisioterapia - UNIFESP',
+    'Fisioterapia - PUC', 'Fisioterapia - UFPE', 'Fisioterapia - UFRGS',
+]
+HORARIOS = [
+    'Seg a Sex, 8h às 18h', 'Seg a Sex, 7h às 12h', 'Seg, Qua e Sex, 13h às 20h',
+    'Ter e Qui, 8h às 17h', 'Seg a Sáb, 8h às 14h',
+]
+CLINICAS_ADJETIVOS = ['Movimento', 'Vida', 'Equilíbrio', 'Reabilitar', 'Corpo', 'Saúde', 'Integral']
+HISTORICOS = [
+    '', '', 'Cirurgia no joelho', 'Lombalgia crônica', 'AVC em 2019', 'Fratura de fêmur',
+    'Tendinite no ombro', 'Hérnia de disco',
+]
+
+# Multiplicador coprimo com 10^9: índices distintos geram CPFs distintos
+_MULTIPLICADOR_CPF = 7919
+# Os últimos índices são reservados para substituir as bases com todos os
+# dígitos iguais (000000000, 111111111, ...), que não formam CPFs válidos
+INDICE_MAXIMO_CPF = 10 ** 9 - 10
+
+
+def cpf_bench(indice):
+    """
+    CPF válido e único por índice (0 <= indice < INDICE_MAXIMO_CPF)
+    """
+    base = f'{indice * _MULTIPLICADOR_CPF % 10 ** 9:09d}'
+    if base == base[0] * 9:
+        base = f'{(10 ** 9 - 1 - int(base[0])) * _MULTIPLICADOR_CPF % 10 ** 9:09d}'
+    return formatar_cpf(base + digitos_verificadores_cpf(base))
+
+
+class GeradorDados:
+    """
+    Gera um conjunto de dados sintético e determinístico (mesma semente,
+    mesmos dados) com bulk_create em lotes.
+
+    Todos os usuários compartilham a senha `SENHA`, com hash calculado uma
+    única vez; `bench_admin` é o administrador usado nas rotas restritas.
+    """
+
+    def __init__(self, usuarios, semente=42, proporcao_profissionais=0.2, lote=5000, stdout=None):
+        self.usuarios = usuarios
+        self.semente = semente
+        self.proporcao_profissionais = proporcao_profissionais
+        self.lote = lote
+        self.stdout = stdout
+        self.rng = random.Random(semente)
+        total_profissionais = max(1, int(usuarios * proporcao_profissionais))
+        self.clinicas = [
+            f'Clínica {self.rng.choice(CLINICAS_ADJETIVOS)} {self.rng.choice(SOBRENOMES)} {i}'
+            for i in range(max(1, total_profissionais // 20))
+        ]
+        # Distribuição de Zipf: poucas clínicas concentram muitos profissionais
+        self.pesos_clinicas = [1 / (posicao + 1) for posicao in range(len(self.clinicas))]
+        self.senha = make_password(SENHA)
+
+    def limpar(self):
+        """
+        Remove os dados do benchmark sem carregá-los nem disparar sinais
+        """
+        self.apagar()
+        reconstruir_estatisticas()
+        invalidar_diretorio('profissionais')
+
+    def apagar(self):
+        excluir_sem_sinais(User.objects.filter(username__startswith=PREFIXO), self.lote)
+
+    def run(self):
+        self.apagar()
+        User.objects.create_user(
+            username=f'{PREFIXO}_admin', email=f'{PREFIXO}_admin@example.com', password=SENHA,
+            nome='Admin', sobrenome='Bench', tipo_usuario='cliente', sexo='O',
+            cpf=cpf_bench(INDICE_MAXIMO_CPF - 1), is_staff=True,
+        )
+        for inicio in range(0, self.usuarios, self.lote):
+            indices = range(inicio, min(inicio + self.lote, self.usuarios))
+            self.gravar_lote(indices)
+            if self.stdout:
+                self.stdout.write(f'{indices[-1] + 1}/{self.usuarios} usuários gerados')
+        reconstruir_estatisticas()
+        invalidar_diretorio('profissionais')
+
+    def gravar_lote(self, indices):
+        usuarios = [self.novo_usuario(indice) for indice in indices]
+        with transaction.atomic():
+            User.objects.bulk_create(usuarios)
+            profissionais = [
+                self.novo_profissional(usuario) for usuario in usuarios
+                if usuario.tipo_usuario == 'profissional'
+            ]
+            clientes = [
+                self.novo_cliente(usuario) for usuario in usuarios
+                if usuario.tipo_usuario == 'cliente'
+            ]
+            Profissional.objects.bulk_create(profissionais)
+            HorarioDisponivel.objects.bulk_create([
+                horario for profissional in profissionais
+                for horario in novos_horarios(HorarioDisponivel, profissional.pk, profissional.horario_atendimento)
+            ])
+            Cliente.objects.bulk_create(clientes)
+
+    def novo_usuario(self, indice):
+        rng = self.rng
+        sexo = rng.choices('FMO', weights=[55, 43, 2])[0]
+        nome = rng.choice(NOMES_M if sexo == 'M' else NOMES_F)
+        sobrenome = f'{rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}'
+        tipo = 'profissional' if rng.random() < self.proporcao_profissionais else 'cliente'
+        usuario = User(
+            username=f'{PREFIXO}{indice}', email=f'{PREFIXO}{indice}@example.com',
+            password=self.senha, nome=nome, sobrenome=sobrenome, tipo_usuario=tipo,
+            sexo=sexo, cpf=cpf_bench(indice),
+            data_nascimento=date(1940, 1, 1) + timedelta(days=rng.randrange(25000)),
+            telefone=f'119{rng.randrange(10 ** 8):08d}',
+            endereco=f'Rua {rng.choice(SOBRENOMES)}, {rng.randrange(1, 3000)} - {rng.choice(CIDADES)}',
+        )
+        usuario.busca = documento_usuario(usuario)
+        return usuario
+
+    def novo_profissional(self, usuario):
+        rng = self.rng
+        profissional = Profissional(
+            usuario=usuario,
+            registro_profissional=f'CREFITO-{usuario.username[len(PREFIXO):]}',
+            especialidade=rng.choices(
+                [nome for nome, _ in ESPECIALIDADES], weights=[peso for _, peso in ESPECIALIDADES]
+            )[0],
+            formacao=rng.choice(FORMACOES),
+            experiencia_anos=rng.randrange(41),
+            clinica=rng.choices(self.clinicas, weights=self.pesos_clinicas)[0],
+            horario_atendimento=rng.choice(HORARIOS),
+        )
+        profissional.busca = documento_profissional(profissional)
+        return profissional
+
+    def novo_cliente(self, usuario):
+        return Cliente(usuario=usuario, historico_medico=self.rng.choice(HISTORICOS))
+
+
+def percentil(quantis, p):
+    return quantis[p - 1] if quantis else None
+
+
+class Rota:
+    """
+    Cenário de requisição: `preparar(contexto, i)` devolve (método, url, corpo)
+    """
+
+    def __init__(self, nome, preparar, autenticacao='usuario'):
+        self.nome = nome
+        self.preparar = preparar
+        self.autenticacao = autenticacao
+
+
+def _pagina(contexto, i):
+    return contexto['rng'].randrange(1, contexto['paginas_profissionais'] + 1)
+
+
+def _disponiveis(contexto, i):
+    # Uma hora entre 7h e 20h de um dia da semana de referência
+    inicio = datetime(2026, 10, 19, 7) + timedelta(
+        days=contexto['rng'].randrange(7), hours=contexto['rng'].randrange(13)
+    )
+    fim = inicio + timedelta(hours=1)
+    return ('get', reverse('core:profissional-disponiveis')
+            + f'?inicio={inicio:%Y-%m-%dT%H:%M}&fim={fim:%Y-%m-%dT%H:%M}', None)
+
+
+def _registro(contexto, i):
+    indice = contexto['proximo_registro'] + i
+    return ('post', reverse('core:register_user'), {
+        'username': f'{PREFIXO}_reg{indice}', 'email': f'{PREFIXO}_reg{indice}@example.com',
+        'password': SENHA, 'password_confirmation': SENHA,
+        'nome': 'Registro', 'sobrenome': 'Bench', 'tipo_usuario': 'cliente', 'sexo': 'F',
+        'cpf': cpf_bench(indice),
+    })
+
+
+ROTAS = [
+    Rota('health', lambda c, i: ('get', reverse('core:health_check'), None)),
+    Rota('profissionais_lista', lambda c, i: (
+        'get', reverse('core:profissional-list') + f'?page={_pagina(c, i)}', None)),
+    Rota('profissionais_cursor', lambda c, i: (
+        'get', reverse('core:profissional-list') + '?cursor=', None)),
+    Rota('profissionais_especialidade', lambda c, i: (
+        'get', reverse('core:profissional-list') + f'?especialidade={c["rng"].choice(ESPECIALIDADES)[0]}',
+        None)),
+    Rota('profissionais_busca', lambda c, i: (
+        'get', reverse('core:profissional-list') + f'?q={c["rng"].choice(SOBRENOMES)[:4]}', None)),
+    Rota('profissionais_disponiveis', _disponiveis),
+    Rota('profissionais_detalhe', lambda c, i: (
+        'get', reverse('core:profissional-detail', args=[c['rng'].choice(c['profissionais'])]), None)),
+    Rota('profissional_agenda', lambda c, i: (
+        'get', reverse('core:profissional-agenda', args=[c['rng'].choice(c['profissionais'])])
+        + '?data=2026-10-19&periodo=semana', None)),
+    Rota('clientes_lista', lambda c, i: ('get', reverse('core:cliente-list'), None)),
+    Rota('clientes_detalhe', lambda c, i: (
+        'get', reverse('core:cliente-detail', args=[c['rng'].choice(c['clientes'])]), None)),
+    Rota('usuarios_lista', lambda c, i: ('get', reverse('core:user-list'), None), autenticacao='admin'),
+    Rota('perfil', lambda c, i: ('get', reverse('core:user_profile'), None)),
+    Rota('atualizar_perfil', lambda c, i: (
+        'put', reverse('core:update_user_profile'), {'telefone': f'119{i:08d}'})),
+    Rota('registro', _registro, autenticacao=None),
+    Rota('login', lambda c, i: (
+        'post', reverse('core:login_user'), {'username': c['usuario'].username, 'password': SENHA}),
+        autenticacao=None),
+    Rota('token', lambda c, i: (
+        'post', reverse('core:obtain_auth_token'), {'username': c['usuario'].username, 'password': SENHA}),
+        autenticacao=None),
+    Rota('estatisticas', lambda c, i: ('get', reverse('core:user_stats'), None), autenticacao='admin'),
+]
+
+
+def host_permitido():
+    """
+    Primeiro host aceito por ALLOWED_HOSTS (localhost se vazio ou '*')
+    """
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+class ExecutorRotas:
+    """
+    Executa as rotas da API no próprio processo (APIClient, sem rede) e
+    mede latência (p50/p95/p99), consultas SQL e pico de memória por rota
+    """
+
+    def __init__(self, repeticoes=30, aquecimento=3, semente=42, rotas=None, stdout=None):
+        self.repeticoes = repeticoes
+        self.aquecimento = aquecimento
+        self.semente = semente
+        self.rotas = [rota for rota in ROTAS if not rotas or rota.nome in rotas]
+        self.stdout = stdout
+
+    def contexto(self):
+        admin = User.objects.get(username=f'{PREFIXO}_admin')
+        profissionais = list(
+            Profissional.objects.filter(ativo=True, usuario__username__startswith=PREFIXO)
+            .order_by('pk').values_list('pk', flat=True)[:1000]
+        )
+        clientes = list(
+            Cliente.objects.filter(ativo=True, usuario__username__startswith=PREFIXO)
+            .order_by('pk').values_list('pk', flat=True)[:1000]
+        )
+        if not profissionais or not clientes:
+            raise ValueError('Gere os dados do benchmark antes de executar as rotas.')
+        usuario = Profissional.objects.select_related('usuario').get(pk=profissionais[0]).usuario
+        total = Profissional.objects.filter(ativo=True).count()
+        return {
+            'rng': random.Random(self.semente),
+            'admin': admin,
+            'usuario': usuario,
+            'tokens': {
+                'admin': Token.objects.get_or_create(user=admin)[0].key,
+                'usuario': Token.objects.get_or_create(user=usuario)[0].key,
+            },
+            'profissionais': profissionais,
+            'clientes': clientes,
+            'paginas_profissionais': min(50, max(1, total // 20)),
+            'proximo_registro': INDICE_MAXIMO_CPF - 10 ** 6,
+        }
+
+    def cliente(self, contexto, autenticacao):
+        client = APIClient(SERVER_NAME=host_permitido())
+        if autenticacao:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {contexto["tokens"][autenticacao]}')
+        return client
+
+    def requisitar(self, client, contexto, rota, i):
+        metodo, url, corpo = rota.preparar(contexto, i)
+        return getattr(client, metodo)(url, corpo, format='json')
+
+    def medir_rota(self, rota, contexto):
+        client = self.cliente(contexto, rota.autenticacao)
+        chamadas = 0
+        for _ in range(self.aquecimento):
+            self.requisitar(client, contexto, rota, chamadas)
+            chamadas += 1
+
+        tempos, consultas, codigos = [], [], set()
+        for _ in range(self.repeticoes):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                response = self.requisitar(client, contexto, rota, chamadas)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            chamadas += 1
+            consultas.append(len(capturadas))
+            codigos.add(response.status_code)
+
+        # Memória em uma passada separada: o tracemalloc distorce a latência
+        tracemalloc.start()
+        self.requisitar(client, contexto, rota, chamadas)
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        quantis = statistics.quantiles(tempos, n=100, method='inclusive') if len(tempos) > 1 else tempos * 99
+        return {
+            'p50_ms': round(percentil(quantis, 50), 3),
+            'p95_ms': round(percentil(quantis, 95), 3),
+            'p99_ms': round(percentil(quantis, 99), 3),
+            'media_ms': round(statistics.fmean(tempos), 3),
+            'consultas': max(consultas),
+            'pico_memoria_kb': round(pico / 1024, 1),
+            'status': sorted(codigos),
+        }
+
+    def run(self):
+        contexto = self.contexto()
+        resultados = {}
+        try:
+            for rota in self.rotas:
+                resultados[rota.nome] = self.medir_rota(rota, contexto)
+                if self.stdout:
+                    r = resultados[rota.nome]
+                    self.stdout.write(
+                        f'{rota.nome:<30}{r["p50_ms"]:>10.2f}{r["p95_ms"]:>10.2f}'
+                        f'{r["p99_ms"]:>10.2f}{r["consultas"]:>10}{r["pico_memoria_kb"]:>12.1f}'
+                    )
+        finally:
+            if excluir_sem_sinais(User.objects.filter(username__startswith=f'{PREFIXO}_reg')):
+                reconstruir_estatisticas()
+        return {
+            'meta': {
+                'data': timezone.now().isoformat(),
+                'banco': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'usuarios': User.objects.filter(username__startswith=PREFIXO).count(),
+                'profissionais': Profissional.objects.filter(usuario__username__startswith=PREFIXO).count(),
+                'repeticoes': self.repeticoes,
+                'semente': self.semente,
+            },
+            'rotas': resultados,
+        }
+
+
+MODOS_CONEXAO = ('sem_persistencia', 'persistente', 'pool')
+
+
+def pool_disponivel():
+    """
+    O pool de conexões do Django exige PostgreSQL com psycopg 3 e psycopg_pool
+    """
+    return (
+        connection.vendor == 'postgresql'
+        and importlib.util.find_spec('psycopg') is not None
+        and importlib.util.find_spec('psycopg_pool') is not None
+    )
+
+
+@contextmanager
+def modo_conexao(modo, threads, conn_max_age=600):
+    """
+    Aplica um modo de gerenciamento de conexões ao banco padrão e restaura a
+    configuração original ao sair
+    """
+    banco = connections.settings[DEFAULT_DB_ALIAS]
+    original = {chave: banco.get(chave) for chave in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+    opcoes = dict(banco.get('OPTIONS', {}))
+
+    def fechar():
+        connections.close_all()
+        if connection.vendor == 'postgresql':
+            connection.close_pool()
+
+    fechar()
+    banco['OPTIONS'] = {chave: valor for chave, valor in opcoes.items() if chave != 'pool'}
+    banco['CONN_HEALTH_CHECKS'] = modo != 'sem_persistencia'
+    banco['CONN_MAX_AGE'] = conn_max_age if modo == 'persistente' else 0
+    if modo == 'pool':
+        banco['OPTIONS']['pool'] = {'min_size': threads, 'max_size': threads, 'timeout': 10}
+    try:
+        yield
+    finally:
+        fechar()
+        banco.update(original)
+        banco['OPTIONS'] = opcoes
+
+
+class BenchConexoes:
+    """
+    Requisições por segundo com e sem reaproveitamento de conexões.
+
+    As requisições passam pelo WSGIHandler completo, em `threads` threads:
+    como em produção, a conexão é fechada (ou devolvida ao pool) ao fim de
+    cada requisição conforme CONN_MAX_AGE. Modos: `sem_persistencia`
+    (CONN_MAX_AGE = 0), `persistente` (CONN_MAX_AGE com health checks) e
+    `pool` (psycopg 3, só no PostgreSQL).
+    """
+
+    def __init__(self, requisicoes=2000, threads=4, rotas=('health', 'perfil', 'clientes_lista'),
+                 modos=MODOS_CONEXAO, semente=42, stdout=None):
+        self.requisicoes = requisicoes
+        self.threads = threads
+        self.rotas = [rota for rota in ROTAS if rota.nome in rotas]
+        self.modos = modos
+        self.semente = semente
+        self.stdout = stdout
+        self.handler = WSGIHandler()
+
+    def environ(self, contexto, rota, i):
+        metodo, url, corpo = rota.preparar(contexto, i)
+        caminho, _, query = url.partition('?')
+        dados = json.dumps(corpo).encode('utf-8') if corpo is not None else b''
+        environ = {
+            'REQUEST_METHOD': metodo.upper(), 'SCRIPT_NAME': '', 'PATH_INFO': caminho,
+            'QUERY_STRING': query, 'SERVER_NAME': host_permitido(), 'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1', 'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(dados)),
+            'HTTP_ACCEPT': 'application/json',
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(dados),
+            'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if rota.autenticacao:
+            environ['HTTP_AUTHORIZATION'] = f'Token {contexto["tokens"][rota.autenticacao]}'
+        return environ
+
+    def requisitar(self, contexto, i):
+        rota = self.rotas[i % len(self.rotas)]
+        status = []
+        resposta = self.handler(self.environ(contexto, rota, i), lambda s, h, e=None: status.append(s))
+        try:
+            b''.join(resposta)
+        finally:
+            # Dispara request_finished, que fecha ou devolve a conexão
+            resposta.close()
+        return int(status[0].split()[0])
+
+    def medir_modo(self, modo, contexto):
+        conexoes = []
+
+        def contar(sender, connection, **kwargs):
+            conexoes.append(1)
+
+        tempos, codigos = [], set()
+        lock = threading.Lock()
+
+        def trabalhar(inicio):
+            locais = []
+            try:
+                for i in range(inicio, self.requisicoes, self.threads):
+                    antes = time.perf_counter()
+                    codigo = self.requisitar(contexto, i)
+                    locais.append(((time.perf_counter() - antes) * 1000, codigo))
+            finally:
+                connections.close_all()
+            with lock:
+                tempos.extend(tempo for tempo, _ in locais)
+                codigos.update(codigo for _, codigo in locais)
+
+        with modo_conexao(modo, self.threads):
+            # Aquecimento: abre o pool e popula os caches
+            for i in range(self.threads):
+                self.requisitar(contexto, i)
+            connection_created.connect(contar)
+            try:
+                threads = [threading.Thread(target=trabalhar, args=(i,)) for i in range(self.threads)]
+                inicio = time.perf_counter()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                duracao = time.perf_counter() - inicio
+            finally:
+                connection_created.disconnect(contar)
+            if modo == 'pool':
+                # connection_created dispara a cada retirada do pool; conta as
+                # conexões físicas pelas estatísticas do próprio pool
+                total_conexoes = connection.pool.get_stats().get('connections_num', 0)
+            else:
+                total_conexoes = len(conexoes)
+
+        quantis = statistics.quantiles(tempos, n=100, method='inclusive') if len(tempos) > 1 else tempos * 99
+        return {
+            'requisicoes_por_segundo': round(len(tempos) / duracao, 1),
+            'p50_ms': round(percentil(quantis, 50), 3),
+            'p95_ms': round(percentil(quantis, 95), 3),
+            'conexoes': total_conexoes,
+            'status': sorted(codigos),
+        }
+
+    def run(self):
+        contexto = ExecutorRotas(semente=self.semente).contexto()
+        resultados = {}
+        for modo in self.modos:
+            if modo == 'pool' and not pool_disponivel():
+                if self.stdout:
+                    self.stdout.write(f'{modo:<20}indisponível (requer PostgreSQL com psycopg[pool])')
+                continue
+            resultados[modo] = self.medir_modo(modo, contexto)
+            if self.stdout:
+                r = resultados[modo]
+                self.stdout.write(
+                    f'{modo:<20}{r["requisicoes_por_segundo"]:>10.1f}{r["p50_ms"]:>10.2f}'
+                    f'{r["p95_ms"]:>10.2f}{r["conexoes"]:>10}'
+                )
+        return {
+            'meta': {
+                'data': timezone.now().isoformat(),
+                'banco': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'requisicoes': self.requisicoes,
+                'threads': self.threads,
+                'rotas': [rota.nome for rota in self.rotas],
+            },
+            'modos': resultados,
+        }
+
+
+def comparar(atual, baseline, tolerancia=0.2):
+    """
+    Regressões de `atual` em relação a `baseline`: p95 ou memória acima da
+    tolerância relativa, ou qualquer consulta a mais
+    """
+    regressoes = []
+    for nome, base in baseline.get('rotas', {}).items():
+        medida = atual['rotas'].get(nome)
+        if medida is None:
+            continue
+        for metrica in ('p95_ms', 'pico_memoria_kb'):
+            if base[metrica] and medida[metrica] > base[metrica] * (1 + tolerancia):
+                regressoes.append({
+                    'rota': nome, 'metrica': metrica,
+                    'baseline': base[metrica], 'atual': medida[metrica],
+                })
+        if medida['consultas'] > base['consultas']:
+            regressoes.append({
+                'rota': nome, 'metrica': 'consultas',
+                'baseline': base['consultas'], 'atual': medida['consultas'],
+            })
+    return regressoes
+
+
+def carregar_resultado(caminho):
+    with open(caminho, encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def gravar_resultado(resultado, caminho):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
@@ -0,0 +1,160 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers
+
+from .directory_cache import invalidar_diretorio
+from .hashing import hash_passwords
+from .models import User, Profissional
+from .search import documento_profissional, documento_usuario
+from .serializers import erros_de_unicidade
+from .stats import registrar_criacao
+
+
+def _em_lotes(valores, tamanho=500):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def _existentes(model, campo, valores):
+    existentes = set()
+    for lote in _em_lotes(valores):
+        existentes.update(
+            model.objects.filter(**{f'{campo}__in': lote}).values_list(campo, flat=True)
+        )
+    return existentes
+
+
+class BulkRegistration:
+    """
+    Cadastro em lote de clientes ou profissionais.
+
+    Valida cada item com o serializer de criação, verifica unicidade de
+    username, cpf e registro_profissional com consultas por conjunto,
+    gera os hashes de senha em paralelo e insere com bulk_create em uma
+    transação por lote. Se um cadastro concorrente fizer o lote violar uma
+    constraint, o lote é refeito item a item, cada um com seu savepoint.
+    """
+    # Email é opcional e pode repetir, como no cadastro individual
+    campos_unicos_usuario = ('username', 'cpf')
+
+    def __init__(self, serializer_class, chunk_size=None):
+        # Sem UniqueValidator (UnicidadeNoBancoMixin): a unicidade é
+        # verificada em lote por `verificar_unicidade`
+        self.serializer = serializer_class()
+        self.model = serializer_class.Meta.model
+        self.chunk_size = chunk_size or getattr(settings, 'BULK_REGISTER_CHUNK_SIZE', 500)
+        self.campos_unicos_perfil = tuple(
+            field.name for field in self.model._meta.fields
+            if field.unique and not field.primary_key and not field.is_relation
+        )
+
+    def run(self, itens):
+        self.vistos = defaultdict(set)
+        resultados = [None] * len(itens)
+        validos = []
+        for indice, item in enumerate(itens):
+            try:
+                validos.append((indice, self.serializer.run_validation(item)))
+            except serializers.ValidationError as exc:
+                resultados[indice] = self.erro(indice, exc.detail)
+
+        for lote in _em_lotes(validos, self.chunk_size):
+            self.processar_lote(lote, resultados)
+        return resultados
+
+    def erro(self, indice, detalhe):
+        return {'indice': indice, 'status': 'erro', 'erros': detalhe}
+
+    def verificar_unicidade(self, lote, resultados):
+        """
+        Marca como erro os itens que colidem com o banco ou com itens
+        anteriores do mesmo envio
+        """
+        # Campo opcional vazio não conflita com nada
+        existentes = {
+            campo: _existentes(User, campo, [
+                dados['usuario'].get(campo) for _, dados in lote if dados['usuario'].get(campo)
+            ])
+            for campo in self.campos_unicos_usuario
+        }
+        existentes.update({
+            campo: _existentes(self.model, campo, [dados[campo] for _, dados in lote])
+            for campo in self.campos_unicos_perfil
+        })
+        vistos = self.vistos
+        aceitos = []
+        for indice, dados in lote:
+            erros = {}
+            for campo in existentes:
+                if campo in self.campos_unicos_usuario:
+                    valor = dados['usuario'].get(campo)
+                    destino = erros.setdefault('usuario', {})
+                else:
+                    valor = dados[campo]
+                    destino = erros
+                if valor and (valor in existentes[campo] or valor in vistos[campo]):
+                    destino[campo] = [f'Já existe um registro com este {campo}.']
+            erros = {chave: valor for chave, valor in erros.items() if valor}
+            if erros:
+                resultados[indice] = self.erro(indice, erros)
+                continue
+            for campo in existentes:
+                valor = dados['usuario'].get(campo) if campo in self.campos_unicos_usuario else dados[campo]
+                vistos[campo].add(valor)
+            aceitos.append((indice, dados))
+        return aceitos
+
+    def processar_lote(self, lote, resultados):
+        aceitos = self.verificar_unicidade(lote, resultados)
+        if not aceitos:
+            return
+
+        senhas = hash_passwords(dados['usuario']['password'] for _, dados in aceitos)
+        usuarios, perfis = [], []
+        for (indice, dados), senha in zip(aceitos, senhas):
+            dados_usuario = dict(dados['usuario'])
+            dados_usuario.pop('password_confirmation', None)
+            dados_usuario.pop('password')
+            usuario = User(password=senha, **dados_usuario)
+            usuario.busca = documento_usuario(usuario)
+            perfil = self.model(usuario=usuario, **{k: v for k, v in dados.items() if k != 'usuario'})
+            if isinstance(perfil, Profissional):
+                perfil.busca = documento_profissional(perfil)
+            usuarios.append(usuario)
+            perfis.append(perfil)
+
+        try:
+            self.inserir(usuarios, perfis)
+        except IntegrityError:
+            # Conflito com um cadastro concorrente: item a item, para que o
+            # erro fique só no item que o causou
+            for (indice, _), usuario, perfil in zip(aceitos, usuarios, perfis):
+                for objeto in (usuario, perfil):
+                    objeto.pk = None
+                    objeto._state.adding = True
+                try:
+                    self.inserir([usuario], [perfil])
+                except IntegrityError as exc:
+                    erros = erros_de_unicidade(exc, self.serializer) or {
+                        'non_field_errors': ['Conflito de unicidade com outro cadastro.']
+                    }
+                    resultados[indice] = self.erro(indice, erros)
+                else:
+                    resultados[indice] = {'indice': indice, 'status': 'criado', 'id': perfil.pk}
+            return
+
+        for (indice, _), perfil in zip(aceitos, perfis):
+            resultados[indice] = {'indice': indice, 'status': 'criado', 'id': perfil.pk}
+
+    def inserir(self, usuarios, perfis):
+        with transaction.atomic():
+            User.objects.bulk_create(usuarios)
+            for usuario, perfil in zip(usuarios, perfis):
+                perfil.usuario = usuario
+            self.model.objects.bulk_create(perfis)
+            registrar_criacao(usuarios + perfis)
+            if self.model is Profissional:
+                invalidar_diretorio('profissionais')
@@ -0,0 +1,97 @@
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+
+def excluir_em_lotes(queryset, lote=5000):
+    """
+    Exclui os registros do queryset em lotes de `lote` chaves, sem manter
+    uma transação longa aberta sobre a tabela inteira
+    """
+    total = 0
+    modelo = queryset.model
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:lote])
+        if not pks:
+            return total
+        total += modelo.objects.filter(pk__in=pks).delete()[1].get(modelo._meta.label, 0)
+
+
+def tabelas_dependentes(modelo):
+    """
+    [(modelo, lookup até `modelo`)] das tabelas que referenciam `modelo` com
+    CASCADE, direta ou indiretamente (inclusive tabelas de ManyToMany), as
+    mais distantes primeiro
+    """
+    dependentes = []
+    for relacao in modelo._meta.get_fields(include_hidden=True):
+        if not relacao.auto_created or relacao.concrete or relacao.many_to_many:
+            continue
+        if relacao.on_delete is not models.CASCADE:
+            continue
+        filho = relacao.related_model
+        for neto, lookup in tabelas_dependentes(filho):
+            dependentes.append((neto, f'{lookup}__{relacao.field.name}'))
+        dependentes.append((filho, relacao.field.name))
+    return dependentes
+
+
+def excluir_sem_sinais(queryset, lote=5000):
+    """
+    Exclui os registros do queryset e seus dependentes em lotes de `lote`
+    chaves, com um DELETE por tabela (dependentes primeiro). Não carrega os
+    objetos nem dispara sinais: não grava RegistroExcluido, não atualiza as
+    estatísticas (chame reconstruir_estatisticas depois) nem invalida caches
+    por registro
+    """
+    modelo, banco = queryset.model, queryset.db
+    dependentes = tabelas_dependentes(modelo)
+    total, ultimo = 0, None
+    while True:
+        pendentes = queryset.order_by('pk')
+        if ultimo is not None:
+            pendentes = pendentes.filter(pk__gt=ultimo)
+        pks = list(pendentes.values_list('pk', flat=True)[:lote])
+        if not pks:
+            return total
+        with transaction.atomic(using=banco):
+            for dependente, lookup in dependentes:
+                dependente._base_manager.using(banco).filter(**{f'{lookup}__in': pks})._raw_delete(banco)
+            total += modelo._base_manager.using(banco).filter(pk__in=pks)._raw_delete(banco)
+        ultimo = pks[-1]
+
+
+def limpar_sessoes(lote=5000):
+    """
+    Remove as sessões expiradas. Backends sem armazenamento no banco
+    (cache, signed_cookies) expiram sozinhos e devolvem None
+    """
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if not issubclass(store, DBSessionStore):
+        store.clear_expired()
+        return None
+    return excluir_em_lotes(store.get_model_class().objects.filter(expire_date__lt=timezone.now()), lote)
+
+
+def tokens_obsoletos(dias=None):
+    """
+    Tokens de usuários inativos e, com `dias`, tokens cujo usuário não faz
+    login (nem recebeu o token) há mais de `dias` dias
+    """
+    filtro = Q(user__is_active=False)
+    tokens = Token.objects.all()
+    if dias is not None:
+        tokens = tokens.alias(ultimo_uso=Greatest('created', Coalesce('user__last_login', 'created')))
+        filtro |= Q(ultimo_uso__lt=timezone.now() - timedelta(days=dias))
+    return tokens.filter(filtro)
+
+
+def limpar_tokens(dias=None, lote=5000):
+    return excluir_em_lotes(tokens_obsoletos(dias), lote)
@@ -0,0 +1,137 @@
+import hashlib
+from functools import partial
+
+from django.db.models import Count, Max
+from django.db.models.functions import Greatest
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def _valor(instance, caminho):
+    for parte in caminho.split('__'):
+        instance = getattr(instance, parte)
+    return instance
+
+
+def ultima_alteracao(instance, campos):
+    """
+    Maior data de alteração entre os campos de auditoria do objeto
+    """
+    return max(_valor(instance, campo) for campo in campos)
+
+
+def validador_lista(queryset, campos):
+    """
+    (maior atualizado_em, total de linhas) do queryset em uma única consulta,
+    sem carregar nem serializar os objetos
+    """
+    expressao = Greatest(*campos) if len(campos) > 1 else campos[0]
+    resultado = queryset.order_by().aggregate(ultima=Max(expressao), total=Count('pk'))
+    return resultado['ultima'], resultado['total']
+
+
+async def avalidador_lista(queryset, campos):
+    """
+    `validador_lista` com o ORM assíncrono
+    """
+    expressao = Greatest(*campos) if len(campos) > 1 else campos[0]
+    resultado = await queryset.order_by().aaggregate(ultima=Max(expressao), total=Count('pk'))
+    return resultado['ultima'], resultado['total']
+
+
+def gerar_etag(request, *partes):
+    """
+    ETag fraca derivada da URL completa, do formato negociado, do usuário
+    autenticado e dos validadores do recurso
+    """
+    chave = '|'.join(str(parte) for parte in (
+        request.get_full_path(),
+        getattr(request, 'accepted_media_type', ''),
+        request.user.pk,
+        *partes,
+    ))
+    return 'W/"%s"' % hashlib.sha256(chave.encode()).hexdigest()[:32]
+
+
+def _timestamp(ultima):
+    return int(ultima.timestamp()) if ultima else None
+
+
+def nao_modificado(request, etag, ultima=None):
+    """
+    HttpResponseNotModified se o cliente já tem a versão atual, senão None.
+
+    Sem `ultima`, apenas `If-None-Match` é considerado.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=_timestamp(ultima))
+    if response is not None:
+        aplicar_validadores(response, etag, ultima)
+    return response
+
+
+def aplicar_validadores(response, etag, ultima=None):
+    response['ETag'] = etag
+    if ultima:
+        response['Last-Modified'] = http_date(_timestamp(ultima))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    Mixin de ViewSet com ETag/Last-Modified em `list` e `retrieve`.
+
+    O detalhe usa o atualizado_em do próprio objeto. A listagem por página
+    usa o maior atualizado_em e a contagem do queryset filtrado, de modo que
+    inclusões, alterações e remoções mudam a ETag; no modo cursor, que não
+    faz COUNT(*), a ETag vem das linhas da própria página. Na listagem só
+    `If-None-Match` gera 304, pois a data sozinha não reflete remoções.
+    """
+    validator_fields = ('atualizado_em',)
+    known_count = None
+    validacao = None
+
+    def responder(self, request, ultima, partes, construir, por_data=False):
+        """
+        304 se o cliente já tem a versão descrita por `partes`, senão a
+        resposta de `construir()` com ETag/Last-Modified
+        """
+        self.validacao = (ultima, partes, por_data)
+        etag = gerar_etag(request, *partes)
+        response = nao_modificado(request, etag, ultima if por_data else None)
+        if response is None:
+            response = aplicar_validadores(construir(), etag, ultima)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        cursor_param = getattr(self.paginator, 'cursor_query_param', None)
+        if cursor_param and cursor_param in request.query_params:
+            return self.list_cursor(request, queryset)
+
+        ultima, total = validador_lista(queryset, self.validator_fields)
+        # A contagem do validador substitui o COUNT(*) da paginação
+        self.known_count = total
+        return self.responder(
+            request, ultima, (ultima, total), partial(super().list, request, *args, **kwargs)
+        )
+
+    def list_cursor(self, request, queryset):
+        page = self.paginate_queryset(queryset)
+        ultima = max((ultima_alteracao(obj, self.validator_fields) for obj in page), default=None)
+        partes = (ultima, [obj.pk for obj in page], self.paginator.has_next, self.paginator.has_previous)
+
+        def construir():
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        return self.responder(request, ultima, partes, construir)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        ultima = ultima_alteracao(instance, self.validator_fields)
+        return self.responder(
+            request, ultima, (ultima,),
+            lambda: Response(self.get_serializer(instance).data), por_data=True,
+        )
@@ -0,0 +1,164 @@
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from .routers import leitura_no_primario
+
+
+def get_directory_cache():
+    """
+    Cache das respostas do diretório, ou None se desativado
+    """
+    alias = getattr(settings, 'DIRECTORY_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def _versao_key(namespace):
+    return f'diretorio:versao:{namespace}'
+
+
+def versoes(cache, namespaces):
+    """
+    Versão atual de cada namespace. Um namespace sem versão (nunca usado ou
+    removido do cache) começa em um valor baseado no relógio, para não
+    reaproveitar entradas gravadas em versões anteriores.
+    """
+    chaves = [_versao_key(namespace) for namespace in namespaces]
+    atuais = cache.get_many(chaves)
+    for chave in chaves:
+        if chave not in atuais:
+            cache.add(chave, time.time_ns(), timeout=None)
+            atuais[chave] = cache.get(chave)
+    return [atuais[chave] for chave in chaves]
+
+
+def _incrementar(namespaces):
+    cache = get_directory_cache()
+    if cache is None:
+        return
+    for namespace in namespaces:
+        try:
+            cache.incr(_versao_key(namespace))
+        except ValueError:
+            cache.set(_versao_key(namespace), time.time_ns(), timeout=None)
+
+
+def invalidar_namespaces(*namespaces, using=None):
+    """
+    Avança a versão dos namespaces, tornando obsoletas todas as suas entradas.
+
+    Dentro de uma transação a versão avança de imediato e de novo no commit,
+    para que uma leitura concorrente feita antes do commit não fique gravada
+    na versão nova.
+    """
+    _incrementar(namespaces)
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(partial(_incrementar, namespaces), using=using)
+
+
+def namespace_lista(recurso):
+    return f'{recurso}:lista'
+
+
+def namespace_detalhe(recurso, pk):
+    return f'{recurso}:{pk}'
+
+
+def invalidar_diretorio(recurso, pks=(), using=None):
+    """
+    Invalida as listagens do recurso e o detalhe dos objetos `pks`
+    """
+    invalidar_namespaces(
+        namespace_lista(recurso),
+        *(namespace_detalhe(recurso, pk) for pk in pks),
+        using=using,
+    )
+
+
+class CachedResponseMixin:
+    """
+    Mixin de ViewSet que guarda em cache as respostas de `list` e `retrieve`.
+
+    A chave combina a URL (com os parâmetros ordenados), o formato negociado
+    e a versão do namespace: todas as listagens compartilham um namespace e
+    cada objeto tem o seu, invalidados pelos sinais de alteração. Só uma
+    requisição recalcula uma chave ausente; as demais aguardam o resultado
+    por até `DIRECTORY_CACHE_LOCK_WAIT` segundos. Deve vir antes de
+    ConditionalGetMixin, cujos validadores são guardados com os dados.
+    """
+    cache_resource = None
+
+    def list(self, request, *args, **kwargs):
+        namespaces = [namespace_lista(self.cache_resource)]
+        return self.cached_response(request, namespaces, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        namespaces = [namespace_detalhe(self.cache_resource, pk)]
+        return self.cached_response(request, namespaces, partial(super().retrieve, request, *args, **kwargs))
+
+    def cache_key(self, request, namespaces, cache):
+        params = sorted(request.query_params.lists())
+        chave = '|'.join([
+            request.build_absolute_uri(request.path),
+            repr(params),
+            request.accepted_media_type or '',
+        ])
+        versao = '.'.join(str(v) for v in versoes(cache, namespaces))
+        return f'diretorio:{namespaces[0]}:{versao}:{hashlib.sha256(chave.encode()).hexdigest()}'
+
+    def cached_response(self, request, namespaces, calcular):
+        cache = get_directory_cache()
+        if cache is None:
+            return calcular()
+
+        key = self.cache_key(request, namespaces, cache)
+        entrada = cache.get(key)
+        if entrada is None:
+            lock = key + ':lock'
+            espera = getattr(settings, 'DIRECTORY_CACHE_LOCK_WAIT', 2)
+            if cache.add(lock, 1, timeout=max(int(espera), 1) * 5):
+                try:
+                    # Recalcula no primário: uma réplica atrasada deixaria o
+                    # dado antigo no cache até o próximo TTL
+                    with leitura_no_primario():
+                        return self.armazenar(cache, key, calcular())
+                finally:
+                    cache.delete(lock)
+            entrada = self.aguardar(cache, key, lock, espera)
+            if entrada is None:
+                return calcular()
+        return self.responder(
+            request, entrada['ultima'], entrada['partes'],
+            lambda: Response(entrada['data']), por_data=entrada['por_data'],
+        )
+
+    def aguardar(self, cache, key, lock, espera, intervalo=0.02):
+        """
+        Aguarda a requisição que detém o lock gravar a entrada
+        """
+        limite = time.monotonic() + espera
+        while time.monotonic() < limite:
+            time.sleep(intervalo)
+            entrada = cache.get(key)
+            if entrada is not None or cache.get(lock) is None:
+                return entrada
+        return None
+
+    def armazenar(self, cache, key, response):
+        validacao = getattr(self, 'validacao', None)
+        if response.status_code == status.HTTP_200_OK and validacao and hasattr(response, 'data'):
+            ultima, partes, por_data = validacao
+            cache.set(key, {
+                'data': response.data if isinstance(response.data, list) else dict(response.data),
+                'ultima': ultima,
+                'partes': partes,
+                'por_data': por_data,
+            })
+        return response
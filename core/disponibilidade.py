@@ -0,0 +1,255 @@
+import math
+import re
+from datetime import time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from .models import MINUTOS_DIA, Agendamento, ExcecaoDisponibilidade, HorarioDisponivel, minuto_da_semana
+from .search import normalizar_busca
+
+
+MINUTOS_SEMANA = 7 * MINUTOS_DIA
+INTERVALO_MAXIMO = timedelta(days=1)
+
+DIAS = {'seg': 0, 'ter': 1, 'qua': 2, 'qui': 3, 'sex': 4, 'sab': 5, 'dom': 6}
+
+# Sobre o texto normalizado (minúsculo, sem acentos): "seg", "segunda",
+# "segunda-feira", "sabados"... sem casar "domiciliar" ou "segundo"
+_DIA = r'(seg(?:unda)?|ter(?:ca)?|qua(?:rta)?|qui(?:nta)?|sex(?:ta)?|sab(?:ado)?|dom(?:ingo)?)(?:-?feira)?s?\b\.?'
+_HORA = r'(\d{1,2})(?:\s*[:h]\s*(\d{2}))?\s*(?:h|hs|hrs|horas)?'
+_TOKENS = re.compile(
+    rf'(?P<faixa_dias>\b{_DIA}\s*(?:a|ate|-)\s*{_DIA})'
+    rf'|(?P<faixa_horas>\b{_HORA}\s*(?:-|\ba\b|\bas\b|\bate\b)\s*{_HORA})'
+    rf'|(?P<dia>\b{_DIA})'
+    r'|(?P<todos>\btodos os dias\b|\bdiariamente\b)'
+    r'|(?P<uteis>\bdias uteis\b)'
+    r'|(?P<fim_semana>\bfins? de semana\b)'
+)
+
+
+def _horario(hora, minuto):
+    hora, minuto = int(hora), int(minuto or 0)
+    if hora == 24 and minuto == 0:
+        return time(23, 59)
+    if hora > 23 or minuto > 59:
+        return None
+    return time(hora, minuto)
+
+
+def _faixa_dias(primeiro, ultimo):
+    primeiro, ultimo = DIAS[primeiro[:3]], DIAS[ultimo[:3]]
+    return [(primeiro + passo) % 7 for passo in range((ultimo - primeiro) % 7 + 1)]
+
+
+def interpretar_horario(texto):
+    """
+    Horários semanais [(dia_semana, início, fim)] descritos em texto livre,
+    como "Seg a Sex, 8h às 18h" ou "Seg, Qua e Sex 14:00-20:00; Sáb 8h-12h".
+
+    Cada faixa de horas vale para os dias citados antes dela (ou, se vier
+    primeiro, para os dias citados depois). Texto sem dias ou sem horas
+    resulta em lista vazia.
+    """
+    grupos = []
+    dias, horas = [], []
+    for token in _TOKENS.finditer(normalizar_busca(texto)):
+        tipo = token.lastgroup
+        if tipo == 'faixa_horas':
+            partes = token.group(tipo)
+            hora = re.findall(rf'{_HORA}', partes)
+            inicio, fim = _horario(*hora[0]), _horario(*hora[1])
+            if inicio is not None and fim is not None and inicio < fim:
+                horas.append((inicio, fim))
+            continue
+        if horas and dias:
+            # Dias depois de horas já aplicadas começam um novo grupo
+            grupos.append((dias, horas))
+            dias, horas = [], []
+        if tipo == 'faixa_dias':
+            primeiro, ultimo = re.findall(_DIA, token.group(tipo))
+            dias += _faixa_dias(primeiro, ultimo)
+        elif tipo == 'dia':
+            dias.append(DIAS[token.group(tipo)[:3]])
+        elif tipo == 'todos':
+            dias += range(7)
+        elif tipo == 'uteis':
+            dias += range(5)
+        else:
+            dias += [5, 6]
+    if dias and horas:
+        grupos.append((dias, horas))
+
+    return sorted({
+        (dia, inicio, fim) for dias, horas in grupos for dia in dias for inicio, fim in horas
+    })
+
+
+def fuso_agenda():
+    return ZoneInfo(getattr(settings, 'AGENDA_TIME_ZONE', settings.TIME_ZONE))
+
+
+def intervalo_da_consulta(params):
+    """
+    (início, fim) com fuso, a partir de `?inicio=&fim=` em ISO 8601; datas
+    sem fuso são do AGENDA_TIME_ZONE
+    """
+    erros, valores = {}, {}
+    for nome in ('inicio', 'fim'):
+        try:
+            valor = parse_datetime(params.get(nome) or '')
+        except ValueError:
+            valor = None
+        if valor is None:
+            erros[nome] = ['Informe data e hora no formato ISO 8601 (ex.: 2026-10-19T08:00:00-03:00).']
+        elif timezone.is_naive(valor):
+            valor = timezone.make_aware(valor, fuso_agenda())
+        valores[nome] = valor
+    if not erros:
+        if valores['fim'] <= valores['inicio']:
+            erros['fim'] = ['O fim deve ser posterior ao início.']
+        elif valores['fim'] - valores['inicio'] > INTERVALO_MAXIMO:
+            erros['fim'] = ['O intervalo consultado deve ter no máximo 24 horas.']
+    if erros:
+        raise serializers.ValidationError(erros)
+    return valores['inicio'], valores['fim']
+
+
+def intervalo_semanal(inicio, fim):
+    """
+    (início, fim) em minutos desde segunda 00:00 no fuso da agenda
+    """
+    local = timezone.localtime(inicio, fuso_agenda())
+    inicio_semana = minuto_da_semana(local.weekday(), local)
+    return inicio_semana, inicio_semana + math.ceil((fim - inicio).total_seconds() / 60)
+
+
+def _intervalo(sql, params):
+    # Colunas sem tabela: as consultas viram subconsultas com alias próprio
+    return RawSQL(sql, params, output_field=BooleanField())
+
+
+def horarios_cobrindo(inicio_semana, fim_semana, using):
+    """
+    Horários semanais que cobrem o intervalo inteiro
+    """
+    horarios = HorarioDisponivel.objects.using(using)
+    if fim_semana > MINUTOS_SEMANA:
+        # Atravessa a meia-noite de domingo; nenhum horário cruza a meia-noite
+        return horarios.none()
+    if connections[using].vendor == 'postgresql':
+        return horarios.filter(_intervalo(
+            "int4range(inicio_semana, fim_semana, '[]') @> int4range(%s, %s, '[]')",
+            [inicio_semana, fim_semana],
+        ))
+    # Horários não cruzam a meia-noite: o início está no mesmo dia da
+    # consulta, o que limita a faixa percorrida no índice
+    return horarios.filter(
+        inicio_semana__gte=inicio_semana - inicio_semana % MINUTOS_DIA,
+        inicio_semana__lte=inicio_semana,
+        fim_semana__gte=fim_semana,
+    )
+
+
+def excecoes(inicio, fim, using, disponivel):
+    """
+    Horários extras que cobrem o intervalo (`disponivel`) ou bloqueios que
+    o tocam
+    """
+    excecoes = ExcecaoDisponibilidade.objects.using(using).filter(disponivel=disponivel)
+    if connections[using].vendor == 'postgresql':
+        operador = '@>' if disponivel else '&&'
+        return excecoes.filter(_intervalo(
+            f"tstzrange(inicio, fim) {operador} tstzrange(%s, %s)", [inicio, fim],
+        ))
+    if disponivel:
+        return excecoes.filter(fim__gte=fim, inicio__lte=inicio)
+    return excecoes.filter(fim__gt=inicio, inicio__lt=fim)
+
+
+def agendamentos_sobrepostos(queryset, inicio, fim):
+    """
+    Agendamentos ativos que tocam o intervalo. O limite de duração fecha a
+    faixa de início percorrida no índice
+    """
+    return queryset.filter(
+        status='agendado',
+        inicio__gte=inicio - Agendamento.DURACAO_MAXIMA,
+        inicio__lt=fim,
+        fim__gt=inicio,
+    )
+
+
+def filtrar_disponiveis(queryset, inicio, fim):
+    """
+    Profissionais do queryset que atendem durante todo o intervalo: um
+    horário semanal ou extra o cobre e nenhum bloqueio ou agendamento o toca
+    """
+    using = queryset.db
+    semanais = horarios_cobrindo(*intervalo_semanal(inicio, fim), using)
+    extras = excecoes(inicio, fim, using, disponivel=True)
+    bloqueios = excecoes(inicio, fim, using, disponivel=False)
+    ocupados = agendamentos_sobrepostos(Agendamento.objects.using(using), inicio, fim)
+    return queryset.filter(
+        Q(pk__in=semanais.values('profissional_id')) | Q(pk__in=extras.values('profissional_id'))
+    ).exclude(
+        Q(pk__in=bloqueios.values('profissional_id')) | Q(pk__in=ocupados.values('profissional_id'))
+    )
+
+
+def novos_horarios(model, profissional_id, texto):
+    """
+    Instâncias (não salvas) de `model` com os horários interpretados do texto
+    """
+    horarios = []
+    for dia, inicio, fim in interpretar_horario(texto):
+        horarios.append(model(
+            profissional_id=profissional_id, dia_semana=dia, inicio=inicio, fim=fim,
+            inicio_semana=minuto_da_semana(dia, inicio), fim_semana=minuto_da_semana(dia, fim),
+        ))
+    return horarios
+
+
+def gerar_horarios(apps=global_apps, substituir=False, lote=2000):
+    """
+    Cria os horários semanais a partir do `horario_atendimento` dos
+    profissionais que ainda não têm horários (com `substituir`, recria os de
+    todos cujo texto pôde ser interpretado). Devolve (interpretados, não
+    interpretados).
+    """
+    Profissional = apps.get_model('core', 'Profissional')
+    Horario = apps.get_model('core', 'HorarioDisponivel')
+    profissionais = Profissional.objects.exclude(horario_atendimento='')
+    if not substituir:
+        profissionais = profissionais.filter(~Exists(Horario.objects.filter(profissional=OuterRef('pk'))))
+
+    interpretados = nao_interpretados = 0
+    ultimo = 0
+    while True:
+        # Lotes por chave, sem cursor aberto durante as gravações na tabela
+        # consultada pelo filtro
+        linhas = list(
+            profissionais.filter(pk__gt=ultimo).order_by('pk').values_list('pk', 'horario_atendimento')[:lote]
+        )
+        if not linhas:
+            return interpretados, nao_interpretados
+        ultimo = linhas[-1][0]
+        pendentes, horarios = [], []
+        for pk, texto in linhas:
+            novos = novos_horarios(Horario, pk, texto)
+            if novos:
+                pendentes.append(pk)
+                horarios += novos
+        interpretados += len(pendentes)
+        nao_interpretados += len(linhas) - len(pendentes)
+        if substituir:
+            Horario.objects.filter(profissional_id__in=pendentes).delete()
+        Horario.objects.bulk_create(horarios)
+
@@ -0,0 +1,174 @@
+import json
+import re
+
+from django.db import connection, transaction
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .benchmark import host_permitido
+from .models import User, Profissional, Cliente
+
+
+class RollbackRequest(Exception):
+    """
+    Desfaz as alterações feitas por uma requisição auditada
+    """
+
+
+class CapturaSQL:
+    """
+    `execute_wrapper` que guarda (sql, params) sem interpolar os parâmetros
+    """
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.consultas.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def endpoints():
+    """
+    (nome, método, url, corpo) de cada endpoint auditado. Detalhes usam o
+    primeiro registro existente; escritas são desfeitas ao final.
+    """
+    profissional = Profissional.objects.filter(ativo=True).order_by('pk').first()
+    cliente = Cliente.objects.filter(ativo=True).order_by('pk').first()
+    rotas = [
+        ('health', 'get', reverse('core:health_check'), None),
+        ('perfil', 'get', reverse('core:user_profile'), None),
+        ('estatisticas', 'get', reverse('core:user_stats'), None),
+        ('usuarios', 'get', reverse('core:user-list'), None),
+        ('usuarios_pagina_2', 'get', reverse('core:user-list') + '?page=2', None),
+        ('profissionais', 'get', reverse('core:profissional-list'), None),
+        ('profissionais_cursor', 'get', reverse('core:profissional-list') + '?cursor=', None),
+        ('profissionais_especialidade', 'get',
+         reverse('core:profissional-list') + '?especialidade=Ortopedia', None),
+        ('profissionais_busca', 'get', reverse('core:profissional-list') + '?q=silva', None),
+        ('profissionais_disponiveis', 'get', reverse('core:profissional-disponiveis')
+         + '?inicio=2026-10-19T09:00:00-03:00&fim=2026-10-19T10:00:00-03:00', None),
+        ('profissionais_sync', 'get', reverse('core:profissional-sync') + '?updated_since=2026-10-19T00:00:00Z', None),
+        ('clientes', 'get', reverse('core:cliente-list'), None),
+        ('atualizar_perfil', 'put', reverse('core:update_user_profile'), {'telefone': '11999999999'}),
+        ('registro', 'post', reverse('core:register_user'), {
+            'username': 'explain_registro', 'email': 'explain@example.com',
+            'password': 'explain-senha-123', 'password_confirmation': 'explain-senha-123',
+            'nome': 'Explain', 'sobrenome': 'Registro', 'tipo_usuario': 'cliente', 'sexo': 'O',
+            'cpf': '529.982.247-25',
+        }),
+    ]
+    if profissional:
+        rotas.append(('profissional_detalhe', 'get',
+                      reverse('core:profissional-detail', args=[profissional.pk]), None))
+        rotas.append(('profissional_agenda', 'get',
+                      reverse('core:profissional-agenda', args=[profissional.pk]) + '?data=2026-10-19&periodo=semana',
+                      None))
+    if cliente:
+        rotas.append(('cliente_detalhe', 'get', reverse('core:cliente-detail', args=[cliente.pk]), None))
+    return rotas
+
+
+def capturar(usuario, metodo, url, corpo):
+    """
+    Executa a requisição e devolve o SQL emitido; alterações são desfeitas
+    """
+    client = APIClient(SERVER_NAME=host_permitido())
+    client.force_authenticate(usuario)
+    captura = CapturaSQL()
+    try:
+        with transaction.atomic():
+            with connection.execute_wrapper(captura):
+                response = getattr(client, metodo)(url, corpo, format='json')
+            raise RollbackRequest
+    except RollbackRequest:
+        pass
+    return response.status_code, [
+        (sql, params) for sql, params in captura.consultas
+        if re.match(r'\s*(SELECT|UPDATE|DELETE|WITH)\b', sql, re.IGNORECASE)
+    ]
+
+
+def explicar(sql, params):
+    """
+    Plano da consulta: linhas de EXPLAIN QUERY PLAN (SQLite) ou o JSON de
+    EXPLAIN (PostgreSQL)
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plano = cursor.fetchone()[0]
+            return json.loads(plano) if isinstance(plano, str) else plano
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [linha[-1] for linha in cursor.fetchall()]
+
+
+def _nos_postgres(no):
+    yield no
+    for filho in no.get('Plans', []):
+        yield from _nos_postgres(filho)
+
+
+def varreduras_completas(plano):
+    """
+    Tabelas lidas por inteiro (sem índice) no plano
+    """
+    if connection.vendor == 'postgresql':
+        return [
+            no['Relation Name'] for no in _nos_postgres(plano[0]['Plan'])
+            if no.get('Node Type') == 'Seq Scan'
+        ]
+    tabelas = []
+    for detalhe in plano:
+        # "SCAN core_user" é varredura da tabela; "SCAN ... USING INDEX",
+        # "USING COVERING INDEX" e tabelas virtuais (FTS5) não contam
+        match = re.match(r'SCAN (?:TABLE )?(\w+)(.*)', detalhe)
+        if match and 'USING' not in match.group(2) and 'VIRTUAL TABLE' not in match.group(2):
+            tabelas.append(match.group(1))
+    return tabelas
+
+
+def contar_linhas(tabelas):
+    """
+    Linhas por tabela (estimativa do planejador no PostgreSQL)
+    """
+    existentes = set(connection.introspection.table_names())
+    contagem = {}
+    with connection.cursor() as cursor:
+        for tabela in set(tabelas) & existentes:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [tabela])
+            else:
+                cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(tabela)}')
+            contagem[tabela] = max(cursor.fetchone()[0], 0)
+    return contagem
+
+
+def auditar(usuario, limite_linhas):
+    """
+    Audita os endpoints; devolve (resultado por endpoint, violações).
+
+    Violação: consulta que varre por inteiro uma tabela com mais de
+    `limite_linhas` linhas.
+    """
+    resultados, violacoes = [], []
+    for nome, metodo, url, corpo in endpoints():
+        status, consultas = capturar(usuario, metodo, url, corpo)
+        planos = []
+        for sql, params in consultas:
+            plano = explicar(sql, params)
+            linhas = contar_linhas(varreduras_completas(plano))
+            for tabela, total in linhas.items():
+                if total > limite_linhas:
+                    violacoes.append({'endpoint': nome, 'tabela': tabela, 'linhas': total, 'sql': sql})
+            planos.append({'sql': sql, 'plano': plano, 'varreduras': linhas})
+        resultados.append({'endpoint': nome, 'url': url, 'status': status, 'consultas': planos})
+    return resultados, violacoes
+
+
+def usuario_auditoria():
+    """
+    Administrador usado nas requisições (o primeiro existente)
+    """
+    return User.objects.filter(is_staff=True, is_active=True).order_by('pk').first()
@@ -0,0 +1,80 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from .importers import CAMPOS_USUARIO, ClienteImporter, ProfissionalImporter
+
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class _Echo:
+    """
+    Arquivo fictício: csv.writer devolve a linha formatada em vez de gravá-la
+    """
+
+    def write(self, value):
+        return value
+
+
+def colunas_exportacao(model):
+    """
+    Colunas exportadas: as mesmas aceitas pelos comandos de importação
+    """
+    importer = {ClienteImporter.model: ClienteImporter, ProfissionalImporter.model: ProfissionalImporter}
+    return ['id', *CAMPOS_USUARIO, *importer[model].campos_perfil, 'ativo']
+
+
+def linhas_exportacao(queryset, colunas, chunk_size=2000):
+    campos_usuario = set(CAMPOS_USUARIO)
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        usuario = obj.usuario
+        yield [
+            getattr(usuario if coluna in campos_usuario else obj, coluna)
+            for coluna in colunas
+        ]
+
+
+def gerar_csv(linhas, colunas, agrupar=500):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(colunas)
+    bloco = []
+    for linha in linhas:
+        bloco.append(writer.writerow(linha))
+        if len(bloco) >= agrupar:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+def gerar_ndjson(linhas, colunas, agrupar=500):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    bloco = []
+    for linha in linhas:
+        bloco.append(encoder.encode(dict(zip(colunas, linha))) + '\n')
+        if len(bloco) >= agrupar:
+            yield ''.join(bloco)
+            bloco = []
+    if bloco:
+        yield ''.join(bloco)
+
+
+def exportar(queryset, formato, nome_arquivo):
+    """
+    Resposta em streaming com o queryset em CSV ou NDJSON.
+
+    As linhas são lidas com cursor do lado do servidor (`iterator`), então a
+    memória é constante e o cabeçalho é enviado antes do fim da consulta.
+    """
+    colunas = colunas_exportacao(queryset.model)
+    linhas = linhas_exportacao(queryset, colunas)
+    gerador = gerar_csv if formato == 'csv' else gerar_ndjson
+    response = StreamingHttpResponse(gerador(linhas, colunas), content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.{formato}"'
+    return response
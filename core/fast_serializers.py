@@ -0,0 +1,164 @@
+from functools import lru_cache
+from operator import attrgetter
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+
+# Campos cujo to_representation devolve o próprio valor vindo do modelo
+# (str, int ou bool), dispensando a chamada por valor
+IDENTITY_FIELDS = (
+    serializers.ReadOnlyField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+)
+IDENTITY_METHODS = {cls.to_representation for cls in IDENTITY_FIELDS}
+
+
+def _identity(value):
+    return value
+
+
+def _getter(source):
+    if source == '*':
+        return _identity
+    return attrgetter(source)
+
+
+def _formato_iso(field, setting):
+    return (
+        not hasattr(field, 'format')
+        and (getattr(api_settings, setting) or '').lower() == ISO_8601
+    )
+
+
+def _date_iso(value):
+    return value.isoformat()
+
+
+def _datetime_iso(field, tz):
+    """
+    Equivalente a DateTimeField.to_representation com o fuso já resolvido
+    """
+    def converter(value):
+        if isinstance(value, str):
+            return value
+        aware = value.utcoffset() is not None
+        if tz is not None and aware:
+            value = value.astimezone(tz)
+        elif tz is not None or aware:
+            return field.to_representation(value)
+        text = value.isoformat()
+        if text.endswith('+00:00'):
+            text = text[:-6] + 'Z'
+        return text
+    return converter
+
+
+class FastSerializer:
+    """
+    Serialização somente leitura gerada a partir de um ModelSerializer.
+
+    Os campos de `Meta.fields` são compilados uma vez em pares
+    (acessor, conversor); cada objeto vira um dict com as mesmas chaves,
+    na mesma ordem e com os mesmos valores do serializer original, sem a
+    maquinaria de campos do DRF por valor.
+    """
+
+    def __init__(self, serializer):
+        self.fields = [
+            (nome, field) for nome, field in serializer.fields.items()
+            if not field.write_only
+        ]
+        self._compilados = {}
+
+    def _fabrica(self, field):
+        """
+        Função tz -> conversor do campo (None quando o valor sai inalterado)
+        """
+        if isinstance(field, serializers.BaseSerializer):
+            nested = FastSerializer(field)
+            return lambda tz: nested.compilar(tz)
+        if isinstance(field, IDENTITY_FIELDS) and type(field).to_representation in IDENTITY_METHODS:
+            return lambda tz: None
+        if type(field) is serializers.DateField and _formato_iso(field, 'DATE_FORMAT'):
+            return lambda tz: _date_iso
+        if (type(field) is serializers.DateTimeField and _formato_iso(field, 'DATETIME_FORMAT')
+                and not hasattr(field, 'timezone')):
+            return lambda tz: _datetime_iso(field, tz)
+        return lambda tz: field.to_representation
+
+    def compilar(self, tz):
+        """
+        Função instância -> dict para o fuso `tz`
+        """
+        if tz not in self._compilados:
+            campos = [
+                (nome, _getter(field.source), self._fabrica(field)(tz))
+                for nome, field in self.fields
+            ]
+
+            def to_representation(instance):
+                data = {}
+                for nome, getter, conversor in campos:
+                    value = getter(instance)
+                    if value is None or conversor is None:
+                        data[nome] = value
+                    else:
+                        data[nome] = conversor(value)
+                return data
+
+            self._compilados[tz] = to_representation
+        return self._compilados[tz]
+
+    def _fuso(self):
+        return timezone.get_current_timezone() if settings.USE_TZ else None
+
+    def to_representation(self, instance):
+        return self.compilar(self._fuso())(instance)
+
+    def many(self, instances):
+        to_representation = self.compilar(self._fuso())
+        return [to_representation(instance) for instance in instances]
+
+
+@lru_cache(maxsize=256)
+def fast_serializer_for(serializer_class, fields=None, exclude=None):
+    """
+    FastSerializer em cache por classe e seleção de campos
+    """
+    if fields or exclude:
+        return FastSerializer(serializer_class(fields=fields, exclude=exclude))
+    return FastSerializer(serializer_class())
+
+
+class FastListData:
+    """
+    Substituto de `serializer(many=True)` nas listagens: expõe apenas `.data`
+    """
+
+    def __init__(self, fast_serializer, instances):
+        self.fast_serializer = fast_serializer
+        self.instances = instances
+
+    @property
+    def data(self):
+        return self.fast_serializer.many(self.instances)
+
+
+class FastListMixin:
+    """
+    Mixin de ViewSet que usa FastSerializer na action `list`
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list' and kwargs.get('many') and args:
+            fast_serializer = fast_serializer_for(
+                self.get_serializer_class(), kwargs.get('fields'), kwargs.get('exclude')
+            )
+            return FastListData(fast_serializer, args[0])
+        return super().get_serializer(*args, **kwargs)
@@ -0,0 +1,84 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+
+from .instrumentation import medir
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _inicializar_worker(settings_module):
+    """
+    Prepara o Django em workers iniciados por spawn (no fork já está pronto)
+    """
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def get_hashing_workers():
+    workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', None)
+    if workers is None:
+        return os.cpu_count() or 1
+    return workers
+
+
+def get_hashing_executor():
+    """
+    Pool de processos compartilhado para hashing de senhas
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=get_hashing_workers(),
+                initializer=_inicializar_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'fisio_connect_core.settings'),),
+            )
+        return _executor
+
+
+def hash_passwords(passwords):
+    """
+    Gera os hashes de várias senhas em paralelo no pool de processos.
+    Lotes pequenos, ou PASSWORD_HASHING_WORKERS = 0, são processados no
+    próprio processo.
+    """
+    passwords = list(passwords)
+    workers = get_hashing_workers()
+    with medir('hash'):
+        if workers == 0 or len(passwords) < 2 * workers:
+            return [make_password(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(get_hashing_executor().map(make_password, passwords, chunksize=chunksize))
+
+
+async def executar_no_pool(funcao, *args):
+    """
+    Executa `funcao` (hash ou verificação de senha) fora do event loop, no
+    pool de processos, onde as requisições concorrentes fazem fila. Com
+    PASSWORD_HASHING_WORKERS = 0, usa o pool de threads padrão do loop
+    """
+    if get_hashing_workers() == 0:
+        return await sync_to_async(funcao, thread_sensitive=False)(*args)
+    return await asyncio.wrap_future(get_hashing_executor().submit(funcao, *args))
+
+
+async def ahash_password(password):
+    with medir('hash'):
+        return await executar_no_pool(make_password, password)
+
+
+async def averificar_senha(password, encoded):
+    """
+    (senha confere, hash deve ser atualizado), como `verify_password`
+    """
+    with medir('auth'):
+        return await executar_no_pool(verify_password, password, encoded)
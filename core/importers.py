@@ -0,0 +1,380 @@
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .directory_cache import invalidar_diretorio
+from .models import User, Profissional, Cliente
+from .search import documento_profissional, documento_usuario
+from .stats import reconstruir_estatisticas
+from .validators import normalizar_cpf
+
+
+CAMPOS_USUARIO = (
+    'username', 'email', 'nome', 'sobrenome', 'sexo', 'cpf',
+    'data_nascimento', 'telefone', 'endereco',
+)
+
+
+class LinhaInvalida(Exception):
+    pass
+
+
+def ler_csv(arquivo):
+    for numero, linha in enumerate(csv.DictReader(arquivo), start=1):
+        yield numero, linha
+
+
+def ler_ndjson(arquivo):
+    numero = 0
+    for texto in arquivo:
+        if not texto.strip():
+            continue
+        numero += 1
+        try:
+            yield numero, json.loads(texto)
+        except ValueError:
+            yield numero, LinhaInvalida('JSON inválido.')
+
+
+def converter_data(valor):
+    if not valor:
+        return None
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise LinhaInvalida(f'Data inválida: {valor}.')
+
+
+class Importer:
+    """
+    Importação de cadastros em streaming a partir de CSV ou NDJSON.
+
+    As linhas são lidas e validadas em lotes de tamanho fixo. No
+    PostgreSQL cada lote é carregado com COPY para uma tabela temporária
+    e inserido com um único comando; nos demais bancos usa bulk_create.
+    Após cada lote o progresso é gravado no arquivo de checkpoint.
+    """
+    model = None
+    tipo_usuario = None
+    campos_perfil = ()
+    campos_unicos_perfil = ()
+
+    def __init__(self, caminho, formato=None, batch_size=5000, checkpoint=None,
+                 rejeitados=None, retomar=False, using='default', stdout=None):
+        self.caminho = caminho
+        self.formato = formato or ('ndjson' if caminho.endswith(('.ndjson', '.jsonl')) else 'csv')
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint or f'{caminho}.checkpoint'
+        self.rejeitados_path = rejeitados or f'{caminho}.rejeitados.ndjson'
+        self.retomar = retomar
+        self.using = using
+        self.stdout = stdout
+        self.processadas = self.importadas = self.rejeitadas = 0
+
+    # Leitura e validação
+
+    def linhas(self, arquivo):
+        leitor = ler_ndjson if self.formato == 'ndjson' else ler_csv
+        return leitor(arquivo)
+
+    def validar(self, linha):
+        if isinstance(linha, Exception):
+            raise linha
+        if not isinstance(linha, dict):
+            raise LinhaInvalida('Linha deve ser um objeto.')
+        linha = {chave: (valor.strip() if isinstance(valor, str) else valor)
+                 for chave, valor in linha.items() if chave}
+
+        cpf = normalizar_cpf(str(linha.get('cpf') or ''))
+        if not cpf:
+            raise LinhaInvalida('CPF inválido.')
+        for campo in ('nome', 'sobrenome'):
+            if not linha.get(campo):
+                raise LinhaInvalida(f'Campo obrigatório: {campo}.')
+        sexo = (linha.get('sexo') or '').upper()[:1]
+        if sexo not in dict(User.SEXO_CHOICES):
+            raise LinhaInvalida('Sexo inválido.')
+
+        usuario = {
+            'username': linha.get('username') or cpf.replace('.', '').replace('-', ''),
+            'email': linha.get('email') or '',
+            'nome': linha['nome'],
+            'sobrenome': linha['sobrenome'],
+            'sexo': sexo,
+            'cpf': cpf,
+            'data_nascimento': converter_data(linha.get('data_nascimento')),
+            'telefone': linha.get('telefone') or '',
+            'endereco': linha.get('endereco') or '',
+        }
+        for campo in ('username', 'email', 'nome', 'sobrenome', 'telefone'):
+            limite = User._meta.get_field(campo).max_length
+            if len(usuario[campo]) > limite:
+                raise LinhaInvalida(f'{campo} excede {limite} caracteres.')
+        return usuario, self.validar_perfil(linha)
+
+    def validar_perfil(self, linha):
+        perfil = {campo: linha.get(campo) or '' for campo in self.campos_perfil}
+        for campo, valor in perfil.items():
+            limite = self.model._meta.get_field(campo).max_length
+            if limite and len(str(valor)) > limite:
+                raise LinhaInvalida(f'{campo} excede {limite} caracteres.')
+        return perfil
+
+    def chaves_unicas(self, usuario, perfil):
+        chaves = {'username': usuario['username'], 'cpf': usuario['cpf']}
+        chaves.update({campo: perfil[campo] for campo in self.campos_unicos_perfil})
+        return chaves
+
+    # Execução
+
+    def run(self):
+        inicio_linha = self.ler_checkpoint() if self.retomar else 0
+        self.inicio = time.monotonic()
+        modo = 'a' if self.retomar else 'w'
+        with open(self.caminho, newline='', encoding='utf-8-sig') as arquivo, \
+                open(self.rejeitados_path, modo, encoding='utf-8') as self.rejeitados:
+            lote = []
+            for numero, linha in self.linhas(arquivo):
+                if numero <= inicio_linha:
+                    continue
+                lote.append((numero, linha))
+                if len(lote) >= self.batch_size:
+                    self.processar_lote(lote)
+                    lote = []
+            if lote:
+                self.processar_lote(lote)
+
+        if self.importadas:
+            reconstruir_estatisticas(using=self.using)
+            if self.model is Profissional:
+                invalidar_diretorio('profissionais', using=self.using)
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        return self.importadas, self.rejeitadas
+
+    def processar_lote(self, lote):
+        validos, vistos = [], set()
+        for numero, linha in lote:
+            try:
+                usuario, perfil = self.validar(linha)
+            except LinhaInvalida as exc:
+                self.rejeitar(numero, str(exc), linha)
+                continue
+            chaves = set(self.chaves_unicas(usuario, perfil).items())
+            if chaves & vistos:
+                self.rejeitar(numero, 'Duplicado no arquivo.', linha)
+                continue
+            vistos |= chaves
+            validos.append((numero, linha, usuario, perfil))
+
+        if validos:
+            if connections[self.using].vendor == 'postgresql':
+                recusados = self.carregar_copy(validos)
+            else:
+                recusados = self.carregar_bulk(validos)
+            for numero, linha in recusados:
+                self.rejeitar(numero, 'Já cadastrado (username, CPF ou registro).', linha)
+            self.importadas += len(validos) - len(recusados)
+
+        self.processadas = lote[-1][0]
+        self.gravar_checkpoint()
+        self.relatar()
+
+    def rejeitar(self, numero, erro, linha):
+        self.rejeitadas += 1
+        dados = linha if isinstance(linha, dict) else None
+        self.rejeitados.write(json.dumps(
+            {'linha': numero, 'erro': erro, 'dados': dados}, ensure_ascii=False, default=str
+        ) + '\n')
+
+    def ler_checkpoint(self):
+        try:
+            with open(self.checkpoint, encoding='utf-8') as arquivo:
+                dados = json.load(arquivo)
+        except FileNotFoundError:
+            return 0
+        self.importadas = dados.get('importadas', 0)
+        self.rejeitadas = dados.get('rejeitadas', 0)
+        return dados['linhas']
+
+    def gravar_checkpoint(self):
+        self.rejeitados.flush()
+        temporario = f'{self.checkpoint}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump({
+                'linhas': self.processadas,
+                'importadas': self.importadas,
+                'rejeitadas': self.rejeitadas,
+            }, arquivo)
+        os.replace(temporario, self.checkpoint)
+
+    def relatar(self):
+        if self.stdout is None:
+            return
+        decorrido = max(time.monotonic() - self.inicio, 1e-9)
+        self.stdout.write(
+            f'{self.processadas} linhas ({self.processadas / decorrido:.0f} linhas/s): '
+            f'{self.importadas} importadas, {self.rejeitadas} rejeitadas'
+        )
+
+    # Carga
+
+    def novo_perfil(self, usuario, perfil):
+        return self.model(usuario=usuario, **perfil)
+
+    def carregar_bulk(self, validos):
+        """
+        Carga com bulk_create; a unicidade é verificada com uma consulta por campo
+        """
+        chaves = [self.chaves_unicas(usuario, perfil) for _, _, usuario, perfil in validos]
+        existentes = {}
+        for campo in ('username', 'cpf'):
+            existentes[campo] = set(User.objects.using(self.using).filter(
+                **{f'{campo}__in': [c[campo] for c in chaves]}
+            ).values_list(campo, flat=True))
+        for campo in self.campos_unicos_perfil:
+            existentes[campo] = set(self.model.objects.using(self.using).filter(
+                **{f'{campo}__in': [c[campo] for c in chaves]}
+            ).values_list(campo, flat=True))
+
+        recusados, usuarios, perfis = [], [], []
+        for (numero, linha, usuario, perfil), chave in zip(validos, chaves):
+            if any(valor in existentes[campo] for campo, valor in chave.items()):
+                recusados.append((numero, linha))
+                continue
+            novo = User(password=make_password(None), tipo_usuario=self.tipo_usuario, **usuario)
+            novo.busca = documento_usuario(novo)
+            usuarios.append(novo)
+            perfis.append(self.novo_perfil(novo, perfil))
+
+        with transaction.atomic(using=self.using):
+            User.objects.using(self.using).bulk_create(usuarios)
+            # Só a chave: reatribuir o usuário consultaria o roteador, que
+            # recusa a relação entre o perfil ainda sem banco e `self.using`
+            for perfil in perfis:
+                perfil.usuario_id = perfil.usuario.pk
+            self.model.objects.using(self.using).bulk_create(perfis)
+        return recusados
+
+    def carregar_copy(self, validos):
+        """
+        Carga via COPY para tabela temporária e INSERT ... SELECT único. O
+        SQL não aplica os `default` dos campos: toda coluna NOT NULL precisa
+        de um valor
+        """
+        colunas_perfil = list(self.campos_perfil) + (['busca'] if self.model is Profissional else [])
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+        for numero, _, usuario, perfil in validos:
+            novo = self.novo_perfil(User(**usuario), perfil)
+            escritor.writerow(
+                [numero, make_password(None), documento_usuario(novo.usuario)]
+                + [usuario[campo] if usuario[campo] is not None else '' for campo in CAMPOS_USUARIO]
+                + [getattr(novo, campo) for campo in colunas_perfil]
+            )
+        buffer.seek(0)
+
+        tabela_perfil = self.model._meta.db_table
+        tipos_perfil = {
+            campo: self.model._meta.get_field(campo).db_type(connections[self.using])
+            for campo in colunas_perfil
+        }
+        filtro_perfil = ' '.join(
+            f'AND NOT EXISTS (SELECT 1 FROM {tabela_perfil} p WHERE p.{campo} = s.{campo})'
+            for campo in self.campos_unicos_perfil
+        )
+        agora = timezone.now()
+
+        with transaction.atomic(using=self.using), connections[self.using].cursor() as cursor:
+            cursor.execute('DROP TABLE IF EXISTS importacao_staging')
+            cursor.execute(
+                'CREATE TEMP TABLE importacao_staging ('
+                'linha bigint, password varchar(128), busca text, username varchar(150), email varchar(254),'
+                ' nome varchar(100), sobrenome varchar(100), sexo varchar(1), cpf varchar(14),'
+                " data_nascimento date, telefone varchar(15), endereco text"
+                + ''.join(f', {campo} {tipo}' for campo, tipo in tipos_perfil.items())
+                + ') ON COMMIT DROP'
+            )
+            colunas = ['linha', 'password', 'busca', *CAMPOS_USUARIO, *colunas_perfil]
+            sql_copy = (
+                f'COPY importacao_staging ({", ".join(colunas)}) FROM STDIN '
+                'WITH (FORMAT csv, FORCE_NULL (data_nascimento))'
+            )
+            if hasattr(cursor, 'copy_expert'):
+                cursor.copy_expert(sql_copy, buffer)
+            else:
+                with cursor.copy(sql_copy) as copy:
+                    copy.write(buffer.getvalue())
+
+            cursor.execute(
+                f'''
+                WITH novos AS (
+                    INSERT INTO core_user (
+                        password, is_superuser, username, first_name, last_name, email,
+                        is_staff, is_active, date_joined, nome, sobrenome, tipo_usuario,
+                        sexo, cpf, data_nascimento, telefone, endereco, criado_em, atualizado_em,
+                        versao_token, busca
+                    )
+                    SELECT s.password, false, s.username, '', '', s.email,
+                           false, true, %s, s.nome, s.sobrenome, %s,
+                           s.sexo, s.cpf, s.data_nascimento, s.telefone, s.endereco, %s, %s,
+                           0, s.busca
+                    FROM importacao_staging s
+                    WHERE true {filtro_perfil}
+                    ON CONFLICT DO NOTHING
+                    RETURNING id, cpf
+                ), perfis AS (
+                    INSERT INTO {tabela_perfil} (usuario_id, ativo, atualizado_em, {", ".join(colunas_perfil)})
+                    SELECT novos.id, true, %s, {", ".join(f"s.{campo}" for campo in colunas_perfil)}
+                    FROM novos JOIN importacao_staging s ON s.cpf = novos.cpf
+                )
+                SELECT s.linha FROM importacao_staging s
+                WHERE s.cpf NOT IN (SELECT cpf FROM novos)
+                ''',
+                [agora, self.tipo_usuario, agora, agora, agora],
+            )
+            linhas_recusadas = {linha for linha, in cursor.fetchall()}
+
+        return [(numero, linha) for numero, linha, _, _ in validos if numero in linhas_recusadas]
+
+
+class ClienteImporter(Importer):
+    model = Cliente
+    tipo_usuario = 'cliente'
+    campos_perfil = ('responsavel', 'observacoes', 'historico_medico', 'alergias', 'medicamentos')
+
+
+class ProfissionalImporter(Importer):
+    model = Profissional
+    tipo_usuario = 'profissional'
+    campos_perfil = (
+        'registro_profissional', 'especialidade', 'formacao', 'experiencia_anos',
+        'clinica', 'horario_atendimento',
+    )
+    campos_unicos_perfil = ('registro_profissional',)
+
+    def validar_perfil(self, linha):
+        perfil = super().validar_perfil(linha)
+        if not perfil['registro_profissional']:
+            raise LinhaInvalida('Campo obrigatório: registro_profissional.')
+        try:
+            perfil['experiencia_anos'] = int(perfil['experiencia_anos'] or 0)
+        except (TypeError, ValueError):
+            raise LinhaInvalida('experiencia_anos deve ser um número inteiro.')
+        if perfil['experiencia_anos'] < 0:
+            raise LinhaInvalida('experiencia_anos deve ser positivo.')
+        return perfil
+
+    def novo_perfil(self, usuario, perfil):
+        profissional = super().novo_perfil(usuario, perfil)
+        profissional.busca = documento_profissional(profissional)
+        return profissional
@@ -0,0 +1,73 @@
+import heapq
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_medicao_atual = ContextVar('medicao_requisicao', default=None)
+
+
+class MedicaoRequisicao:
+    """
+    Tempos de uma requisição: consultas SQL (via `execute_wrapper`), fases
+    (view, render, hash...) e total, em milissegundos.
+
+    Guarda o SQL sem parâmetros (sem dados pessoais nos logs) e no máximo
+    `max_consultas` instruções; contagem e tempo total incluem todas.
+    """
+
+    def __init__(self, max_consultas=200):
+        self.inicio = time.perf_counter()
+        self.max_consultas = max_consultas
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.instrucoes = []
+        self.fases = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracao = (time.perf_counter() - inicio) * 1000
+            self.consultas += 1
+            self.tempo_sql += duracao
+            if len(self.instrucoes) < self.max_consultas:
+                self.instrucoes.append((duracao, sql))
+
+    def adicionar(self, fase, duracao):
+        self.fases[fase] = self.fases.get(fase, 0.0) + duracao
+
+    def total(self):
+        return (time.perf_counter() - self.inicio) * 1000
+
+    def mais_lentas(self, quantidade):
+        return heapq.nlargest(quantidade, self.instrucoes, key=lambda item: item[0])
+
+    def ativar(self):
+        return _medicao_atual.set(self)
+
+    @staticmethod
+    def desativar(token):
+        _medicao_atual.reset(token)
+
+
+def medicao_atual():
+    return _medicao_atual.get()
+
+
+@contextmanager
+def medir(fase):
+    """
+    Soma a duração do bloco à fase `fase` da requisição em andamento
+    (sem efeito fora de uma requisição instrumentada)
+    """
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        medicao.adicionar(fase, (time.perf_counter() - inicio) * 1000)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class ImportCommand(BaseCommand):
+    """
+    Base dos comandos de importação de cadastros
+    """
+    importer_class = None
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo CSV ou NDJSON')
+        parser.add_argument('--formato', choices=['csv', 'ndjson'],
+                            help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--lote', type=int, default=5000,
+                            help='Linhas por lote/transação (padrão: 5000)')
+        parser.add_argument('--checkpoint', help='Arquivo de checkpoint (padrão: <arquivo>.checkpoint)')
+        parser.add_argument('--rejeitados',
+                            help='Arquivo NDJSON de rejeitados (padrão: <arquivo>.rejeitados.ndjson)')
+        parser.add_argument('--retomar', action='store_true',
+                            help='Retoma a partir do último checkpoint')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote deve ser maior que zero.')
+        importer = self.importer_class(
+            options['arquivo'],
+            formato=options['formato'],
+            batch_size=options['lote'],
+            checkpoint=options['checkpoint'],
+            rejeitados=options['rejeitados'],
+            retomar=options['retomar'],
+            using=options['database'],
+            stdout=self.stdout,
+        )
+        try:
+            importadas, rejeitadas = importer.run()
+        except FileNotFoundError as exc:
+            raise CommandError(f'Arquivo não encontrado: {exc.filename}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Importação concluída: {importadas} importadas, {rejeitadas} rejeitadas.'
+        ))
@@ -0,0 +1,76 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.benchmark import (
+    ROTAS, ExecutorRotas, GeradorDados, carregar_resultado, comparar, gravar_resultado,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark da API: gera dados sintéticos determinísticos, executa as rotas '
+        'em processo (p50/p95/p99, consultas, memória) e compara com um baseline JSON. '
+        'Use um banco dedicado: os dados gerados substituem os usuários "bench*".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int,
+                            help='Gera N usuários antes de medir (ex.: 10000, 100000, 1000000)')
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--proporcao-profissionais', type=float, default=0.2)
+        parser.add_argument('--lote', type=int, default=5000)
+        parser.add_argument('--somente-gerar', action='store_true')
+        parser.add_argument('--limpar', action='store_true', help='Remove os dados do benchmark e sai')
+        parser.add_argument('--repeticoes', type=int, default=30)
+        parser.add_argument('--aquecimento', type=int, default=3)
+        parser.add_argument('--rotas', nargs='+', choices=[rota.nome for rota in ROTAS])
+        parser.add_argument('--sem-cache', action='store_true',
+                            help='Desativa o cache do diretório durante as medições')
+        parser.add_argument('--saida', help='Grava o resultado em JSON')
+        parser.add_argument('--baseline', help='Resultado JSON anterior para comparação')
+        parser.add_argument('--tolerancia', type=float, default=0.2,
+                            help='Aumento relativo aceito em p95 e memória (padrão: 0.2)')
+
+    def handle(self, *args, **options):
+        gerador = GeradorDados(
+            options['usuarios'] or 0, semente=options['semente'],
+            proporcao_profissionais=options['proporcao_profissionais'],
+            lote=options['lote'], stdout=self.stdout,
+        )
+        if options['limpar']:
+            gerador.limpar()
+            self.stdout.write(self.style.SUCCESS('Dados do benchmark removidos.'))
+            return
+        if options['usuarios']:
+            gerador.run()
+        if options['somente_gerar']:
+            return
+
+        executor = ExecutorRotas(
+            repeticoes=options['repeticoes'], aquecimento=options['aquecimento'],
+            semente=options['semente'], rotas=options['rotas'], stdout=self.stdout,
+        )
+        self.stdout.write(f'{"rota":<30}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}'
+                          f'{"consultas":>10}{"memória KB":>12}')
+        try:
+            if options['sem_cache']:
+                with override_settings(DIRECTORY_CACHE_ALIAS=None):
+                    resultado = executor.run()
+            else:
+                resultado = executor.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['saida']:
+            gravar_resultado(resultado, options['saida'])
+            self.stdout.write(f'Resultado gravado em {options["saida"]}')
+
+        if options['baseline']:
+            regressoes = comparar(resultado, carregar_resultado(options['baseline']), options['tolerancia'])
+            if regressoes:
+                for regressao in regressoes:
+                    self.stdout.write(self.style.ERROR(json.dumps(regressao, ensure_ascii=False)))
+                raise CommandError(f'{len(regressoes)} regressão(ões) em relação ao baseline.')
+            self.stdout.write(self.style.SUCCESS('Sem regressões em relação ao baseline.'))
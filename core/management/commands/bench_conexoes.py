@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import MODOS_CONEXAO, ROTAS, BenchConexoes, gravar_resultado
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara requisições/s com conexões por requisição, conexões persistentes '
+        'e pool (PostgreSQL). Usa os dados gerados por "manage.py bench --usuarios N".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--rotas', nargs='+', choices=[rota.nome for rota in ROTAS],
+                            default=['health', 'perfil', 'clientes_lista'])
+        parser.add_argument('--modos', nargs='+', choices=MODOS_CONEXAO, default=list(MODOS_CONEXAO))
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--saida', help='Grava o resultado em JSON')
+
+    def handle(self, *args, **options):
+        bench = BenchConexoes(
+            requisicoes=options['requisicoes'], threads=options['threads'], rotas=options['rotas'],
+            modos=options['modos'], semente=options['semente'], stdout=self.stdout,
+        )
+        self.stdout.write(f'{"modo":<20}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"conexões":>10}')
+        try:
+            resultado = bench.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['saida']:
+            gravar_resultado(resultado, options['saida'])
+            self.stdout.write(f'Resultado gravado em {options["saida"]}')
+
+        erros = {
+            modo: medida['status'] for modo, medida in resultado['modos'].items()
+            if any(codigo >= 400 for codigo in medida['status'])
+        }
+        if erros:
+            raise CommandError(f'Respostas com erro: {json.dumps(erros)}')
@@ -0,0 +1,69 @@
+import time
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.fast_serializers import fast_serializer_for
+from core.models import User, Profissional, Cliente
+from core.serializers import UserSerializer, ProfissionalSerializer, ClienteSerializer
+
+
+def _usuario(indice):
+    agora = datetime(2025, 1, 1, 12, 0, tzinfo=dt_timezone.utc)
+    return User(
+        id=indice, username=f'usuario{indice}', email=f'usuario{indice}@example.com',
+        nome='Maria', sobrenome='Souza', tipo_usuario='profissional', sexo='F',
+        cpf='529.982.247-25', data_nascimento=date(1990, 1, 1), telefone='11999999999',
+        endereco='Rua A, 100', criado_em=agora, atualizado_em=agora,
+    )
+
+
+FABRICAS = {
+    'usuarios': (UserSerializer, _usuario),
+    'profissionais': (ProfissionalSerializer, lambda i: Profissional(
+        id=i, usuario=_usuario(i), registro_profissional=f'CREFITO-{i}',
+        especialidade='Ortopedia', formacao='Fisioterapia - USP', experiencia_anos=8,
+        clinica='Clínica Movimento', horario_atendimento='Seg a Sex, 8h às 18h',
+    )),
+    'clientes': (ClienteSerializer, lambda i: Cliente(
+        id=i, usuario=_usuario(i), responsavel='', observacoes='Pós-operatório',
+        historico_medico='Cirurgia no joelho', alergias='', medicamentos='',
+    )),
+}
+
+
+class Command(BaseCommand):
+    help = 'Compara o custo por linha do serializer DRF com o FastSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linhas', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument('--repeticoes', type=int, default=3)
+
+    def medir(self, funcao, repeticoes):
+        melhor = float('inf')
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao()
+            melhor = min(melhor, time.perf_counter() - inicio)
+        return melhor
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        self.stdout.write(f'{"recurso":<14}{"linhas":>8}{"drf µs/linha":>16}'
+                          f'{"fast µs/linha":>16}{"ganho":>8}')
+        for nome, (serializer_class, fabrica) in FABRICAS.items():
+            fast = fast_serializer_for(serializer_class)
+            for total in options['linhas']:
+                objetos = [fabrica(i) for i in range(1, total + 1)]
+                drf = self.medir(
+                    lambda: renderer.render(serializer_class(objetos, many=True).data),
+                    options['repeticoes'],
+                )
+                rapido = self.medir(
+                    lambda: renderer.render(fast.many(objetos)), options['repeticoes']
+                )
+                self.stdout.write(
+                    f'{nome:<14}{total:>8}{drf / total * 1e6:>16.2f}'
+                    f'{rapido / total * 1e6:>16.2f}{drf / rapido:>7.1f}x'
+                )
@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.explain import auditar, usuario_auditoria
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa os endpoints da API, roda EXPLAIN sobre cada consulta emitida e '
+        'falha se alguma varre por inteiro uma tabela acima do limite de linhas'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limite-linhas', type=int, default=1000,
+                            help='Tabelas com mais linhas não podem ser varridas (padrão: 1000)')
+        parser.add_argument('--json', action='store_true', help='Imprime o resultado completo em JSON')
+
+    def handle(self, *args, **options):
+        usuario = usuario_auditoria()
+        if usuario is None:
+            raise CommandError('É necessário um usuário administrador ativo para a auditoria.')
+
+        resultados, violacoes = auditar(usuario, options['limite_linhas'])
+        if options['json']:
+            self.stdout.write(json.dumps(
+                {'resultados': resultados, 'violacoes': violacoes},
+                ensure_ascii=False, indent=2, default=str,
+            ))
+        else:
+            for resultado in resultados:
+                varreduras = sum(len(consulta['varreduras']) for consulta in resultado['consultas'])
+                self.stdout.write(
+                    f'{resultado["endpoint"]:<30}{resultado["status"]:>5}'
+                    f'{len(resultado["consultas"]):>5} consultas{varreduras:>4} varreduras'
+                )
+
+        if violacoes:
+            for violacao in violacoes:
+                self.stderr.write(
+                    f'{violacao["endpoint"]}: varredura completa de {violacao["tabela"]} '
+                    f'({violacao["linhas"]} linhas)\n  {violacao["sql"]}'
+                )
+            raise CommandError(f'{len(violacoes)} varredura(s) completa(s) acima de '
+                               f'{options["limite_linhas"]} linhas.')
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS('Nenhuma varredura completa acima do limite.'))
@@ -0,0 +1,8 @@
+from core.importers import ClienteImporter
+
+from ._importacao import ImportCommand
+
+
+class Command(ImportCommand):
+    help = 'Importa clientes de um arquivo CSV ou NDJSON'
+    importer_class = ClienteImporter
@@ -0,0 +1,8 @@
+from core.importers import ProfissionalImporter
+
+from ._importacao import ImportCommand
+
+
+class Command(ImportCommand):
+    help = 'Importa profissionais de um arquivo CSV ou NDJSON'
+    importer_class = ProfissionalImporter
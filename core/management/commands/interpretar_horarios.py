@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from core.disponibilidade import gerar_horarios
+
+
+class Command(BaseCommand):
+    help = (
+        'Cria os horários semanais estruturados a partir do texto de '
+        'horario_atendimento dos profissionais que ainda não os têm'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--substituir', action='store_true',
+                            help='Recria também os horários de quem já os tem, se o texto puder ser interpretado')
+        parser.add_argument('--lote', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        interpretados, nao_interpretados = gerar_horarios(
+            substituir=options['substituir'], lote=options['lote']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{interpretados} profissional(is) com horários gerados; '
+            f'{nao_interpretados} texto(s) não interpretado(s).'
+        ))
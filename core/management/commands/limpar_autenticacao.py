@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.cleanup import limpar_sessoes, limpar_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        'Remove sessões expiradas e tokens obsoletos (usuários inativos e, com '
+        '--dias-tokens ou AUTH_TOKEN_STALE_DAYS, sem login há N dias). '
+        'Feito para rodar periodicamente (cron)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias-tokens', type=int,
+                            help='Remove tokens sem login há mais de N dias (padrão: AUTH_TOKEN_STALE_DAYS)')
+        parser.add_argument('--lote', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        dias = options['dias_tokens']
+        if dias is None:
+            dias = getattr(settings, 'AUTH_TOKEN_STALE_DAYS', None)
+
+        sessoes = limpar_sessoes(options['lote'])
+        if sessoes is None:
+            self.stdout.write(f'Sessões expiram no próprio backend ({settings.SESSION_ENGINE}).')
+        else:
+            self.stdout.write(f'{sessoes} sessão(ões) expirada(s) removida(s).')
+        tokens = limpar_tokens(dias, options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{tokens} token(s) obsoleto(s) removido(s).'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from core.stats import reconstruir_estatisticas
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula a tabela de contadores de estatísticas de usuários. Os sinais '
+        'não veem QuerySet.update() nem bulk_update; feito para rodar '
+        'periodicamente (cron) e corrigir a deriva'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        contadores = reconstruir_estatisticas(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(contadores)} contadores recalculados '
+            f'({contadores["usuarios"]} usuários).'
+        ))
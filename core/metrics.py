@@ -0,0 +1,213 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Metrica:
+
+    def __init__(self, nome, tipo, ajuda, rotulos, buckets=None):
+        self.nome = nome
+        self.tipo = tipo
+        self.ajuda = ajuda
+        self.rotulos = rotulos
+        self.buckets = buckets
+
+
+class Registro:
+    """
+    Registro de métricas do processo (contadores e histogramas com rótulos).
+
+    Com `METRICS_DIR` configurado, cada processo grava periodicamente seus
+    valores em `METRICS_DIR/metricas_<pid>.json` (no máximo a cada
+    `METRICS_FLUSH_INTERVAL` segundos e ao encerrar) e a exposição soma os
+    arquivos de todos os workers. Sem `METRICS_DIR`, expõe só o processo atual.
+    """
+
+    def __init__(self):
+        self.metricas = {}
+        self.valores = {}
+        self.lock = threading.Lock()
+        self.ultimo_flush = time.monotonic()
+
+    def contador(self, nome, ajuda, rotulos=()):
+        self.metricas[nome] = Metrica(nome, 'counter', ajuda, tuple(rotulos))
+        self.valores.setdefault(nome, {})
+
+    def histograma(self, nome, ajuda, rotulos=(), buckets=BUCKETS_LATENCIA):
+        self.metricas[nome] = Metrica(nome, 'histogram', ajuda, tuple(rotulos), tuple(buckets))
+        self.valores.setdefault(nome, {})
+
+    def incrementar(self, nome, valor=1, **rotulos):
+        chave = self._chave(nome, rotulos)
+        with self.lock:
+            valores = self.valores[nome]
+            valores[chave] = valores.get(chave, 0) + valor
+        self._flush_periodico()
+
+    def observar(self, nome, valor, **rotulos):
+        metrica = self.metricas[nome]
+        chave = self._chave(nome, rotulos)
+        with self.lock:
+            valores = self.valores[nome]
+            serie = valores.get(chave)
+            if serie is None:
+                # contagem por bucket (+Inf no fim), soma, total
+                serie = valores[chave] = [[0] * (len(metrica.buckets) + 1), 0.0, 0]
+            serie[0][bisect_left(metrica.buckets, valor)] += 1
+            serie[1] += valor
+            serie[2] += 1
+        self._flush_periodico()
+
+    def _chave(self, nome, rotulos):
+        return json.dumps([str(rotulos.get(rotulo, '')) for rotulo in self.metricas[nome].rotulos])
+
+    # Vários processos
+
+    def _diretorio(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def _arquivo(self, diretorio):
+        return os.path.join(diretorio, f'metricas_{os.getpid()}.json')
+
+    def _flush_periodico(self):
+        intervalo = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if time.monotonic() - self.ultimo_flush >= intervalo:
+            self.flush()
+
+    def flush(self):
+        diretorio = self._diretorio()
+        self.ultimo_flush = time.monotonic()
+        if not diretorio:
+            return
+        os.makedirs(diretorio, exist_ok=True)
+        with self.lock:
+            conteudo = json.dumps(self.valores)
+        arquivo = self._arquivo(diretorio)
+        temporario = f'{arquivo}.{threading.get_ident()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as saida:
+            saida.write(conteudo)
+        os.replace(temporario, arquivo)
+
+    def coletar(self):
+        """
+        Valores somados de todos os processos
+        """
+        diretorio = self._diretorio()
+        if not diretorio:
+            with self.lock:
+                return json.loads(json.dumps(self.valores))
+        self.flush()
+        total = {nome: {} for nome in self.metricas}
+        for caminho in glob.glob(os.path.join(diretorio, 'metricas_*.json')):
+            try:
+                with open(caminho, encoding='utf-8') as entrada:
+                    valores = json.load(entrada)
+            except (OSError, ValueError):
+                continue
+            for nome, series in valores.items():
+                if nome in total:
+                    for chave, valor in series.items():
+                        total[nome][chave] = _somar(total[nome].get(chave), valor)
+        return total
+
+    def exportar(self):
+        """
+        Métricas no formato de texto do Prometheus (0.0.4)
+        """
+        valores = self.coletar()
+        linhas = []
+        for nome, metrica in sorted(self.metricas.items()):
+            linhas.append(f'# HELP {nome} {metrica.ajuda}')
+            linhas.append(f'# TYPE {nome} {metrica.tipo}')
+            for chave, valor in sorted(valores.get(nome, {}).items()):
+                rotulos = list(zip(metrica.rotulos, json.loads(chave)))
+                if metrica.tipo == 'counter':
+                    linhas.append(f'{nome}{_rotulos(rotulos)} {_numero(valor)}')
+                    continue
+                contagens, soma, total = valor
+                acumulado = 0
+                for limite, contagem in zip([*metrica.buckets, '+Inf'], contagens):
+                    acumulado += contagem
+                    le = limite if limite == '+Inf' else _numero(limite)
+                    linhas.append(f'{nome}_bucket{_rotulos([*rotulos, ("le", le)])} {acumulado}')
+                linhas.append(f'{nome}_sum{_rotulos(rotulos)} {_numero(soma)}')
+                linhas.append(f'{nome}_count{_rotulos(rotulos)} {total}')
+        return '\n'.join(linhas) + '\n'
+
+
+def _somar(atual, valor):
+    if atual is None:
+        return valor
+    if isinstance(valor, list):
+        return [[a + b for a, b in zip(atual[0], valor[0])], atual[1] + valor[1], atual[2] + valor[2]]
+    return atual + valor
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(rotulos):
+    if not rotulos:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in rotulos) + '}'
+
+
+registro = Registro()
+registro.contador(
+    'http_requests_total', 'Requisições HTTP por rota, método e status',
+    ('route', 'method', 'status'),
+)
+registro.histograma(
+    'http_request_duration_seconds', 'Duração das requisições HTTP', ('route', 'method'),
+)
+registro.histograma(
+    'db_queries_per_request', 'Consultas SQL por requisição', ('route',), buckets=BUCKETS_CONSULTAS,
+)
+registro.histograma(
+    'db_query_duration_seconds', 'Tempo total de SQL por requisição', ('route',),
+)
+registro.histograma(
+    'request_phase_duration_seconds',
+    'Duração das fases da requisição (view, render; auth = verificação da senha no login)',
+    ('route', 'phase'),
+)
+registro.contador(
+    'auth_token_cache_total', 'Resoluções de token pelo cache de autenticação', ('result',),
+)
+
+atexit.register(registro.flush)
+
+
+def rota(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'nao_resolvida'
+
+
+def registrar_requisicao(request, response, medicao, total_ms):
+    """
+    Contabiliza uma requisição medida pelo RequestTimingMiddleware
+    """
+    nome = rota(request)
+    registro.incrementar(
+        'http_requests_total', route=nome, method=request.method, status=response.status_code,
+    )
+    registro.observar('http_request_duration_seconds', total_ms / 1000, route=nome, method=request.method)
+    registro.observar('db_queries_per_request', medicao.consultas, route=nome)
+    registro.observar('db_query_duration_seconds', medicao.tempo_sql / 1000, route=nome)
+    for fase, duracao in medicao.fases.items():
+        registro.observar('request_phase_duration_seconds', duracao / 1000, route=nome, phase=fase)
@@ -0,0 +1,236 @@
+import json
+import logging
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .instrumentation import MedicaoRequisicao
+from .metrics import registrar_requisicao
+from .routers import marcar_escrita
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+
+logger = logging.getLogger('core.requests')
+
+
+def _aceita(accept_encoding, codificacao):
+    return re.search(rf'\b{codificacao}\b(?!\s*;\s*q=0(\.0*)?\b)', accept_encoding) is not None
+
+
+class CompressionMiddleware:
+    """
+    Compressão brotli/gzip de respostas grandes, ativada por
+    `RESPONSE_COMPRESSION = True`.
+
+    Respostas menores que `RESPONSE_COMPRESSION_MIN_SIZE` bytes, em streaming
+    ou já codificadas passam inalteradas; brotli só é usado se o pacote
+    `brotli` estiver instalado e o cliente o aceitar.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'RESPONSE_COMPRESSION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 1024)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.comprimir(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.comprimir(request, await self.get_response(request))
+
+    def comprimir(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.headers.get('Accept-Encoding', '')
+        if brotli is not None and _aceita(accept_encoding, 'br'):
+            codificacao, conteudo = 'br', brotli.compress(response.content)
+        elif _aceita(accept_encoding, 'gzip'):
+            codificacao, conteudo = 'gzip', compress_string(response.content)
+        else:
+            return response
+        if len(conteudo) >= len(response.content):
+            return response
+
+        response.content = conteudo
+        response['Content-Length'] = str(len(conteudo))
+        response['Content-Encoding'] = codificacao
+        etag = response.get('ETag')
+        if etag and not etag.startswith('W/'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+class RequestTimingMiddleware:
+    """
+    Instrumentação por requisição: número de consultas, tempo total de SQL,
+    consultas mais lentas, tempo da view, da renderização e das fases
+    registradas com `core.instrumentation.medir` (ex.: hash de senha).
+
+    As consultas são medidas com `connection.execute_wrapper`, então funciona
+    com DEBUG=False. O resultado vai no cabeçalho `Server-Timing` e em uma
+    linha de log JSON no logger `core.requests` (INFO); requisições acima de
+    `REQUEST_TIMING_SLOW_MS` são registradas como WARNING com a lista de
+    consultas. Com `METRICS_ENABLED`, alimenta também `core.metrics`.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.lento_ms = getattr(settings, 'REQUEST_TIMING_SLOW_MS', 500)
+        self.top = getattr(settings, 'REQUEST_TIMING_TOP_QUERIES', 3)
+        self.max_consultas = getattr(settings, 'REQUEST_TIMING_MAX_QUERIES', 200)
+        self.cabecalho = getattr(settings, 'REQUEST_TIMING_HEADER', True)
+        self.metricas = getattr(settings, 'METRICS_ENABLED', True)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with self.medir(request) as medicao:
+            response = self.get_response(request)
+        return self.finalizar(request, response, medicao)
+
+    async def __acall__(self, request):
+        with self.medir(request) as medicao:
+            response = await self.get_response(request)
+        return self.finalizar(request, response, medicao)
+
+    @contextmanager
+    def medir(self, request):
+        medicao = MedicaoRequisicao(self.max_consultas)
+        request._medicao = medicao
+        token = medicao.ativar()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(medicao))
+                yield medicao
+        finally:
+            medicao.desativar(token)
+
+    def finalizar(self, request, response, medicao):
+        agora = time.perf_counter()
+        inicio_view = getattr(medicao, 'inicio_view', None)
+        if inicio_view is not None:
+            fim_view = getattr(medicao, 'fim_view', agora)
+            medicao.adicionar('view', (fim_view - inicio_view) * 1000)
+            if fim_view != agora:
+                medicao.adicionar('render', (agora - fim_view) * 1000)
+        total = medicao.total()
+
+        if self.cabecalho:
+            response['Server-Timing'] = self.server_timing(medicao, total)
+        self.registrar(request, response, medicao, total)
+        if self.metricas:
+            registrar_requisicao(request, response, medicao, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        medicao = getattr(request, '_medicao', None)
+        if medicao is not None:
+            medicao.inicio_view = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Respostas do DRF são renderizadas depois deste ponto
+        medicao = getattr(request, '_medicao', None)
+        if medicao is not None:
+            medicao.fim_view = time.perf_counter()
+        return response
+
+    def server_timing(self, medicao, total):
+        metricas = [f'db;dur={medicao.tempo_sql:.1f};desc="{medicao.consultas} consultas"']
+        metricas += [f'{fase};dur={duracao:.1f}' for fase, duracao in medicao.fases.items()]
+        metricas.append(f'total;dur={total:.1f}')
+        return ', '.join(metricas)
+
+    def registrar(self, request, response, medicao, total):
+        lenta = total >= self.lento_ms
+        nivel = logging.WARNING if lenta else logging.INFO
+        if not logger.isEnabledFor(nivel):
+            return
+        registro = {
+            'metodo': request.method,
+            'caminho': request.path,
+            'status': response.status_code,
+            'total_ms': round(total, 2),
+            'sql_ms': round(medicao.tempo_sql, 2),
+            'consultas': medicao.consultas,
+            **{f'{fase}_ms': round(duracao, 2) for fase, duracao in medicao.fases.items()},
+            'mais_lentas': [
+                {'ms': round(duracao, 2), 'sql': sql} for duracao, sql in medicao.mais_lentas(self.top)
+            ],
+        }
+        if lenta:
+            registro['lenta'] = True
+            registro['sql'] = [{'ms': round(duracao, 2), 'sql': sql} for duracao, sql in medicao.instrucoes]
+        logger.log(nivel, json.dumps(registro, ensure_ascii=False))
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Marca como "escreveu recentemente" o usuário autenticado de uma
+    requisição de escrita bem-sucedida, para que suas leituras sigam para o
+    primário por REPLICA_STICKY_SECONDS (ver core.routers)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.escrita(request, response):
+            self.marcar(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.escrita(request, response):
+            # request.user pode ser preguiçoso (sessão) e consultar o banco
+            await sync_to_async(self.marcar)(request)
+        return response
+
+    def escrita(self, request, response):
+        return request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400
+
+    def marcar(self, request):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            marcar_escrita(user)
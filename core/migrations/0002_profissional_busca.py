@@ -0,0 +1,97 @@
+# Generated by Django 5.1.15 on 2026-10-17 20:48
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Cópia do estado de core.search nesta migração: o módulo pode mudar depois
+FTS_TABLE = 'core_profissional_busca'
+
+POSTGRES_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS core_profissional_busca_trgm'
+    ' ON core_profissional USING gin (busca gin_trgm_ops)',
+    "CREATE INDEX IF NOT EXISTS core_profissional_busca_tsv"
+    " ON core_profissional USING gin (to_tsvector('simple', busca))",
+]
+
+POSTGRES_REVERSE_SQL = [
+    'DROP INDEX IF EXISTS core_profissional_busca_tsv',
+    'DROP INDEX IF EXISTS core_profissional_busca_trgm',
+]
+
+# SQLite: tabela FTS5 espelho de core_profissional.busca, mantida por triggers
+SQLITE_SQL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"busca, content='core_profissional', content_rowid='id',"
+    f" tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON core_profissional BEGIN"
+    f" INSERT INTO {FTS_TABLE}(rowid, busca) VALUES (new.id, new.busca); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON core_profissional BEGIN"
+    f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, busca) VALUES ('delete', old.id, old.busca); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF busca ON core_profissional BEGIN"
+    f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, busca) VALUES ('delete', old.id, old.busca);"
+    f" INSERT INTO {FTS_TABLE}(rowid, busca) VALUES (new.id, new.busca); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def normalizar_busca(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def popular_busca(apps, schema_editor):
+    Profissional = apps.get_model('core', 'Profissional')
+    banco = schema_editor.connection.alias
+    profissionais = Profissional.objects.using(banco).select_related('usuario').iterator(chunk_size=2000)
+    lote = []
+    for profissional in profissionais:
+        usuario = profissional.usuario
+        profissional.busca = normalizar_busca(' '.join([
+            usuario.nome, usuario.sobrenome, profissional.especialidade,
+            profissional.clinica, profissional.registro_profissional,
+        ]))
+        lote.append(profissional)
+        if len(lote) >= 2000:
+            Profissional.objects.using(banco).bulk_update(lote, ['busca'])
+            lote = []
+    Profissional.objects.using(banco).bulk_update(lote, ['busca'])
+
+
+def criar_indices(apps, schema_editor):
+    statements = {'postgresql': POSTGRES_SQL, 'sqlite': SQLITE_SQL}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def remover_indices(apps, schema_editor):
+    statements = {'postgresql': POSTGRES_REVERSE_SQL, 'sqlite': SQLITE_REVERSE_SQL}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profissional',
+            name='busca',
+            field=models.TextField(blank=True, editable=False, verbose_name='Texto de Busca'),
+        ),
+        migrations.RunPython(popular_busca, migrations.RunPython.noop),
+        migrations.RunPython(criar_indices, remover_indices),
+    ]
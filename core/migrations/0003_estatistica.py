@@ -0,0 +1,64 @@
+# Generated by Django 5.1.15 on 2026-10-17 20:50
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def popular_estatisticas(apps, schema_editor):
+    """
+    Contadores iniciais calculados das tabelas de origem (cópia de
+    core.stats.reconstruir_estatisticas nesta migração)
+    """
+    User = apps.get_model('core', 'User')
+    Profissional = apps.get_model('core', 'Profissional')
+    Estatistica = apps.get_model('core', 'Estatistica')
+    banco = schema_editor.connection.alias
+
+    totais = User.objects.using(banco).aggregate(
+        usuarios=Count('id'),
+        profissionais=Count('profissional', filter=Q(profissional__ativo=True)),
+        clientes=Count('cliente', filter=Q(cliente__ativo=True)),
+        usuarios_ativos=Count('id', filter=Q(is_active=True)),
+        usuarios_inativos=Count('id', filter=Q(is_active=False)),
+    )
+    contadores = Counter(totais)
+    for campo in ('tipo_usuario', 'sexo'):
+        for linha in User.objects.using(banco).order_by().values(campo).annotate(total=Count('id')):
+            contadores[f'{campo}:{linha[campo]}'] = linha['total']
+    cadastros = User.objects.using(banco).order_by().annotate(dia=TruncDate('criado_em')).values('dia')
+    for linha in cadastros.annotate(total=Count('id')):
+        contadores[f'cadastros:{linha["dia"].isoformat()}'] = linha['total']
+    especialidades = Profissional.objects.using(banco).filter(ativo=True).order_by().values('especialidade')
+    for linha in especialidades.annotate(total=Count('id')):
+        contadores[f'especialidade:{linha["especialidade"]}'] = linha['total']
+
+    Estatistica.objects.using(banco).bulk_create(
+        [Estatistica(chave=chave, valor=valor) for chave, valor in contadores.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_profissional_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Estatistica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chave', models.CharField(max_length=150, unique=True, verbose_name='Chave')),
+                ('valor', models.BigIntegerField(default=0, verbose_name='Valor')),
+            ],
+            options={
+                'verbose_name': 'Estatística',
+                'verbose_name_plural': 'Estatísticas',
+            },
+        ),
+        migrations.RunPython(popular_estatisticas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.15 on 2026-10-17 21:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+FTS_TABLE = 'core_profissional_busca'
+
+# Triggers da tabela FTS5 de busca, como criados na 0002
+SQLITE_SQL = [
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON core_profissional BEGIN"
+    f" INSERT INTO {FTS_TABLE}(rowid, busca) VALUES (new.id, new.busca); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON core_profissional BEGIN"
+    f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, busca) VALUES ('delete', old.id, old.busca); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF busca ON core_profissional BEGIN"
+    f" INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, busca) VALUES ('delete', old.id, old.busca);"
+    f" INSERT INTO {FTS_TABLE}(rowid, busca) VALUES (new.id, new.busca); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def recriar_indices(apps, schema_editor):
+    # No SQLite o AddField/RemoveField recria core_profissional e descarta
+    # os triggers que mantêm a tabela FTS5 de busca
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_estatistica'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recriar_indices),
+        migrations.AddField(
+            model_name='cliente',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Atualizado em'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='profissional',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Atualizado em'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(recriar_indices, migrations.RunPython.noop),
+    ]
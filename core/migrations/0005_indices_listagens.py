@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-17 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0004_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['usuario'], name='core_cliente_ativo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profissional',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['usuario'], name='core_prof_ativo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profissional',
+            index=models.Index(fields=['especialidade', 'ativo'], name='core_prof_espec_ativo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['nome', 'sobrenome', 'id'], name='core_user_nome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['tipo_usuario', 'criado_em'], name='core_user_tipo_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['criado_em'], name='core_user_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['atualizado_em'], name='core_user_atualizado_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 21:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_indices_listagens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='versao_token',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Versão dos tokens'),
+        ),
+    ]
@@ -0,0 +1,178 @@
+# Generated by Django 5.1.15 on 2026-10-17 21:33
+
+import re
+import unicodedata
+from datetime import time
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Cópia do estado de core.disponibilidade nesta migração: o módulo pode
+# mudar depois
+POSTGRES_SQL = [
+    'CREATE INDEX IF NOT EXISTS core_horario_intervalo_gist ON core_horariodisponivel'
+    " USING gist (int4range(inicio_semana, fim_semana, '[]'))",
+    'CREATE INDEX IF NOT EXISTS core_excecao_intervalo_gist ON core_excecaodisponibilidade'
+    ' USING gist (tstzrange(inicio, fim))',
+]
+
+POSTGRES_REVERSE_SQL = [
+    'DROP INDEX IF EXISTS core_excecao_intervalo_gist',
+    'DROP INDEX IF EXISTS core_horario_intervalo_gist',
+]
+
+DIAS = {'seg': 0, 'ter': 1, 'qua': 2, 'qui': 3, 'sex': 4, 'sab': 5, 'dom': 6}
+
+_DIA = r'(seg(?:unda)?|ter(?:ca)?|qua(?:rta)?|qui(?:nta)?|sex(?:ta)?|sab(?:ado)?|dom(?:ingo)?)(?:-?feira)?s?\b\.?'
+_HORA = r'(\d{1,2})(?:\s*[:h]\s*(\d{2}))?\s*(?:h|hs|hrs|horas)?'
+_TOKENS = re.compile(
+    rf'(?P<faixa_dias>\b{_DIA}\s*(?:a|ate|-)\s*{_DIA})'
+    rf'|(?P<faixa_horas>\b{_HORA}\s*(?:-|\ba\b|\bas\b|\bate\b)\s*{_HORA})'
+    rf'|(?P<dia>\b{_DIA})'
+    r'|(?P<todos>\btodos os dias\b|\bdiariamente\b)'
+    r'|(?P<uteis>\bdias uteis\b)'
+    r'|(?P<fim_semana>\bfins? de semana\b)'
+)
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def _horario(hora, minuto):
+    hora, minuto = int(hora), int(minuto or 0)
+    if hora == 24 and minuto == 0:
+        return time(23, 59)
+    if hora > 23 or minuto > 59:
+        return None
+    return time(hora, minuto)
+
+
+def _faixa_dias(primeiro, ultimo):
+    primeiro, ultimo = DIAS[primeiro[:3]], DIAS[ultimo[:3]]
+    return [(primeiro + passo) % 7 for passo in range((ultimo - primeiro) % 7 + 1)]
+
+
+def _interpretar(texto):
+    grupos = []
+    dias, horas = [], []
+    for token in _TOKENS.finditer(_normalizar(texto)):
+        tipo = token.lastgroup
+        if tipo == 'faixa_horas':
+            hora = re.findall(_HORA, token.group(tipo))
+            inicio, fim = _horario(*hora[0]), _horario(*hora[1])
+            if inicio is not None and fim is not None and inicio < fim:
+                horas.append((inicio, fim))
+            continue
+        if horas and dias:
+            grupos.append((dias, horas))
+            dias, horas = [], []
+        if tipo == 'faixa_dias':
+            primeiro, ultimo = re.findall(_DIA, token.group(tipo))
+            dias += _faixa_dias(primeiro, ultimo)
+        elif tipo == 'dia':
+            dias.append(DIAS[token.group(tipo)[:3]])
+        elif tipo == 'todos':
+            dias += range(7)
+        elif tipo == 'uteis':
+            dias += range(5)
+        else:
+            dias += [5, 6]
+    if dias and horas:
+        grupos.append((dias, horas))
+    return sorted({
+        (dia, inicio, fim) for dias, horas in grupos for dia in dias for inicio, fim in horas
+    })
+
+
+def _minuto_da_semana(dia_semana, horario):
+    return dia_semana * 24 * 60 + horario.hour * 60 + horario.minute
+
+
+def interpretar_horarios(apps, schema_editor):
+    """
+    Horários semanais a partir do `horario_atendimento` dos profissionais
+    """
+    Profissional = apps.get_model('core', 'Profissional')
+    Horario = apps.get_model('core', 'HorarioDisponivel')
+    banco = schema_editor.connection.alias
+    profissionais = Profissional.objects.using(banco).exclude(horario_atendimento='')
+    ultimo = 0
+    while True:
+        linhas = list(
+            profissionais.filter(pk__gt=ultimo).order_by('pk').values_list('pk', 'horario_atendimento')[:2000]
+        )
+        if not linhas:
+            return
+        ultimo = linhas[-1][0]
+        Horario.objects.using(banco).bulk_create([
+            Horario(
+                profissional_id=pk, dia_semana=dia, inicio=inicio, fim=fim,
+                inicio_semana=_minuto_da_semana(dia, inicio), fim_semana=_minuto_da_semana(dia, fim),
+            )
+            for pk, texto in linhas for dia, inicio, fim in _interpretar(texto)
+        ])
+
+
+def criar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_SQL:
+            schema_editor.execute(sql)
+
+
+def remover_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_REVERSE_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_versao_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcecaoDisponibilidade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField(verbose_name='Início')),
+                ('fim', models.DateTimeField(verbose_name='Fim')),
+                ('disponivel', models.BooleanField(default=False, verbose_name='Horário Extra')),
+                ('motivo', models.CharField(blank=True, max_length=200, verbose_name='Motivo')),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='excecoes', to='core.profissional', verbose_name='Profissional')),
+            ],
+            options={
+                'verbose_name': 'Exceção de Disponibilidade',
+                'verbose_name_plural': 'Exceções de Disponibilidade',
+                'ordering': ['inicio'],
+                'indexes': [models.Index(condition=models.Q(('disponivel', False)), fields=['fim', 'inicio', 'profissional'], name='core_excecao_bloqueio_idx'), models.Index(condition=models.Q(('disponivel', True)), fields=['fim', 'inicio', 'profissional'], name='core_excecao_extra_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('fim__gt', models.F('inicio'))), name='core_excecao_fim_apos_inicio')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HorarioDisponivel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Segunda-feira'), (1, 'Terça-feira'), (2, 'Quarta-feira'), (3, 'Quinta-feira'), (4, 'Sexta-feira'), (5, 'Sábado'), (6, 'Domingo')], verbose_name='Dia da Semana')),
+                ('inicio', models.TimeField(verbose_name='Início')),
+                ('fim', models.TimeField(verbose_name='Fim')),
+                ('inicio_semana', models.PositiveIntegerField(editable=False, verbose_name='Início na Semana')),
+                ('fim_semana', models.PositiveIntegerField(editable=False, verbose_name='Fim na Semana')),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='core.profissional', verbose_name='Profissional')),
+            ],
+            options={
+                'verbose_name': 'Horário Disponível',
+                'verbose_name_plural': 'Horários Disponíveis',
+                'ordering': ['dia_semana', 'inicio'],
+                'indexes': [models.Index(fields=['inicio_semana', 'fim_semana', 'profissional'], name='core_horario_intervalo_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('fim__gt', models.F('inicio'))), name='core_horario_fim_apos_inicio')],
+            },
+        ),
+        migrations.RunPython(criar_indices, remover_indices),
+        migrations.RunPython(interpretar_horarios, migrations.RunPython.noop),
+    ]
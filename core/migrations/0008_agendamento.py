@@ -0,0 +1,104 @@
+# Generated by Django 5.1.15 on 2026-10-17 21:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Cópia do estado de core.agendamentos nesta migração: o módulo pode mudar
+# depois
+RESTRICAO_CONFLITO = 'core_agendamento_sem_conflito'
+RESTRICAO_DURACAO = 'core_agendamento_duracao_maxima'
+
+_HORAS_MAXIMAS = 12
+
+# PostgreSQL: exclusion constraint sobre o intervalo [início, fim) de cada
+# profissional; o índice GiST da constraint resolve a verificação
+POSTGRES_SQL = [
+    'CREATE EXTENSION IF NOT EXISTS btree_gist',
+    f'ALTER TABLE core_agendamento ADD CONSTRAINT {RESTRICAO_CONFLITO}'
+    " EXCLUDE USING gist (profissional_id WITH =, tstzrange(inicio, fim) WITH &&) WHERE (status = 'agendado')",
+    f'ALTER TABLE core_agendamento ADD CONSTRAINT {RESTRICAO_DURACAO}'
+    f" CHECK (fim <= inicio + interval '{_HORAS_MAXIMAS} hours')",
+]
+
+POSTGRES_REVERSE_SQL = [
+    f'ALTER TABLE core_agendamento DROP CONSTRAINT IF EXISTS {RESTRICAO_DURACAO}',
+    f'ALTER TABLE core_agendamento DROP CONSTRAINT IF EXISTS {RESTRICAO_CONFLITO}',
+]
+
+# SQLite: gatilhos que rodam dentro da escrita, com o banco travado para
+# outros escritores. A busca percorre só os inícios das últimas
+# _HORAS_MAXIMAS horas do profissional (core_agendamento_agenda_idx)
+_SQLITE_GATILHO = f"""
+CREATE TRIGGER IF NOT EXISTS {{nome}}
+BEFORE {{evento}} ON core_agendamento
+WHEN NEW.status = 'agendado'
+BEGIN
+    SELECT RAISE(ABORT, '{RESTRICAO_DURACAO}')
+    WHERE NEW.fim > datetime(NEW.inicio, '+{_HORAS_MAXIMAS} hours');
+    SELECT RAISE(ABORT, '{RESTRICAO_CONFLITO}')
+    WHERE EXISTS (
+        SELECT 1 FROM core_agendamento
+        WHERE profissional_id = NEW.profissional_id AND status = 'agendado'
+          AND inicio >= datetime(NEW.inicio, '-{_HORAS_MAXIMAS} hours')
+          AND inicio < NEW.fim AND fim > NEW.inicio{{outros}}
+    );
+END
+"""
+
+SQLITE_SQL = [
+    _SQLITE_GATILHO.format(nome=f'{RESTRICAO_CONFLITO}_insert', evento='INSERT', outros=''),
+    _SQLITE_GATILHO.format(
+        nome=f'{RESTRICAO_CONFLITO}_update', evento='UPDATE OF profissional_id, inicio, fim, status',
+        outros=' AND id <> NEW.id',
+    ),
+]
+
+SQLITE_REVERSE_SQL = [
+    f'DROP TRIGGER IF EXISTS {RESTRICAO_CONFLITO}_update',
+    f'DROP TRIGGER IF EXISTS {RESTRICAO_CONFLITO}_insert',
+]
+
+
+def criar_restricoes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for sql in POSTGRES_SQL if vendor == 'postgresql' else SQLITE_SQL if vendor == 'sqlite' else []:
+        schema_editor.execute(sql)
+
+
+def remover_restricoes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for sql in POSTGRES_REVERSE_SQL if vendor == 'postgresql' else SQLITE_REVERSE_SQL if vendor == 'sqlite' else []:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_disponibilidade'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Agendamento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('inicio', models.DateTimeField(verbose_name='Início')),
+                ('fim', models.DateTimeField(verbose_name='Fim')),
+                ('status', models.CharField(choices=[('agendado', 'Agendado'), ('cancelado', 'Cancelado')], default='agendado', max_length=20, verbose_name='Status')),
+                ('observacoes', models.TextField(blank=True, verbose_name='Observações')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agendamentos', to='core.cliente', verbose_name='Cliente')),
+                ('profissional', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='agendamentos', to='core.profissional', verbose_name='Profissional')),
+            ],
+            options={
+                'verbose_name': 'Agendamento',
+                'verbose_name_plural': 'Agendamentos',
+                'ordering': ['inicio'],
+                'indexes': [models.Index(condition=models.Q(('status', 'agendado')), fields=['profissional', 'inicio', 'fim'], name='core_agendamento_agenda_idx'), models.Index(condition=models.Q(('status', 'agendado')), fields=['inicio', 'fim', 'profissional'], name='core_agendamento_inicio_idx'), models.Index(fields=['cliente', 'inicio'], name='core_agendamento_cliente_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('fim__gt', models.F('inicio'))), name='core_agendamento_fim_apos_inicio')],
+            },
+        ),
+        migrations.RunPython(criar_restricoes, remover_restricoes),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-17 21:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_agendamento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroExcluido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recurso', models.CharField(choices=[('profissionais', 'Profissionais'), ('clientes', 'Clientes')], max_length=20, verbose_name='Recurso')),
+                ('objeto_id', models.PositiveBigIntegerField(verbose_name='ID do Registro')),
+                ('excluido_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Excluído em')),
+            ],
+            options={
+                'verbose_name': 'Registro Excluído',
+                'verbose_name_plural': 'Registros Excluídos',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['atualizado_em', 'id'], name='core_cliente_atualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profissional',
+            index=models.Index(fields=['atualizado_em', 'id'], name='core_prof_atualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registroexcluido',
+            index=models.Index(fields=['recurso', 'excluido_em', 'objeto_id'], name='core_excluido_sync_idx'),
+        ),
+    ]
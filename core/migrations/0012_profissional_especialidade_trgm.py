@@ -0,0 +1,43 @@
+# Generated by Django 5.1.15 on 2026-10-17 22:31
+
+from django.db import migrations
+
+
+# `especialidade__icontains` gera UPPER("especialidade"::text) LIKE '%...%',
+# que um b-tree não atende; o índice usa a mesma expressão. A extensão
+# pg_trgm vem da migração 0002
+POSTGRES_SQL = [
+    'CREATE INDEX IF NOT EXISTS core_prof_espec_trgm'
+    ' ON core_profissional USING gin ((UPPER(especialidade::text)) gin_trgm_ops)',
+]
+
+POSTGRES_REVERSE_SQL = [
+    'DROP INDEX IF EXISTS core_prof_espec_trgm',
+]
+
+
+def criar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_SQL:
+            schema_editor.execute(sql)
+
+
+def remover_indices(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_REVERSE_SQL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_user_busca'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='profissional',
+            name='core_prof_espec_ativo_idx',
+        ),
+        migrations.RunPython(criar_indices, remover_indices),
+    ]
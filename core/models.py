@@ -1,6 +1,11 @@
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import RegexValidator
+from django.utils import timezone
+
+from .search import documento_profissional, documento_usuario
 
 
 class User(AbstractUser):
@@ -54,14 +59,45 @@ class User(AbstractUser):
     criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
     atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
     
+    # Incrementada no logout e na troca de senha: revoga os tokens assinados
+    versao_token = models.PositiveIntegerField(default=0, editable=False, verbose_name="Versão dos tokens")
+    
+    # Busca do admin (nome, sobrenome, username e email normalizados)
+    busca = models.TextField(blank=True, editable=False, verbose_name="Texto de Busca")
+    
     class Meta:
         verbose_name = "Usuário"
         verbose_name_plural = "Usuários"
         ordering = ['nome', 'sobrenome']
+        indexes = [
+            # Ordenação das listagens (inclusive de profissionais e clientes)
+            models.Index(fields=['nome', 'sobrenome', 'id'], name='core_user_nome_idx'),
+            # Filtros do admin
+            models.Index(fields=['tipo_usuario', 'criado_em'], name='core_user_tipo_criado_idx'),
+            models.Index(fields=['criado_em'], name='core_user_criado_idx'),
+            # Validador de GET condicional (MAX(atualizado_em))
+            models.Index(fields=['atualizado_em'], name='core_user_atualizado_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nome} {self.sobrenome}"
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # _password só fica preenchido após set_password (o rehash feito no
+        # login o descarta antes de salvar)
+        if self._password is not None and not self._state.adding:
+            self.versao_token += 1
+            if update_fields is not None:
+                update_fields = kwargs['update_fields'] = {*update_fields, 'versao_token'}
+        # Documento de busca no mesmo INSERT/UPDATE, como em Profissional
+        if update_fields is None:
+            self.busca = documento_usuario(self)
+        elif set(update_fields) & {'nome', 'sobrenome', 'username', 'email'}:
+            self.busca = documento_usuario(self)
+            kwargs['update_fields'] = {*update_fields, 'busca'}
+        super().save(*args, **kwargs)
+    
     @property
     def nome_completo(self):
         return f"{self.nome} {self.sobrenome}"
@@ -103,18 +139,154 @@ class Profissional(models.Model):
     # Status
     ativo = models.BooleanField(default=True, verbose_name="Ativo")
     
+    # Busca (nome, especialidade, clínica e registro normalizados)
+    busca = models.TextField(blank=True, editable=False, verbose_name="Texto de Busca")
+    
+    # Auditoria
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+    
     class Meta:
         verbose_name = "Profissional"
         verbose_name_plural = "Profissionais"
+        indexes = [
+            # Listagens filtram apenas profissionais ativos
+            models.Index(
+                fields=['usuario'], condition=models.Q(ativo=True), name='core_prof_ativo_idx',
+            ),
+            # `?especialidade=` (icontains): no PostgreSQL, índice GIN de
+            # trigramas sobre UPPER(especialidade), criado pela migração 0012
+            # Sincronização incremental (ver core.sync)
+            models.Index(fields=['atualizado_em', 'id'], name='core_prof_atualizado_idx'),
+        ]
     
     def __str__(self):
         return f"Dr(a). {self.usuario.nome_completo}"
     
+    def save(self, *args, **kwargs):
+        # O documento de busca vai no mesmo UPDATE; com update_fields, só
+        # quando algum campo do documento é gravado (o nome do usuário é
+        # propagado pelo sinal de User)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.busca = documento_profissional(self)
+        elif set(update_fields) & {'especialidade', 'clinica', 'registro_profissional', 'usuario'}:
+            self.busca = documento_profissional(self)
+            kwargs['update_fields'] = {*update_fields, 'busca'}
+        super().save(*args, **kwargs)
+    
     @property
     def nome_completo(self):
         return self.usuario.nome_completo
 
 
+MINUTOS_DIA = 24 * 60
+
+
+def minuto_da_semana(dia_semana, horario):
+    """
+    Minutos desde segunda-feira 00:00 (dia_semana 0) até `horario` do dia
+    """
+    return dia_semana * MINUTOS_DIA + horario.hour * 60 + horario.minute
+
+
+class HorarioDisponivel(models.Model):
+    """
+    Horário semanal recorrente de atendimento de um profissional
+    """
+    DIA_SEMANA_CHOICES = [
+        (0, 'Segunda-feira'),
+        (1, 'Terça-feira'),
+        (2, 'Quarta-feira'),
+        (3, 'Quinta-feira'),
+        (4, 'Sexta-feira'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+    
+    profissional = models.ForeignKey(
+        Profissional,
+        on_delete=models.CASCADE,
+        related_name='horarios',
+        verbose_name="Profissional"
+    )
+    dia_semana = models.PositiveSmallIntegerField(choices=DIA_SEMANA_CHOICES, verbose_name="Dia da Semana")
+    inicio = models.TimeField(verbose_name="Início")
+    fim = models.TimeField(verbose_name="Fim")
+    
+    # Intervalo em minutos desde segunda 00:00, para a busca por horário
+    inicio_semana = models.PositiveIntegerField(editable=False, verbose_name="Início na Semana")
+    fim_semana = models.PositiveIntegerField(editable=False, verbose_name="Fim na Semana")
+    
+    class Meta:
+        verbose_name = "Horário Disponível"
+        verbose_name_plural = "Horários Disponíveis"
+        ordering = ['dia_semana', 'inicio']
+        indexes = [
+            # Quem atende no intervalo: busca pelo início, fim e profissional
+            # lidos do próprio índice (no PostgreSQL há também um GiST)
+            models.Index(
+                fields=['inicio_semana', 'fim_semana', 'profissional'], name='core_horario_intervalo_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(fim__gt=models.F('inicio')), name='core_horario_fim_apos_inicio'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_dia_semana_display()} {self.inicio:%H:%M}-{self.fim:%H:%M}"
+    
+    def save(self, *args, **kwargs):
+        self.calcular_intervalo()
+        super().save(*args, **kwargs)
+    
+    def calcular_intervalo(self):
+        """
+        Preenche inicio_semana/fim_semana (chamar antes de bulk_create)
+        """
+        self.inicio_semana = minuto_da_semana(self.dia_semana, self.inicio)
+        self.fim_semana = minuto_da_semana(self.dia_semana, self.fim)
+
+
+class ExcecaoDisponibilidade(models.Model):
+    """
+    Exceção à agenda semanal: bloqueio (férias, feriado) ou horário extra
+    """
+    profissional = models.ForeignKey(
+        Profissional,
+        on_delete=models.CASCADE,
+        related_name='excecoes',
+        verbose_name="Profissional"
+    )
+    inicio = models.DateTimeField(verbose_name="Início")
+    fim = models.DateTimeField(verbose_name="Fim")
+    disponivel = models.BooleanField(default=False, verbose_name="Horário Extra")
+    motivo = models.CharField(max_length=200, blank=True, verbose_name="Motivo")
+    
+    class Meta:
+        verbose_name = "Exceção de Disponibilidade"
+        verbose_name_plural = "Exceções de Disponibilidade"
+        ordering = ['inicio']
+        indexes = [
+            # Sobreposição com o intervalo consultado: pelo fim, só as
+            # exceções futuras são percorridas
+            models.Index(
+                fields=['fim', 'inicio', 'profissional'], condition=models.Q(disponivel=False),
+                name='core_excecao_bloqueio_idx',
+            ),
+            models.Index(
+                fields=['fim', 'inicio', 'profissional'], condition=models.Q(disponivel=True),
+                name='core_excecao_extra_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(fim__gt=models.F('inicio')), name='core_excecao_fim_apos_inicio'),
+        ]
+    
+    def __str__(self):
+        tipo = 'Extra' if self.disponivel else 'Bloqueio'
+        return f"{tipo}: {self.inicio:%d/%m/%Y %H:%M} - {self.fim:%d/%m/%Y %H:%M}"
+
+
 class Cliente(models.Model):
     """
     Modelo específico para clientes (pessoas físicas)
@@ -138,9 +310,18 @@ class Cliente(models.Model):
     # Status
     ativo = models.BooleanField(default=True, verbose_name="Ativo")
     
+    # Auditoria
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+    
     class Meta:
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
+        indexes = [
+            models.Index(
+                fields=['usuario'], condition=models.Q(ativo=True), name='core_cliente_ativo_idx',
+            ),
+            models.Index(fields=['atualizado_em', 'id'], name='core_cliente_atualizado_idx'),
+        ]
     
     def __str__(self):
         return self.usuario.nome_completo
@@ -148,3 +329,106 @@ class Cliente(models.Model):
     @property
     def nome_completo(self):
         return self.usuario.nome_completo
+
+
+class Agendamento(models.Model):
+    """
+    Consulta de um cliente com um profissional. A sobreposição de
+    agendamentos do mesmo profissional é recusada pelo banco (ver
+    core.agendamentos)
+    """
+    STATUS_CHOICES = [
+        ('agendado', 'Agendado'),
+        ('cancelado', 'Cancelado'),
+    ]
+    
+    # Limite que mantém a busca por sobreposição dentro de uma faixa do índice
+    DURACAO_MAXIMA = timedelta(hours=12)
+    
+    profissional = models.ForeignKey(
+        Profissional,
+        on_delete=models.CASCADE,
+        related_name='agendamentos',
+        verbose_name="Profissional"
+    )
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        related_name='agendamentos',
+        verbose_name="Cliente"
+    )
+    inicio = models.DateTimeField(verbose_name="Início")
+    fim = models.DateTimeField(verbose_name="Fim")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='agendado', verbose_name="Status")
+    observacoes = models.TextField(blank=True, verbose_name="Observações")
+    
+    # Auditoria
+    criado_em = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+    atualizado_em = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+    
+    class Meta:
+        verbose_name = "Agendamento"
+        verbose_name_plural = "Agendamentos"
+        ordering = ['inicio']
+        indexes = [
+            # Agenda do profissional e verificação de conflito: faixa de
+            # início por profissional, com o fim lido do próprio índice
+            models.Index(
+                fields=['profissional', 'inicio', 'fim'], condition=models.Q(status='agendado'),
+                name='core_agendamento_agenda_idx',
+            ),
+            # Profissionais ocupados em um intervalo (busca de disponíveis)
+            models.Index(
+                fields=['inicio', 'fim', 'profissional'], condition=models.Q(status='agendado'),
+                name='core_agendamento_inicio_idx',
+            ),
+            models.Index(fields=['cliente', 'inicio'], name='core_agendamento_cliente_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(fim__gt=models.F('inicio')), name='core_agendamento_fim_apos_inicio',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.cliente} com {self.profissional}: {self.inicio:%d/%m/%Y %H:%M}"
+
+
+class RegistroExcluido(models.Model):
+    """
+    Marca da exclusão de um profissional ou cliente, entregue pela
+    sincronização incremental aos aplicativos que já tinham o registro
+    """
+    RECURSO_CHOICES = [
+        ('profissionais', 'Profissionais'),
+        ('clientes', 'Clientes'),
+    ]
+    
+    recurso = models.CharField(max_length=20, choices=RECURSO_CHOICES, verbose_name="Recurso")
+    objeto_id = models.PositiveBigIntegerField(verbose_name="ID do Registro")
+    excluido_em = models.DateTimeField(default=timezone.now, verbose_name="Excluído em")
+    
+    class Meta:
+        verbose_name = "Registro Excluído"
+        verbose_name_plural = "Registros Excluídos"
+        indexes = [
+            models.Index(fields=['recurso', 'excluido_em', 'objeto_id'], name='core_excluido_sync_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.recurso} #{self.objeto_id}"
+
+
+class Estatistica(models.Model):
+    """
+    Contador de estatísticas de usuários, mantido incrementalmente por sinais
+    """
+    chave = models.CharField(max_length=150, unique=True, verbose_name="Chave")
+    valor = models.BigIntegerField(default=0, verbose_name="Valor")
+    
+    class Meta:
+        verbose_name = "Estatística"
+        verbose_name_plural = "Estatísticas"
+    
+    def __str__(self):
+        return f"{self.chave}: {self.valor}"
@@ -0,0 +1,188 @@
+import base64
+import binascii
+import json
+from functools import partial
+
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimar_contagem(queryset):
+    """
+    Total estimado pelas estatísticas do planejador do PostgreSQL, sem COUNT(*).
+    Em outros bancos faz a contagem exata.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plano = cursor.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator que usa o total estimado no lugar de COUNT(*)
+    """
+
+    @cached_property
+    def count(self):
+        return estimar_contagem(self.object_list)
+
+
+class KnownCountPaginator(Paginator):
+    """
+    Paginator com o total já calculado (ex.: pelo validador de GET condicional)
+    """
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+
+def keyset_ordering(queryset):
+    """
+    Campos de ordenação do queryset, com a chave primária como desempate
+    """
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+    if not any(campo.lstrip('-') in ('pk', 'id') for campo in ordering):
+        ordering.append('pk')
+    return ordering
+
+
+def keyset_filter(ordering, valores, reverso=False):
+    """
+    Condição de busca (seek) para os registros posteriores à posição `valores`
+    """
+    condicao = Q()
+    for i, campo in enumerate(ordering):
+        nome = campo.lstrip('-')
+        decrescente = campo.startswith('-') != reverso
+        termo = Q(**{f'{nome}__{"lt" if decrescente else "gt"}': valores[i]})
+        for anterior, valor in zip(ordering[:i], valores[:i]):
+            termo &= Q(**{anterior.lstrip('-'): valor})
+        condicao |= termo
+    # Limite na primeira coluna para permitir range scan no índice
+    primeiro = ordering[0].lstrip('-')
+    decrescente = ordering[0].startswith('-') != reverso
+    limite = Q(**{f'{primeiro}__{"lte" if decrescente else "gte"}': valores[0]})
+    return limite & condicao
+
+
+def valor_do_campo(obj, campo):
+    for parte in campo.lstrip('-').split('__'):
+        obj = getattr(obj, parte)
+    return obj
+
+
+class DirectoryPagination(PageNumberPagination):
+    """
+    Paginação por página (padrão) com modo cursor/keyset opcional.
+
+    - `?cursor=` ativa o modo keyset: busca pela ordenação do queryset
+      (ex.: nome, sobrenome, id), sem OFFSET e sem COUNT(*).
+    - `?contagem=estimada` retorna o total estimado pelo planejador do
+      PostgreSQL no lugar da contagem exata.
+    - Se a view já conhece o total do queryset (`view.known_count`), ele é
+      reaproveitado no lugar de um novo COUNT(*).
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'contagem'
+
+    keyset = False
+    estimated = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.estimated = request.query_params.get(self.count_query_param) == 'estimada'
+        self.keyset = self.cursor_query_param in request.query_params
+        if not self.keyset:
+            if self.estimated:
+                self.django_paginator_class = EstimatedCountPaginator
+            elif getattr(view, 'known_count', None) is not None:
+                self.django_paginator_class = partial(KnownCountPaginator, count=view.known_count)
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_keyset(queryset, request)
+
+    def paginate_keyset(self, queryset, request):
+        page_size = self.get_page_size(request)
+        self.ordering = keyset_ordering(queryset)
+        posicao, reverso = self.decode_cursor(request)
+
+        self.estimated_count = estimar_contagem(queryset) if self.estimated else None
+
+        if posicao is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, posicao, reverso))
+        if reverso:
+            ordering = [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in self.ordering]
+        else:
+            ordering = self.ordering
+        results = list(queryset.order_by(*ordering)[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverso:
+            results.reverse()
+            self.has_next, self.has_previous = posicao is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, posicao is not None
+
+        self.results = results
+        return results
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            posicao, reverso = payload['p'], bool(payload.get('r', False))
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound('Cursor inválido.')
+        if not isinstance(posicao, list) or len(posicao) != len(self.ordering):
+            raise NotFound('Cursor inválido.')
+        return posicao, reverso
+
+    def encode_cursor(self, obj, reverso):
+        posicao = [valor_do_campo(obj, campo) for campo in self.ordering]
+        payload = json.dumps({'p': posicao, 'r': reverso}, cls=DjangoJSONEncoder)
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(self.results[-1], reverso=False)
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        if not self.has_previous or not self.results:
+            return None
+        return self.encode_cursor(self.results[0], reverso=True)
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.estimated_count is not None:
+            response = {'count': self.estimated_count, **response}
+        return Response(response)
@@ -0,0 +1,125 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+
+# Banco das leituras da requisição atual (None = primário)
+_banco_leitura = ContextVar('banco_leitura', default=None)
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def _sticky_cache():
+    return caches[getattr(settings, 'REPLICA_STICKY_CACHE_ALIAS', 'default')]
+
+
+def _sticky_key(user_id):
+    return f'replica:primario:{user_id}'
+
+
+def marcar_escrita(user):
+    """
+    Envia ao primário as leituras do usuário pelos próximos
+    REPLICA_STICKY_SECONDS segundos (leia-suas-escritas)
+    """
+    segundos = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+    if user is not None and user.pk is not None and get_replicas() and segundos:
+        _sticky_cache().set(_sticky_key(user.pk), 1, timeout=segundos)
+
+
+def escreveu_recentemente(user):
+    return bool(user and user.is_authenticated and _sticky_cache().get(_sticky_key(user.pk)))
+
+
+def escolher_replica(user):
+    """
+    Réplica para as leituras do usuário, ou None quando devem ir ao primário
+    """
+    replicas = get_replicas()
+    if not replicas or escreveu_recentemente(user):
+        return None
+    return random.choice(replicas)
+
+
+@contextmanager
+def leitura_em_replica(user):
+    """
+    Direciona à réplica as leituras feitas dentro do bloco
+    """
+    token = _banco_leitura.set(escolher_replica(user))
+    try:
+        yield
+    finally:
+        _banco_leitura.reset(token)
+
+
+@contextmanager
+def leitura_no_primario():
+    token = _banco_leitura.set(None)
+    try:
+        yield
+    finally:
+        _banco_leitura.reset(token)
+
+
+def banco_leitura():
+    return _banco_leitura.get()
+
+
+class ReplicaRouter:
+    """
+    Escritas sempre no primário; leituras no primário, exceto dentro de
+    `leitura_em_replica` (views somente leitura marcadas com
+    ReplicaReadMixin ou @leitura_replica)
+    """
+
+    def db_for_read(self, model, **hints):
+        return banco_leitura() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário
+        bancos = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Mixin de ViewSet que lê das réplicas nas ações de `replica_actions`.
+
+    A autenticação e as permissões rodam antes, no primário; o usuário que
+    escreveu há pouco continua lendo do primário.
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def dispatch(self, request, *args, **kwargs):
+        with leitura_no_primario():
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            _banco_leitura.set(escolher_replica(request.user))
+
+
+def leitura_replica(view):
+    """
+    Decorador de function-based views (abaixo de @api_view) que lê das
+    réplicas, com as mesmas regras do ReplicaReadMixin
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with leitura_em_replica(request.user):
+            return view(request, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,115 @@
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+
+# Tabela FTS5 espelho de core_profissional.busca no SQLite; no PostgreSQL,
+# índices GIN sobre a coluna (migração 0002)
+FTS_TABLE = 'core_profissional_busca'
+
+# Idem para core_user.busca, usada pelo admin (migração 0011)
+FTS_TABLE_USUARIOS = 'core_user_busca'
+
+
+def normalizar_busca(texto):
+    """
+    Normaliza texto para busca: sem acentos, minúsculo e espaços simples
+    """
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def documento_profissional(profissional):
+    """
+    Documento de busca do profissional: nome, especialidade, clínica e registro
+    """
+    usuario = profissional.usuario
+    return normalizar_busca(' '.join([
+        usuario.nome, usuario.sobrenome, profissional.especialidade,
+        profissional.clinica, profissional.registro_profissional,
+    ]))
+
+
+def documento_usuario(usuario):
+    """
+    Documento de busca do usuário: nome, sobrenome, username e email
+    """
+    return normalizar_busca(' '.join([
+        usuario.nome, usuario.sobrenome, usuario.username, usuario.email or '',
+    ]))
+
+
+def termos_busca(termo):
+    return re.findall(r'\w+', normalizar_busca(termo))
+
+
+def consulta_fts(termos):
+    return ' '.join(f'"{parte}"*' for parte in termos)
+
+
+def filtrar_busca(queryset, termos, fts_table):
+    """
+    Registros cujo `busca` contém todos os termos: tabela FTS5 `fts_table`
+    no SQLite (início de palavra), `busca LIKE` nos demais bancos (trigrama
+    no PostgreSQL)
+    """
+    if connections[queryset.db].vendor == 'sqlite':
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s', [consulta_fts(termos)]
+        ))
+    for parte in termos:
+        queryset = queryset.filter(busca__contains=parte)
+    return queryset
+
+
+def buscar_usuarios(queryset, termo):
+    """
+    Filtra usuários pelo documento de busca (nome, sobrenome, username e
+    email), sem acentos nem diferença de maiúsculas
+    """
+    termos = termos_busca(termo)
+    if not termos:
+        return queryset.none()
+    return filtrar_busca(queryset, termos, FTS_TABLE_USUARIOS)
+
+
+def buscar_profissionais(queryset, termo):
+    """
+    Filtra e ordena profissionais por relevância para o termo `termo`.
+
+    No PostgreSQL usa os índices GIN (trigrama e tsvector) sobre
+    `Profissional.busca`; no SQLite usa a tabela FTS5 espelho.
+    """
+    termos = termos_busca(termo)
+    if not termos:
+        return queryset.none()
+
+    queryset = filtrar_busca(queryset, termos, FTS_TABLE)
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        consulta = ' '.join(termos)
+        rank = RawSQL(
+            "word_similarity(%s, core_profissional.busca)"
+            " + ts_rank(to_tsvector('simple', core_profissional.busca),"
+            " plainto_tsquery('simple', %s))",
+            [consulta, consulta],
+            output_field=FloatField(),
+        )
+    elif vendor == 'sqlite':
+        rank = RawSQL(
+            f'SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE}'
+            f' WHERE {FTS_TABLE} MATCH %s AND rowid = core_profissional.id',
+            [consulta_fts(termos)],
+            output_field=FloatField(),
+        )
+    else:
+        return queryset
+
+    return queryset.annotate(rank=rank).order_by(
+        '-rank', 'usuario__nome', 'usuario__sobrenome', 'id'
+    )
+
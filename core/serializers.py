@@ -1,6 +1,15 @@
 from rest_framework import serializers
+from rest_framework.utils.field_mapping import get_unique_error_message
+from rest_framework.validators import UniqueValidator
 from django.contrib.auth import authenticate
-from .models import User, Profissional, Cliente
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .agendamentos import gravar, validar_intervalo
+from .instrumentation import medir
+from .models import User, Profissional, Cliente, Agendamento
+from .sparse_fields import aplicar_selecao
 
 
 class HealthCheckSerializer(serializers.Serializer):
@@ -11,11 +20,84 @@ class HealthCheckSerializer(serializers.Serializer):
     message = serializers.CharField(default="API is running")
 
 
-class UserSerializer(serializers.ModelSerializer):
+class DynamicFieldsMixin:
+    """
+    Aceita os argumentos `fields` e `exclude` para restringir os campos
+    (`usuario.nome` seleciona campos do serializer aninhado).
+    
+    `source_fields` declara os campos do modelo lidos por propriedades.
+    """
+    source_fields = {}
+    
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        exclude = kwargs.pop('exclude', None)
+        super().__init__(*args, **kwargs)
+        aplicar_selecao(self, fields, exclude)
+
+
+def erros_de_unicidade(exc, serializer):
+    """
+    Erros de validação ({campo: [mensagem]}, aninhados como no serializer)
+    correspondentes ao IntegrityError de uma constraint única, ou None se a
+    violação não é de um campo do serializer
+    """
+    mensagem = str(exc)
+    model = serializer.Meta.model
+    tabela = model._meta.db_table
+    for nome, field in serializer.fields.items():
+        if isinstance(field, serializers.ModelSerializer):
+            erros = erros_de_unicidade(exc, field)
+            if erros:
+                return {nome: erros}
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not model_field.unique or model_field.primary_key:
+            continue
+        # SQLite: "UNIQUE constraint failed: core_user.cpf";
+        # PostgreSQL: 'violates unique constraint "core_user_cpf_..._uniq"'
+        coluna = model_field.column
+        if f'{tabela}.{coluna}' in mensagem or f'"{tabela}_{coluna}_' in mensagem:
+            return {nome: [get_unique_error_message(model_field)]}
+    return None
+
+
+class UnicidadeNoBancoMixin:
+    """
+    Mixin de serializer de criação sem os UniqueValidator (um SELECT por
+    campo único): a constraint do banco decide e a violação vira a mesma
+    ValidationError no campo.
+
+    `save()` roda em uma transação; chamado dentro de outra, participa dela
+    sem savepoint, e uma violação desfaz a transação inteira.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for field in fields.values():
+            field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+        return fields
+
+    def save(self, **kwargs):
+        try:
+            with transaction.atomic(savepoint=False):
+                return super().save(**kwargs)
+        except IntegrityError as exc:
+            erros = erros_de_unicidade(exc, self)
+            if erros is None:
+                raise
+            raise serializers.ValidationError(erros)
+
+
+class UserSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer para o modelo User
     """
     nome_completo = serializers.ReadOnlyField()
+    source_fields = {'nome_completo': ['nome', 'sobrenome']}
     
     class Meta:
         model = User
@@ -27,7 +109,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'criado_em', 'atualizado_em']
 
 
-class UserCreateSerializer(serializers.ModelSerializer):
+class UserCreateSerializer(UnicidadeNoBancoMixin, serializers.ModelSerializer):
     """
     Serializer para criação de usuários
     """
@@ -50,10 +132,13 @@ class UserCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password_confirmation')
         password = validated_data.pop('password')
-        user = User.objects.create(**validated_data)
-        user.set_password(password)
-        user.save()
-        return user
+        # Hash calculado antes do INSERT (ou já pronto, nas views
+        # assíncronas): uma única escrita, sem o save() do set_password
+        senha_hash = validated_data.pop('senha_hash', None)
+        if senha_hash is None:
+            with medir('hash'):
+                senha_hash = make_password(password)
+        return User.objects.create(**validated_data, password=senha_hash)
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
@@ -67,13 +152,23 @@ class UserUpdateSerializer(serializers.ModelSerializer):
             'telefone', 'endereco'
         ]
 
+    def update(self, instance, validated_data):
+        """
+        Grava apenas os campos enviados (e atualizado_em)
+        """
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        instance.save(update_fields=[*validated_data, 'atualizado_em'])
+        return instance
+
 
-class ProfissionalSerializer(serializers.ModelSerializer):
+class ProfissionalSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer para o modelo Profissional
     """
     usuario = UserSerializer(read_only=True)
     nome_completo = serializers.ReadOnlyField()
+    source_fields = {'nome_completo': ['usuario__nome', 'usuario__sobrenome']}
     
     class Meta:
         model = Profissional
@@ -85,7 +180,7 @@ class ProfissionalSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class ProfissionalCreateSerializer(serializers.ModelSerializer):
+class ProfissionalCreateSerializer(UnicidadeNoBancoMixin, serializers.ModelSerializer):
     """
     Serializer para criação de profissionais
     """
@@ -103,12 +198,13 @@ class ProfissionalCreateSerializer(serializers.ModelSerializer):
         return profissional
 
 
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """
     Serializer para o modelo Cliente
     """
     usuario = UserSerializer(read_only=True)
     nome_completo = serializers.ReadOnlyField()
+    source_fields = {'nome_completo': ['usuario__nome', 'usuario__sobrenome']}
     
     class Meta:
         model = Cliente
@@ -119,7 +215,7 @@ class ClienteSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class ClienteCreateSerializer(serializers.ModelSerializer):
+class ClienteCreateSerializer(UnicidadeNoBancoMixin, serializers.ModelSerializer):
     """
     Serializer para criação de clientes
     """
@@ -137,19 +233,80 @@ class ClienteCreateSerializer(serializers.ModelSerializer):
         return cliente
 
 
-class LoginSerializer(serializers.Serializer):
+class AgendamentoSerializer(serializers.ModelSerializer):
     """
-    Serializer para autenticação
+    Serializer para agendamentos. Quem não é administrador só agenda como
+    o próprio cliente ou profissional
+    """
+    profissional = serializers.PrimaryKeyRelatedField(queryset=Profissional.objects.filter(ativo=True))
+    cliente = serializers.PrimaryKeyRelatedField(queryset=Cliente.objects.filter(ativo=True))
+    
+    class Meta:
+        model = Agendamento
+        fields = [
+            'id', 'profissional', 'cliente', 'inicio', 'fim', 'status',
+            'observacoes', 'criado_em', 'atualizado_em'
+        ]
+        read_only_fields = ['id', 'status', 'criado_em', 'atualizado_em']
+    
+    def validate(self, attrs):
+        validar_intervalo(attrs['inicio'], attrs['fim'])
+        if attrs['inicio'] < timezone.now():
+            raise serializers.ValidationError({'inicio': ['Não é possível agendar no passado.']})
+        user = self.context['request'].user
+        if not user.is_staff and user.pk not in (attrs['profissional'].usuario_id, attrs['cliente'].usuario_id):
+            raise serializers.ValidationError('Você só pode agendar consultas das quais participa.')
+        return attrs
+    
+    def create(self, validated_data):
+        return gravar(Agendamento(**validated_data))
+
+
+class HorarioOcupadoSerializer(serializers.ModelSerializer):
+    """
+    Agendamento visto por terceiros na agenda do profissional: só o horário
+    """
+    
+    class Meta:
+        model = Agendamento
+        fields = ['inicio', 'fim']
+
+
+class RemarcacaoSerializer(serializers.Serializer):
+    """
+    Novo horário de um agendamento
+    """
+    inicio = serializers.DateTimeField()
+    fim = serializers.DateTimeField()
+    
+    def validate(self, attrs):
+        validar_intervalo(attrs['inicio'], attrs['fim'])
+        if attrs['inicio'] < timezone.now():
+            raise serializers.ValidationError({'inicio': ['Não é possível agendar no passado.']})
+        return attrs
+
+
+class CredenciaisSerializer(serializers.Serializer):
+    """
+    Campos de login, sem autenticar (as views assíncronas verificam a senha
+    no pool de hashing)
     """
     username = serializers.CharField()
     password = serializers.CharField(write_only=True)
+
+
+class LoginSerializer(CredenciaisSerializer):
+    """
+    Serializer para autenticação
+    """
     
     def validate(self, attrs):
         username = attrs.get('username')
         password = attrs.get('password')
         
         if username and password:
-            user = authenticate(username=username, password=password)
+            with medir('auth'):
+                user = authenticate(username=username, password=password)
             if not user:
                 raise serializers.ValidationError('Credenciais inválidas.')
             if not user.is_active:
@@ -0,0 +1,142 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidar_token, invalidar_usuario
+from .directory_cache import invalidar_diretorio
+from .models import User, Profissional, Cliente, RegistroExcluido
+from .search import documento_profissional
+from .serializers import UserSerializer
+from .stats import CAMPOS_MONITORADOS, registrar_alteracao, snapshot
+
+
+@receiver(post_save, sender=User)
+def atualizar_busca_usuario(sender, instance, created, **kwargs):
+    """
+    Propaga alterações de nome do usuário para o documento de busca
+    """
+    if created or not instance.is_profissional:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not {'nome', 'sobrenome'} & set(update_fields):
+        return
+    try:
+        profissional = instance.profissional
+    except Profissional.DoesNotExist:
+        return
+    busca = documento_profissional(profissional)
+    if busca != profissional.busca:
+        profissional.busca = busca
+        Profissional.objects.filter(pk=profissional.pk).update(busca=busca)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_cache_autenticacao(sender, instance, **kwargs):
+    """
+    Desativação, troca de senha ou qualquer alteração do usuário
+    invalida a resolução de token em cache
+    """
+    invalidar_usuario(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_cache_token(sender, instance, **kwargs):
+    invalidar_token(instance.key)
+
+
+@receiver(post_save, sender=Profissional)
+@receiver(post_delete, sender=Profissional)
+def invalidar_cache_diretorio(sender, instance, **kwargs):
+    """
+    Invalida as listagens de profissionais e o detalhe do profissional
+    """
+    invalidar_diretorio('profissionais', [instance.pk], using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=User)
+def invalidar_cache_diretorio_usuario(sender, instance, created, **kwargs):
+    """
+    Os dados do usuário aparecem aninhados no diretório de profissionais.
+    Exclusões chegam pela cascata em Profissional.
+    """
+    if created or not instance.is_profissional:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not set(UserSerializer.Meta.fields) & set(update_fields):
+        return
+    pks = list(Profissional.objects.filter(usuario_id=instance.pk).values_list('pk', flat=True))
+    if pks:
+        invalidar_diretorio('profissionais', pks, using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=User)
+def propagar_alteracao_usuario(sender, instance, created, **kwargs):
+    """
+    Os dados do usuário aparecem aninhados no profissional/cliente: a
+    alteração atualiza o `atualizado_em` do perfil, lido pela sincronização
+    incremental (core.sync)
+    """
+    if created:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not set(UserSerializer.Meta.fields) & set(update_fields):
+        return
+    perfil = Profissional if instance.is_profissional else Cliente
+    perfil.objects.using(kwargs.get('using')).filter(usuario_id=instance.pk).update(atualizado_em=timezone.now())
+
+
+@receiver(post_delete, sender=Profissional)
+@receiver(post_delete, sender=Cliente)
+def registrar_exclusao(sender, instance, **kwargs):
+    """
+    Marca a exclusão para a sincronização incremental (core.sync)
+    """
+    recurso = 'profissionais' if sender is Profissional else 'clientes'
+    RegistroExcluido.objects.using(kwargs.get('using')).create(recurso=recurso, objeto_id=instance.pk)
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Profissional)
+@receiver(pre_save, sender=Cliente)
+def guardar_estado_estatisticas(sender, instance, update_fields=None, using=None, **kwargs):
+    """
+    Lê do banco, em uma consulta pela chave, o estado anterior dos campos
+    monitorados. Criações e saves com update_fields que não os incluem não
+    consultam nada.
+
+    Alterações sem sinais (QuerySet.update(), bulk_update) não passam por
+    aqui e fazem os contadores derivarem: `manage.py rebuild_stats`,
+    rodado periodicamente, os recalcula
+    """
+    campos = CAMPOS_MONITORADOS[sender]
+    if instance._state.adding or (update_fields is not None and not set(campos) & set(update_fields)):
+        instance._estatisticas = None
+        return
+    instance._estatisticas = sender._base_manager.using(using).filter(pk=instance.pk).values(*campos).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profissional)
+@receiver(post_save, sender=Cliente)
+def atualizar_estatisticas(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Aplica aos contadores de estatísticas a diferença causada pelo save
+    """
+    anterior = instance.__dict__.pop('_estatisticas', None)
+    if created:
+        registrar_alteracao(instance, None, snapshot(instance))
+    elif anterior is not None:
+        gravados = {
+            campo: valor for campo, valor in snapshot(instance).items()
+            if update_fields is None or campo in update_fields
+        }
+        registrar_alteracao(instance, anterior, {**anterior, **gravados})
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Profissional)
+@receiver(post_delete, sender=Cliente)
+def remover_das_estatisticas(sender, instance, **kwargs):
+    registrar_alteracao(instance, snapshot(instance), None)
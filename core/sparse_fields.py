@@ -0,0 +1,136 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+def parse_selecao(valor):
+    """
+    Converte `a,b,usuario.c` em uma tupla ordenada (ou None se vazio)
+    """
+    if not valor:
+        return None
+    return tuple(sorted({parte.strip() for parte in valor.split(',') if parte.strip()})) or None
+
+
+def _agrupar(caminhos):
+    diretos, aninhados = set(), {}
+    for caminho in caminhos:
+        nome, _, resto = caminho.partition('.')
+        if resto:
+            aninhados.setdefault(nome, []).append(resto)
+        else:
+            diretos.add(nome)
+    return diretos, aninhados
+
+
+def _validar(serializer, param, nomes, aninhados):
+    invalidos = set(nomes) - set(serializer.fields)
+    invalidos |= {
+        nome for nome in aninhados
+        if not isinstance(serializer.fields.get(nome), serializers.Serializer)
+    }
+    if invalidos:
+        raise serializers.ValidationError(
+            {param: [f'Campos inválidos: {", ".join(sorted(invalidos))}.']}
+        )
+
+
+def aplicar_selecao(serializer, fields=None, exclude=None):
+    """
+    Remove de `serializer.fields` os campos não pedidos em `fields` ou
+    listados em `exclude`; `usuario.nome` seleciona campos aninhados
+    """
+    if fields:
+        diretos, aninhados = _agrupar(fields)
+        _validar(serializer, 'fields', diretos | set(aninhados), aninhados)
+        for nome in list(serializer.fields):
+            if nome in diretos:
+                continue
+            if nome in aninhados:
+                aplicar_selecao(serializer.fields[nome], fields=aninhados[nome])
+            else:
+                serializer.fields.pop(nome)
+    if exclude:
+        diretos, aninhados = _agrupar(exclude)
+        _validar(serializer, 'exclude', diretos | set(aninhados), aninhados)
+        for nome in diretos:
+            serializer.fields.pop(nome)
+        for nome, caminhos in aninhados.items():
+            if nome in serializer.fields:
+                aplicar_selecao(serializer.fields[nome], exclude=caminhos)
+
+
+def campos_banco(serializer, prefixo=''):
+    """
+    Caminhos ORM lidos pelos campos do serializer, ou None quando algum
+    campo depende de uma origem desconhecida
+    """
+    model = serializer.Meta.model
+    dependencias = getattr(serializer, 'source_fields', {})
+    caminhos = set()
+    for nome, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if nome in dependencias:
+            caminhos.update(prefixo + caminho for caminho in dependencias[nome])
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            aninhados = campos_banco(field, f'{prefixo}{field.source}__')
+            if aninhados is None:
+                return None
+            caminhos.add(prefixo + field.source)
+            caminhos |= aninhados
+            continue
+        try:
+            model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        caminhos.add(prefixo + field.source)
+    return caminhos
+
+
+class SparseFieldsMixin:
+    """
+    Mixin de ViewSet para `?fields=` e `?exclude=`.
+
+    Além de reduzir a resposta, restringe as colunas lidas do banco com
+    `only()`, de modo que campos TEXT não pedidos nunca são carregados.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def get_selecao(self):
+        if self.action not in self.sparse_actions:
+            return None, None
+        params = self.request.query_params
+        return parse_selecao(params.get('fields')), parse_selecao(params.get('exclude'))
+
+    def get_serializer(self, *args, **kwargs):
+        fields, exclude = self.get_selecao()
+        if fields or exclude:
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('exclude', exclude)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, exclude = self.get_selecao()
+        if not (fields or exclude):
+            return queryset
+        serializer = self.get_serializer_class()(fields=fields, exclude=exclude)
+        caminhos = campos_banco(serializer)
+        if caminhos is None:
+            return queryset
+
+        # Campos de auditoria são lidos pelos validadores de GET condicional
+        caminhos |= set(getattr(self, 'validator_fields', ()))
+        # Campos de ordenação são lidos pelo cursor da paginação keyset
+        caminhos |= {
+            campo.lstrip('-') for campo in queryset.query.order_by
+            if isinstance(campo, str) and campo.lstrip('-') not in queryset.query.annotations
+        }
+        caminhos.discard('pk')
+        relacionados = {caminho.split('__')[0] for caminho in caminhos if '__' in caminho}
+        caminhos |= relacionados
+        queryset = queryset.select_related(None)
+        if relacionados:
+            queryset = queryset.select_related(*relacionados)
+        return queryset.only(*caminhos)
@@ -0,0 +1,174 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps as global_apps
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import User, Profissional, Cliente, Estatistica
+
+
+CAMPOS_MONITORADOS = {
+    User: ('is_active', 'tipo_usuario', 'sexo', 'criado_em'),
+    Profissional: ('ativo', 'especialidade'),
+    Cliente: ('ativo',),
+}
+
+PREFIXO_CADASTROS = 'cadastros:'
+
+
+def snapshot(instance):
+    """
+    Valores atuais dos campos monitorados (campos adiados são ignorados)
+    """
+    campos = CAMPOS_MONITORADOS[type(instance)]
+    return {campo: instance.__dict__[campo] for campo in campos if campo in instance.__dict__}
+
+
+def contribuicoes(model, valores):
+    """
+    Contadores aos quais um registro com `valores` contribui
+    """
+    chaves = Counter()
+    if model is User:
+        chaves['usuarios'] += 1
+        chaves['usuarios_ativos' if valores.get('is_active') else 'usuarios_inativos'] += 1
+        chaves[f'tipo_usuario:{valores.get("tipo_usuario")}'] += 1
+        chaves[f'sexo:{valores.get("sexo")}'] += 1
+        if valores.get('criado_em'):
+            chaves[f'{PREFIXO_CADASTROS}{timezone.localdate(valores["criado_em"]).isoformat()}'] += 1
+    elif valores.get('ativo'):
+        if model is Profissional:
+            chaves['profissionais'] += 1
+            chaves[f'especialidade:{valores.get("especialidade")}'] += 1
+        else:
+            chaves['clientes'] += 1
+    return chaves
+
+
+def aplicar_deltas(deltas):
+    """
+    Soma `deltas` aos contadores com um INSERT (ignorando existentes) e um UPDATE
+    """
+    deltas = {chave: delta for chave, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    Estatistica.objects.bulk_create(
+        [Estatistica(chave=chave) for chave in deltas], ignore_conflicts=True
+    )
+    Estatistica.objects.filter(chave__in=deltas).update(valor=F('valor') + Case(
+        *[When(chave=chave, then=delta) for chave, delta in deltas.items()],
+        output_field=models.BigIntegerField(),
+    ))
+
+
+def registrar_alteracao(instance, anterior, atual):
+    """
+    Aplica a diferença entre o estado anterior e o atual de um registro.
+    `None` indica registro inexistente (antes da criação ou após a exclusão).
+    """
+    model = type(instance)
+    deltas = Counter()
+    if atual is not None:
+        deltas.update(contribuicoes(model, atual))
+    if anterior is not None:
+        deltas.subtract(contribuicoes(model, anterior))
+    aplicar_deltas(deltas)
+
+
+def registrar_criacao(instances):
+    """
+    Contabiliza registros criados sem sinais (ex.: bulk_create)
+    """
+    deltas = Counter()
+    for instance in instances:
+        deltas.update(contribuicoes(type(instance), snapshot(instance)))
+    aplicar_deltas(deltas)
+
+
+def estatisticas_agregadas(apps=global_apps, using=None):
+    """
+    Totais calculados em uma única consulta com agregação condicional
+    """
+    User = apps.get_model('core', 'User')
+    return User.objects.using(using).aggregate(
+        total_usuarios=Count('id'),
+        total_profissionais=Count('profissional', filter=Q(profissional__ativo=True)),
+        total_clientes=Count('cliente', filter=Q(cliente__ativo=True)),
+        usuarios_ativos=Count('id', filter=Q(is_active=True)),
+        usuarios_inativos=Count('id', filter=Q(is_active=False)),
+    )
+
+
+def reconstruir_estatisticas(apps=global_apps, using=None):
+    """
+    Recalcula todos os contadores do banco `using` a partir das tabelas de
+    origem. Corrige a deriva de alterações feitas sem sinais
+    (QuerySet.update(), bulk_update)
+    """
+    User = apps.get_model('core', 'User')
+    Profissional = apps.get_model('core', 'Profissional')
+    Estatistica = apps.get_model('core', 'Estatistica')
+
+    totais = estatisticas_agregadas(apps, using=using)
+    contadores = Counter({
+        'usuarios': totais['total_usuarios'],
+        'usuarios_ativos': totais['usuarios_ativos'],
+        'usuarios_inativos': totais['usuarios_inativos'],
+        'profissionais': totais['total_profissionais'],
+        'clientes': totais['total_clientes'],
+    })
+    for campo in ('tipo_usuario', 'sexo'):
+        for linha in User.objects.using(using).order_by().values(campo).annotate(total=Count('id')):
+            contadores[f'{campo}:{linha[campo]}'] = linha['total']
+    cadastros = User.objects.using(using).order_by().annotate(dia=TruncDate('criado_em')).values('dia')
+    for linha in cadastros.annotate(total=Count('id')):
+        contadores[f'{PREFIXO_CADASTROS}{linha["dia"].isoformat()}'] = linha['total']
+    especialidades = Profissional.objects.using(using).filter(ativo=True).order_by().values('especialidade')
+    for linha in especialidades.annotate(total=Count('id')):
+        contadores[f'especialidade:{linha["especialidade"]}'] = linha['total']
+
+    with transaction.atomic(using=using):
+        Estatistica.objects.using(using).all().delete()
+        Estatistica.objects.using(using).bulk_create(
+            [Estatistica(chave=chave, valor=valor) for chave, valor in contadores.items()],
+            batch_size=1000,
+        )
+    return contadores
+
+
+def ler_estatisticas(dias=30):
+    """
+    Estatísticas lidas da tabela de contadores em uma consulta
+    """
+    inicio = timezone.localdate() - timedelta(days=dias - 1)
+    linhas = Estatistica.objects.filter(
+        ~Q(chave__startswith=PREFIXO_CADASTROS)
+        | Q(chave__gte=f'{PREFIXO_CADASTROS}{inicio.isoformat()}', chave__startswith=PREFIXO_CADASTROS)
+    ).values_list('chave', 'valor')
+
+    contadores = dict(linhas)
+    resultado = {
+        'total_usuarios': contadores.pop('usuarios', 0),
+        'total_profissionais': contadores.pop('profissionais', 0),
+        'total_clientes': contadores.pop('clientes', 0),
+        'usuarios_ativos': contadores.pop('usuarios_ativos', 0),
+        'usuarios_inativos': contadores.pop('usuarios_inativos', 0),
+        'por_tipo_usuario': {},
+        'por_sexo': {},
+        'por_especialidade': {},
+        'cadastros_por_dia': {},
+    }
+    grupos = {
+        'tipo_usuario': 'por_tipo_usuario',
+        'sexo': 'por_sexo',
+        'especialidade': 'por_especialidade',
+        PREFIXO_CADASTROS.rstrip(':'): 'cadastros_por_dia',
+    }
+    for chave, valor in sorted(contadores.items()):
+        grupo, _, nome = chave.partition(':')
+        if grupo in grupos and valor:
+            resultado[grupos[grupo]][nome] = valor
+    return resultado
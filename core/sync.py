@@ -0,0 +1,146 @@
+import base64
+import binascii
+import json
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+
+from .models import RegistroExcluido
+from .pagination import keyset_filter
+
+
+def horizonte():
+    """
+    Limite superior das alterações entregues. `atualizado_em` é gravado antes
+    do commit: uma transação em andamento pode confirmar depois alterações
+    com horário anterior ao de outras já lidas. Esperar SYNC_SAFETY_SECONDS
+    (maior que a transação de escrita mais longa) garante que nada abaixo do
+    horizonte ainda vá aparecer
+    """
+    return timezone.now() - timedelta(seconds=getattr(settings, 'SYNC_SAFETY_SECONDS', 10))
+
+
+def codificar_cursor(posicao):
+    atualizado_em, pk = posicao
+    payload = json.dumps({'t': atualizado_em.isoformat(), 'id': pk})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(encoded):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        atualizado_em, pk = parse_datetime(payload['t']), int(payload['id'])
+    except (TypeError, ValueError, KeyError, binascii.Error):
+        raise NotFound('Cursor inválido.')
+    if atualizado_em is None or timezone.is_naive(atualizado_em):
+        raise NotFound('Cursor inválido.')
+    return atualizado_em, pk
+
+
+def posicao_inicial(params):
+    """
+    Posição (atualizado_em, id) já sincronizada: `?cursor=` de uma resposta
+    anterior ou `?updated_since=` (ISO 8601); sem nenhum, desde o início
+    """
+    if params.get('cursor'):
+        return decodificar_cursor(params['cursor'])
+    texto = params.get('updated_since')
+    if not texto:
+        return None
+    try:
+        valor = parse_datetime(texto)
+    except ValueError:
+        valor = None
+    if valor is None:
+        raise serializers.ValidationError(
+            {'updated_since': ['Informe data e hora no formato ISO 8601 (ex.: 2026-10-19T08:00:00Z).']}
+        )
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    # O id 0 inclui as alterações do próprio instante
+    return valor, 0
+
+
+def alteracoes(queryset, recurso, posicao, limite, ate):
+    """
+    Até `limite` alterações [(atualizado_em, id, ativo)] posteriores a
+    `posicao` e anteriores a `ate`, em ordem. Registros alterados e
+    exclusões saem de uma única consulta (UNION ALL de duas faixas de
+    índice); `ativo` é False para desativados e excluídos
+    """
+    vivos = queryset.filter(atualizado_em__lt=ate)
+    excluidos = RegistroExcluido.objects.using(queryset.db).filter(recurso=recurso, excluido_em__lt=ate)
+    if posicao is not None:
+        vivos = vivos.filter(keyset_filter(['atualizado_em', 'id'], posicao))
+        excluidos = excluidos.filter(keyset_filter(['excluido_em', 'objeto_id'], posicao))
+    vivos = vivos.order_by('atualizado_em', 'id').values_list('atualizado_em', 'id', 'ativo')[:limite]
+    excluidos = excluidos.annotate(
+        excluido=Value(False, output_field=BooleanField()),
+    ).order_by('excluido_em', 'objeto_id').values_list('excluido_em', 'objeto_id', 'excluido')[:limite]
+
+    connection = connections[queryset.db]
+    sql_vivos, params_vivos = vivos.query.sql_with_params()
+    sql_excluidos, params_excluidos = excluidos.query.sql_with_params()
+    # Cada lado limitado e ordenado pelo próprio índice; o banco só ordena
+    # as até 2 * limite linhas resultantes
+    sql = (
+        f'SELECT * FROM ({sql_vivos}) vivos UNION ALL SELECT * FROM ({sql_excluidos}) excluidos'
+        f' ORDER BY 1, 2 LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, (*params_vivos, *params_excluidos, limite))
+        return [(_como_datetime(momento), pk, bool(ativo)) for momento, pk, ativo in cursor.fetchall()]
+
+
+def _como_datetime(valor):
+    # Consulta crua: o SQLite devolve o texto gravado, em UTC
+    if isinstance(valor, str):
+        valor = parse_datetime(valor)
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor, dt_timezone.utc)
+    return valor
+
+
+class DeltaSyncMixin:
+    """
+    Mixin de ViewSet com a action `sync`: alterações do recurso desde
+    `?updated_since=` ou `?cursor=`, para aplicativos que mantêm uma cópia
+    local. Registros desativados ou excluídos vêm em `deleted`.
+
+    Lê sempre do primário: o atraso de uma réplica se somaria à janela de
+    SYNC_SAFETY_SECONDS.
+    """
+    sync_resource = None
+
+    def get_sync_queryset(self):
+        """
+        Todos os registros do recurso, ativos ou não, sem os filtros da
+        listagem
+        """
+        return self.queryset.model.objects.all()
+
+    @action(detail=False, methods=['get'])
+    def sync(self, request):
+        posicao = posicao_inicial(request.query_params)
+        limite = self.paginator.get_page_size(request)
+        queryset = self.get_sync_queryset()
+        linhas = alteracoes(queryset, self.sync_resource, posicao, limite, horizonte())
+        if linhas:
+            posicao = linhas[-1][:2]
+
+        ativos = [pk for momento, pk, ativo in linhas if ativo]
+        objetos = queryset.in_bulk(ativos) if ativos else {}
+        return Response({
+            'results': self.get_serializer([objetos[pk] for pk in ativos if pk in objetos], many=True).data,
+            'deleted': [pk for momento, pk, ativo in linhas if not ativo],
+            'cursor': codificar_cursor(posicao) if posicao is not None else None,
+            'has_more': len(linhas) == limite,
+        })
@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def assert_max_queries(max_queries, using=DEFAULT_DB_ALIAS):
+    """
+    Garante que o bloco execute no máximo `max_queries` consultas SQL
+    """
+    context = CaptureQueriesContext(connections[using])
+    with context:
+        yield context
+    executed = len(context.captured_queries)
+    if executed > max_queries:
+        queries = '\n'.join(
+            f'{i}. {query["sql"]}'
+            for i, query in enumerate(context.captured_queries, start=1)
+        )
+        raise AssertionError(
+            f'{executed} consultas executadas, orçamento de {max_queries}:\n{queries}'
+        )
+
+
+class QueryBudgetMixin:
+    """
+    Mixin para TestCase com asserções de orçamento de consultas
+    """
+
+    def assertMaxQueries(self, max_queries, using=DEFAULT_DB_ALIAS):
+        return assert_max_queries(max_queries, using=using)
@@ -1,3 +1,2530 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import date, datetime, time as hora, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin.sites import site
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, IntegrityError, OperationalError, connection, connections, transaction
+from django.db.models import NOT_PROVIDED, F
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from . import hashing
+from .agendamentos import ConflitoAgenda, cancelar, gravar
+from .authentication import get_token_cache
+from .benchmark import INDICE_MAXIMO_CPF, GeradorDados, comparar, cpf_bench
+from .bulk import BulkRegistration
+from .directory_cache import get_directory_cache
+from .disponibilidade import fuso_agenda, interpretar_horario
+from .fast_serializers import fast_serializer_for
+from .hashing import hash_passwords
+from .importers import CAMPOS_USUARIO, ClienteImporter, ProfissionalImporter
+from .models import (
+    User, Profissional, Cliente, Estatistica, Agendamento, ExcecaoDisponibilidade, HorarioDisponivel,
+    RegistroExcluido,
+)
+from .serializers import (
+    UserSerializer, UserCreateSerializer, ProfissionalSerializer, ClienteSerializer, HorarioOcupadoSerializer
+)
+from .stats import estatisticas_agregadas, ler_estatisticas
+from .testing import QueryBudgetMixin, assert_max_queries
+from .validators import digitos_verificadores_cpf, formatar_cpf, normalizar_cpf
+
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# O cache do diretório não acompanha o rollback entre testes; só os testes
+# que o exercitam o ativam
+SEM_CACHE_DIRETORIO = override_settings(DIRECTORY_CACHE_ALIAS=None)
+
+
+def setUpModule():
+    SEM_CACHE_DIRETORIO.enable()
+
+
+def tearDownModule():
+    SEM_CACHE_DIRETORIO.disable()
+
+
+def criar_usuario(indice, tipo_usuario='cliente', **extra):
+    return User.objects.create(
+        username=f'usuario{indice}',
+        email=f'usuario{indice}@example.com',
+        nome=f'Nome{indice:05d}',
+        sobrenome='Silva',
+        tipo_usuario=tipo_usuario,
+        sexo='F',
+        cpf=f'{indice:03d}.{indice:03d}.{indice:03d}-{indice % 100:02d}',
+        **extra
+    )
+
+
+def criar_profissional(indice, **extra):
+    usuario = criar_usuario(indice, tipo_usuario='profissional')
+    return Profissional.objects.create(
+        usuario=usuario,
+        registro_profissional=f'CREFITO-{indice}',
+        especialidade=extra.pop('especialidade', 'Ortopedia'),
+        **extra
+    )
+
+
+def criar_cliente(indice, **extra):
+    usuario = criar_usuario(indice, tipo_usuario='cliente')
+    return Cliente.objects.create(usuario=usuario, **extra)
+
+
+class AssertMaxQueriesTests(TestCase):
+
+    def test_dentro_do_orcamento(self):
+        with assert_max_queries(1):
+            User.objects.count()
+
+    def test_orcamento_excedido_lista_consultas(self):
+        with self.assertRaisesMessage(AssertionError, '2 consultas executadas, orçamento de 1'):
+            with assert_max_queries(1):
+                User.objects.count()
+                User.objects.count()
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Fixa o número máximo de consultas de cada endpoint de core/urls.py
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        cls.admin.set_password('senha-forte-123')
+        cls.admin.save()
+        for indice in range(100, 125):
+            criar_profissional(indice, horario_atendimento='Seg a Sex, 8h às 18h')
+        for indice in range(200, 225):
+            criar_cliente(indice)
+        call_command('interpretar_horarios', stdout=StringIO())
+        cls.profissional = Profissional.objects.order_by('pk').first()
+        for posicao, cliente in enumerate(Cliente.objects.order_by('pk')):
+            inicio = em(0, 8) + timedelta(minutes=20 * posicao)
+            gravar(Agendamento(
+                profissional=cls.profissional, cliente=cliente, inicio=inicio, fim=inicio + timedelta(minutes=20),
+            ))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_health_check(self):
+        with self.assertMaxQueries(0):
+            self.client.get(reverse('core:health_check'))
+
+    def test_register_user(self):
+        payload = {
+            'username': 'novo', 'email': 'novo@example.com',
+            'password': 'senha-forte-123', 'password_confirmation': 'senha-forte-123',
+            'nome': 'Novo', 'sobrenome': 'Usuário', 'tipo_usuario': 'cliente',
+            'sexo': 'M', 'cpf': '999.999.999-99',
+        }
+        with self.assertMaxQueries(5):
+            response = self.client.post(reverse('core:register_user'), payload, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_login_user(self):
+        client = APIClient()
+        payload = {'username': self.admin.username, 'password': 'senha-forte-123'}
+        with self.assertMaxQueries(2):
+            response = client.post(reverse('core:login_user'), payload, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_user(self):
+        with self.assertMaxQueries(1):
+            self.client.post(reverse('core:logout_user'))
+
+    def test_obtain_auth_token(self):
+        client = APIClient()
+        payload = {'username': self.admin.username, 'password': 'senha-forte-123'}
+        with self.assertMaxQueries(5):
+            response = client.post(reverse('core:obtain_auth_token'), payload, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_profile(self):
+        with self.assertMaxQueries(0):
+            self.client.get(reverse('core:user_profile'))
+
+    def test_update_user_profile(self):
+        with self.assertMaxQueries(3):
+            response = self.client.put(
+                reverse('core:update_user_profile'), {'telefone': '11999999999'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_stats(self):
+        with self.assertMaxQueries(1):
+            self.client.get(reverse('core:user_stats'))
+
+    def test_usuarios_list(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('core:user-list'))
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_usuarios_detail(self):
+        with self.assertMaxQueries(1):
+            self.client.get(reverse('core:user-detail', args=[self.admin.pk]))
+
+    def test_profissionais_list(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('core:profissional-list'))
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_profissionais_list_filtrada(self):
+        with self.assertMaxQueries(2):
+            self.client.get(reverse('core:profissional-list'), {'especialidade': 'orto'})
+
+    def test_profissionais_detail(self):
+        profissional = Profissional.objects.first()
+        with self.assertMaxQueries(1):
+            self.client.get(reverse('core:profissional-detail', args=[profissional.pk]))
+
+    def test_clientes_list(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('core:cliente-list'))
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_clientes_detail(self):
+        cliente = Cliente.objects.first()
+        with self.assertMaxQueries(1):
+            self.client.get(reverse('core:cliente-detail', args=[cliente.pk]))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_clientes_bulk(self):
+        itens = [{'usuario': payload_usuario(i)} for i in range(400, 430)]
+        with self.assertMaxQueries(8):
+            response = self.client.post(reverse('core:cliente-bulk'), itens, format='json')
+        self.assertEqual(response.data['criados'], 30)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_profissionais_bulk(self):
+        itens = [
+            {'usuario': payload_usuario(i, 'profissional'), 'registro_profissional': f'R-{i}'}
+            for i in range(400, 430)
+        ]
+        with self.assertMaxQueries(9):
+            response = self.client.post(reverse('core:profissional-bulk'), itens, format='json')
+        self.assertEqual(response.data['criados'], 30)
+
+    def test_profissionais_export(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('core:profissional-export'))
+            linhas = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(linhas), 26)
+
+    def test_clientes_export(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('core:cliente-export'), {'formato': 'ndjson'})
+            linhas = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(linhas), 25)
+
+    @override_settings(METRICS_TOKEN='segredo-do-coletor')
+    def test_metrics(self):
+        with self.assertMaxQueries(0):
+            response = self.client.get(reverse('core:metrics'), HTTP_AUTHORIZATION='Bearer segredo-do-coletor')
+        self.assertEqual(response.status_code, 200)
+
+    def autenticar_assincrono(self):
+        """
+        As views assíncronas autenticam só pelo token; o cache de tokens
+        começa vazio para que a resolução entre no orçamento
+        """
+        response = self.client.post(
+            reverse('core:async_login_user'),
+            {'username': self.admin.username, 'password': 'senha-forte-123'}, format='json',
+        )
+        get_token_cache().clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {response.json()["token"]}')
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_async_register_user(self):
+        with self.assertMaxQueries(5):
+            response = self.client.post(reverse('core:async_register_user'), payload_registro(), format='json')
+        self.assertEqual(response.status_code, 201)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_async_login_user(self):
+        payload = {'username': self.admin.username, 'password': 'senha-forte-123'}
+        with self.assertMaxQueries(2):
+            response = self.client.post(reverse('core:async_login_user'), payload, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_async_user_profile(self):
+        self.autenticar_assincrono()
+        with self.assertMaxQueries(1):
+            response = self.client.get(reverse('core:async_user_profile'))
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_async_listas(self):
+        self.autenticar_assincrono()
+        for nome in ('core:async_user_list', 'core:async_profissional_list', 'core:async_cliente_list'):
+            get_token_cache().clear()
+            with self.subTest(nome), self.assertMaxQueries(3):
+                response = self.client.get(reverse(nome))
+            self.assertEqual(len(response.json()['results']), 20)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=0)
+    def test_async_detalhes(self):
+        self.autenticar_assincrono()
+        for nome, pk in (
+            ('core:async_user_detail', self.admin.pk),
+            ('core:async_profissional_detail', Profissional.objects.first().pk),
+            ('core:async_cliente_detail', Cliente.objects.first().pk),
+        ):
+            get_token_cache().clear()
+            with self.subTest(nome), self.assertMaxQueries(2):
+                response = self.client.get(reverse(nome, args=[pk]))
+            self.assertEqual(response.status_code, 200)
+
+    def test_profissionais_disponiveis(self):
+        # 2026-10-19 é uma segunda-feira
+        inicio = datetime(2026, 10, 19, 10, tzinfo=fuso_agenda())
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('core:profissional-disponiveis'), {
+                'inicio': inicio.isoformat(), 'fim': (inicio + timedelta(hours=1)).isoformat(),
+            })
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_profissional_agenda(self):
+        url = reverse('core:profissional-agenda', args=[self.profissional.pk])
+        with self.assertMaxQueries(1):
+            response = self.client.get(url, {'data': em(0, 0).date().isoformat()})
+        self.assertEqual(len(response.data['agendamentos']), 25)
+
+    def test_agendamentos_list(self):
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse('core:agendamento-list'))
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_agendamentos_detail(self):
+        agendamento = Agendamento.objects.first()
+        with self.assertMaxQueries(1):
+            self.client.get(reverse('core:agendamento-detail', args=[agendamento.pk]))
+
+    def test_agendamentos_create(self):
+        payload = {
+            'profissional': self.profissional.pk, 'cliente': Cliente.objects.first().pk,
+            'inicio': em(1, 10).isoformat(), 'fim': em(1, 11).isoformat(),
+        }
+        with self.assertMaxQueries(5):
+            response = self.client.post(reverse('core:agendamento-list'), payload, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_agendamentos_cancelar(self):
+        agendamento = Agendamento.objects.first()
+        with self.assertMaxQueries(4):
+            response = self.client.post(reverse('core:agendamento-cancelar', args=[agendamento.pk]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_agendamentos_remarcar(self):
+        agendamento = Agendamento.objects.first()
+        payload = {'inicio': em(1, 14).isoformat(), 'fim': em(1, 15).isoformat()}
+        with self.assertMaxQueries(4):
+            response = self.client.post(
+                reverse('core:agendamento-remarcar', args=[agendamento.pk]), payload, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SYNC_SAFETY_SECONDS=0)
+    def test_sync(self):
+        for nome in ('core:profissional-sync', 'core:cliente-sync'):
+            with self.subTest(nome), self.assertMaxQueries(2):
+                response = self.client.get(reverse(nome))
+            self.assertEqual(len(response.data['results']), 20)
+
+
+class KeysetPaginationTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        # Nomes repetidos para exercitar o desempate por sobrenome e id
+        for indice in range(100, 145):
+            profissional = criar_profissional(indice)
+            User.objects.filter(pk=profissional.usuario_id).update(nome=f'Nome{indice % 7}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def percorrer(self, url, params):
+        vistos = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertNotIn('count', response.data)
+            vistos.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                return vistos, response
+            response = self.client.get(response.data['next'])
+
+    def test_percorre_todos_em_ordem_sem_repeticao(self):
+        esperado = list(
+            Profissional.objects.order_by('usuario__nome', 'usuario__sobrenome', 'id')
+            .values_list('id', flat=True)
+        )
+        vistos, _ = self.percorrer(reverse('core:profissional-list'), {'cursor': ''})
+        self.assertEqual(vistos, esperado)
+
+    def test_link_anterior_retorna_pagina_anterior(self):
+        url = reverse('core:profissional-list')
+        primeira = self.client.get(url, {'cursor': ''})
+        self.assertIsNone(primeira.data['previous'])
+        segunda = self.client.get(primeira.data['next'])
+        anterior = self.client.get(segunda.data['previous'])
+        self.assertEqual(anterior.data['results'], primeira.data['results'])
+
+    def test_pagina_profunda_sem_count_nem_offset(self):
+        url = reverse('core:profissional-list')
+        primeira = self.client.get(url, {'cursor': ''})
+        segunda_url = self.client.get(primeira.data['next']).data['next']
+        with self.assertMaxQueries(1) as context:
+            self.client.get(segunda_url)
+        sql = context.captured_queries[0]['sql']
+        self.assertNotIn('COUNT', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_usuarios_e_clientes_aceitam_cursor(self):
+        criar_cliente(300)
+        for nome in ('user-list', 'cliente-list'):
+            vistos, _ = self.percorrer(reverse(f'core:{nome}'), {'cursor': ''})
+            self.assertEqual(len(vistos), len(set(vistos)))
+
+    def test_cursor_invalido(self):
+        response = self.client.get(reverse('core:profissional-list'), {'cursor': 'invalido'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_paginacao_por_pagina_continua_funcionando(self):
+        response = self.client.get(reverse('core:profissional-list'), {'page': 2})
+        self.assertEqual(response.data['count'], 45)
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_contagem_estimada(self):
+        response = self.client.get(reverse('core:profissional-list'), {'contagem': 'estimada'})
+        self.assertEqual(response.data['count'], 45)
+        response = self.client.get(
+            reverse('core:profissional-list'), {'cursor': '', 'contagem': 'estimada'}
+        )
+        self.assertEqual(response.data['count'], 45)
+
+
+class BuscaProfissionaisTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        cls.joao = criar_profissional(100, especialidade='Ortopedia', clinica='Clínica Movimento')
+        User.objects.filter(pk=cls.joao.usuario_id).update(nome='João', sobrenome='Conceição')
+        cls.joao.refresh_from_db()
+        cls.joao.save()
+        cls.maria = criar_profissional(101, especialidade='Neurologia', clinica='Fisio Center')
+        cls.inativo = criar_profissional(102, especialidade='Ortopedia', ativo=False)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def buscar(self, termo):
+        response = self.client.get(reverse('core:profissional-list'), {'q': termo})
+        return [item['id'] for item in response.data['results']]
+
+    def test_busca_sem_acentos(self):
+        self.assertEqual(self.buscar('joao conceicao'), [self.joao.pk])
+        self.assertEqual(self.buscar('JOÃO'), [self.joao.pk])
+
+    def test_busca_por_prefixo_especialidade_clinica_e_registro(self):
+        self.assertEqual(self.buscar('orto'), [self.joao.pk])
+        self.assertEqual(self.buscar('fisio center'), [self.maria.pk])
+        self.assertEqual(self.buscar('crefito 101'), [self.maria.pk])
+
+    def test_busca_ignora_inativos(self):
+        self.assertNotIn(self.inativo.pk, self.buscar('ortopedia'))
+
+    def test_documento_acompanha_nome_do_usuario(self):
+        usuario = self.maria.usuario
+        usuario.nome = 'Márcia'
+        usuario.save()
+        self.assertEqual(self.buscar('marcia'), [self.maria.pk])
+
+    def test_documento_acompanha_alteracao_do_profissional(self):
+        self.maria.especialidade = 'Pediatria'
+        with CaptureQueriesContext(connection) as consultas:
+            self.maria.save(update_fields=['especialidade'])
+        updates = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('UPDATE "core_profissional"')]
+        self.assertEqual(len(updates), 1)
+        self.assertIn('"busca"', updates[0])
+        self.assertEqual(self.buscar('pediatria'), [self.maria.pk])
+        self.assertEqual(self.buscar('neurologia'), [])
+
+    def test_resultados_ordenados_por_relevancia(self):
+        criar_profissional(103, especialidade='Ortopedia Esportiva', clinica='Ortopedia Ortopedia')
+        ids = self.buscar('ortopedia')
+        self.assertEqual(ids[0], Profissional.objects.get(registro_profissional='CREFITO-103').pk)
+        self.assertEqual(len(ids), 2)
+
+    def test_termo_sem_palavras(self):
+        self.assertEqual(self.buscar('!!!'), [])
+
+    def test_busca_do_admin_de_usuarios(self):
+        usuario = criar_usuario(2)
+        usuario.nome, usuario.sobrenome, usuario.email = 'Maria José', 'Conceição', 'mj.conceicao@clinica.com'
+        usuario.save()
+        User.objects.filter(pk=usuario.pk).update(cpf='529.982.247-25')
+        admin_usuarios = site._registry[User]
+
+        def buscar(termo):
+            queryset, _ = admin_usuarios.get_search_results(None, User.objects.all(), termo)
+            self.assertNotRegex(queryset.explain(), r'SCAN core_user\b')
+            return set(queryset.values_list('username', flat=True))
+
+        self.assertEqual(buscar('usuario2'), {'usuario2'})
+        self.assertEqual(buscar('MARIA'), {'usuario2'})
+        self.assertEqual(buscar('conceicao'), {'usuario2'})
+        self.assertEqual(buscar('jose conc'), {'usuario2'})
+        self.assertEqual(buscar('clinica.com'), {'usuario2'})
+        self.assertEqual(buscar('mj.conceicao@clinica.com'), {'usuario2'})
+        self.assertEqual(buscar('52998224725'), {'usuario2'})
+        self.assertEqual(buscar('529.982.247-25'), {'usuario2'})
+        self.assertEqual(buscar('usuario10'), {'usuario100', 'usuario101', 'usuario102'})
+        self.assertEqual(buscar('souza'), set())
+
+        usuario.sobrenome = 'Andrade'
+        usuario.save(update_fields=['sobrenome'])
+        self.assertEqual(buscar('andrade'), {'usuario2'})
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class CachedTokenAuthenticationTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.usuario = criar_usuario(1)
+        self.usuario.set_password('senha-forte-123')
+        self.usuario.save()
+        self.token = Token.objects.create(user=self.usuario)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_cache_quente_nao_consulta_banco(self):
+        self.client.get(reverse('core:user_profile'))
+        with self.assertMaxQueries(0):
+            response = self.client.get(reverse('core:user_profile'))
+        self.assertEqual(response.data['id'], self.usuario.pk)
+
+    def test_alteracao_do_usuario_invalida_cache(self):
+        self.client.get(reverse('core:user_profile'))
+        self.usuario.telefone = '11999999999'
+        self.usuario.save()
+        response = self.client.get(reverse('core:user_profile'))
+        self.assertEqual(response.data['telefone'], '11999999999')
+
+    def test_desativacao_invalida_cache(self):
+        self.client.get(reverse('core:user_profile'))
+        self.usuario.is_active = False
+        self.usuario.save()
+        response = self.client.get(reverse('core:user_profile'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_troca_de_senha_invalida_cache(self):
+        self.client.get(reverse('core:user_profile'))
+        self.usuario.set_password('outra-senha-456')
+        self.usuario.save()
+        with self.assertNumQueries(1):
+            self.client.get(reverse('core:user_profile'))
+
+    def test_logout_invalida_cache(self):
+        self.client.post(reverse('core:logout_user'))
+        with self.assertNumQueries(1):
+            self.client.get(reverse('core:user_profile'))
+
+    def test_exclusao_do_token_invalida_cache(self):
+        self.client.get(reverse('core:user_profile'))
+        self.token.delete()
+        response = self.client.get(reverse('core:user_profile'))
+        self.assertEqual(response.status_code, 401)
+
+
+class EstatisticasTests(TestCase):
+
+    def setUp(self):
+        self.admin = criar_usuario(1, is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        criar_profissional(100, especialidade='Ortopedia')
+        criar_profissional(101, especialidade='Neurologia')
+        criar_profissional(102, especialidade='Ortopedia', ativo=False)
+        criar_cliente(200)
+        criar_cliente(201, ativo=False)
+        criar_usuario(300, is_active=False)
+
+    def assertContadoresConsistentes(self):
+        stats = ler_estatisticas()
+        for chave, valor in estatisticas_agregadas().items():
+            self.assertEqual(stats[chave], valor, chave)
+
+    def test_endpoint_le_contadores(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('core:user_stats'))
+        self.assertEqual(response.data['total_usuarios'], 7)
+        self.assertEqual(response.data['total_profissionais'], 2)
+        self.assertEqual(response.data['total_clientes'], 1)
+        self.assertEqual(response.data['usuarios_ativos'], 6)
+        self.assertEqual(response.data['usuarios_inativos'], 1)
+        self.assertEqual(response.data['por_tipo_usuario'], {'cliente': 4, 'profissional': 3})
+        self.assertEqual(response.data['por_especialidade'], {'Neurologia': 1, 'Ortopedia': 1})
+        self.assertEqual(sum(response.data['cadastros_por_dia'].values()), 7)
+
+    def test_endpoint_restrito_a_staff(self):
+        self.client.force_authenticate(criar_usuario(2))
+        response = self.client.get(reverse('core:user_stats'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_alteracoes_atualizam_contadores(self):
+        profissional = Profissional.objects.get(registro_profissional='CREFITO-102')
+        profissional.ativo = True
+        profissional.save()
+        usuario = User.objects.get(username='usuario300')
+        usuario.is_active = True
+        usuario.save()
+        Cliente.objects.get(usuario__username='usuario200').usuario.delete()
+        self.assertContadoresConsistentes()
+        self.assertEqual(ler_estatisticas()['por_especialidade'], {'Neurologia': 1, 'Ortopedia': 2})
+
+    def test_estado_anterior_lido_do_banco(self):
+        antiga = Profissional.objects.get(registro_profissional='CREFITO-102')
+        self.assertFalse(hasattr(antiga, '_estatisticas'))
+        atual = Profissional.objects.get(pk=antiga.pk)
+        atual.ativo = True
+        atual.save()
+        # A cópia carregada antes grava de volta ativo=False
+        antiga.especialidade = 'Neurologia'
+        antiga.save()
+        self.assertContadoresConsistentes()
+        self.assertEqual(ler_estatisticas()['por_especialidade'], {'Neurologia': 1, 'Ortopedia': 1})
+
+    def test_save_sem_alteracao_nao_consulta_contadores(self):
+        usuario = User.objects.get(username='usuario300')
+        usuario.telefone = '11999999999'
+        # UPDATE do usuário e do atualizado_em do perfil (sincronização)
+        with self.assertNumQueries(2) as consultas:
+            usuario.save(update_fields=['telefone'])
+        self.assertFalse(any('core_estatistica' in consulta['sql'] for consulta in consultas.captured_queries))
+
+    def test_rebuild_stats(self):
+        Estatistica.objects.all().delete()
+        call_command('rebuild_stats', stdout=StringIO())
+        self.assertContadoresConsistentes()
+        self.assertEqual(ler_estatisticas()['por_sexo'], {'F': 7})
+
+
+def payload_usuario(indice, tipo_usuario='cliente'):
+    return {
+        'username': f'lote{indice}', 'email': f'lote{indice}@example.com',
+        'password': 'senha-forte-123', 'password_confirmation': 'senha-forte-123',
+        'nome': f'Lote{indice}', 'sobrenome': 'Souza', 'tipo_usuario': tipo_usuario,
+        'sexo': 'M', 'cpf': f'{indice:03d}.{indice:03d}.{indice:03d}-{indice % 100:02d}',
+    }
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, PASSWORD_HASHING_WORKERS=0)
+class BulkRegistrationTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.admin = criar_usuario(1, is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_cadastra_clientes_em_lote(self):
+        itens = [{'usuario': payload_usuario(i), 'alergias': 'Nenhuma'} for i in range(400, 460)]
+        with self.assertMaxQueries(10):
+            response = self.client.post(reverse('core:cliente-bulk'), itens, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['criados'], 60)
+        cliente = Cliente.objects.get(pk=response.data['resultados'][0]['id'])
+        self.assertEqual(cliente.usuario.username, 'lote400')
+        self.assertTrue(cliente.usuario.check_password('senha-forte-123'))
+        self.assertEqual(ler_estatisticas()['total_clientes'], 60)
+
+    def test_erros_por_item(self):
+        criar_usuario(500)
+        itens = [
+            {'usuario': payload_usuario(501)},
+            {'usuario': {**payload_usuario(502), 'username': 'usuario500'}},
+            {'usuario': {**payload_usuario(503), 'cpf': '501.501.501-01'}},
+            {'usuario': {**payload_usuario(504), 'password_confirmation': 'outra'}},
+            {'usuario': {**payload_usuario(505), 'cpf': 'invalido'}},
+        ]
+        response = self.client.post(reverse('core:cliente-bulk'), itens, format='json')
+        self.assertEqual(response.status_code, 207)
+        resultados = response.data['resultados']
+        self.assertEqual([r['status'] for r in resultados], ['criado'] + ['erro'] * 4)
+        self.assertIn('username', resultados[1]['erros']['usuario'])
+        self.assertIn('cpf', resultados[2]['erros']['usuario'])
+        self.assertIn('non_field_errors', resultados[3]['erros']['usuario'])
+        self.assertIn('cpf', resultados[4]['erros']['usuario'])
+
+    def test_email_segue_o_cadastro_individual(self):
+        criar_usuario(500)
+        existente = User.objects.get(username='usuario500')
+        sem_email = payload_usuario(503)
+        del sem_email['email']
+        itens = [
+            {'usuario': {**payload_usuario(501), 'email': existente.email}},
+            {'usuario': payload_usuario(502)},
+            {'usuario': sem_email},
+        ]
+        response = self.client.post(reverse('core:cliente-bulk'), itens, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['status'] for r in response.data['resultados']], ['criado'] * 3)
+        self.assertEqual(User.objects.filter(email=existente.email).count(), 2)
+        self.assertEqual(User.objects.get(username='lote503').email, '')
+
+    def test_conflito_concorrente_fica_no_item(self):
+        itens = [{'usuario': payload_usuario(i)} for i in range(510, 513)]
+        verificar_unicidade = BulkRegistration.verificar_unicidade
+
+        def cadastro_concorrente(registro, lote, resultados):
+            aceitos = verificar_unicidade(registro, lote, resultados)
+            # Outro cadastro com o mesmo CPF entre a verificação e o INSERT
+            User.objects.create(
+                username='concorrente', nome='Outro', sobrenome='Cadastro', tipo_usuario='cliente',
+                sexo='F', cpf=itens[1]['usuario']['cpf'],
+            )
+            return aceitos
+
+        with mock.patch.object(BulkRegistration, 'verificar_unicidade', cadastro_concorrente):
+            response = self.client.post(reverse('core:cliente-bulk'), itens, format='json')
+        resultados = response.data['resultados']
+        self.assertEqual([r['status'] for r in resultados], ['criado', 'erro', 'criado'])
+        self.assertIn('cpf', resultados[1]['erros']['usuario'])
+        self.assertEqual(
+            Cliente.objects.filter(usuario__username__in=['lote510', 'lote512']).count(), 2
+        )
+        self.assertEqual(ler_estatisticas()['total_clientes'], 2)
+
+    def test_cadastra_profissionais_com_documento_de_busca(self):
+        itens = [
+            {'usuario': payload_usuario(i, 'profissional'), 'registro_profissional': f'R-{i}',
+             'especialidade': 'Ortopedia'}
+            for i in range(600, 603)
+        ]
+        itens.append({**itens[0], 'usuario': payload_usuario(603, 'profissional')})
+        response = self.client.post(reverse('core:profissional-bulk'), itens, format='json')
+        self.assertEqual(response.data['criados'], 3)
+        self.assertIn('registro_profissional', response.data['resultados'][3]['erros'])
+        profissional = Profissional.objects.get(registro_profissional='R-600')
+        self.assertEqual(profissional.busca, 'lote600 souza ortopedia r-600')
+
+    def test_lote_sem_itens_validos(self):
+        response = self.client.post(reverse('core:cliente-bulk'), [{}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['erros'], 1)
+
+    @override_settings(BULK_REGISTER_MAX_ITEMS=2)
+    def test_limite_de_itens(self):
+        itens = [{'usuario': payload_usuario(i)} for i in range(700, 703)]
+        response = self.client.post(reverse('core:cliente-bulk'), itens, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_restrito_a_staff(self):
+        self.client.force_authenticate(criar_usuario(2))
+        response = self.client.post(reverse('core:cliente-bulk'), [], format='json')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(PASSWORD_HASHING_WORKERS=2)
+    def test_hash_em_pool_de_processos(self):
+        hashes = hash_passwords(['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(len(hashes), 5)
+        self.assertTrue(all(check_password(p, h) for p, h in zip('abcde', hashes)))
+
+
+def cpf_valido(indice):
+    base = f'{indice:09d}'
+    return formatar_cpf(base + digitos_verificadores_cpf(base))
+
+
+class CpfTests(TestCase):
+
+    def test_normalizar_cpf(self):
+        self.assertEqual(normalizar_cpf('529.982.247-25'), '529.982.247-25')
+        self.assertEqual(normalizar_cpf('52998224725'), '529.982.247-25')
+        self.assertIsNone(normalizar_cpf('529.982.247-24'))
+        self.assertIsNone(normalizar_cpf('111.111.111-11'))
+        self.assertIsNone(normalizar_cpf('123'))
+
+
+class ImportacaoTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+
+    def escrever(self, nome, conteudo):
+        caminho = os.path.join(self.diretorio.name, nome)
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        return caminho
+
+    def test_import_clientes_csv(self):
+        criar_usuario(1)
+        existente = User.objects.get(username='usuario1')
+        existente.cpf = cpf_valido(1)
+        existente.save()
+        linhas = ['nome,sobrenome,sexo,cpf,data_nascimento,alergias']
+        linhas += [f'Cliente{i},Lima,f,{cpf_valido(i).replace(".", "").replace("-", "")},01/02/1990,'
+                   for i in range(10, 35)]
+        linhas.append(f'Invalido,Lima,F,123.456.789-00,,')
+        linhas.append(f'Existente,Lima,F,{cpf_valido(1)},,')
+        linhas.append(f'Repetido,Lima,F,{cpf_valido(10)},,')
+        caminho = self.escrever('clientes.csv', '\n'.join(linhas) + '\n')
+
+        saida = StringIO()
+        call_command('import_clientes', caminho, '--lote', '10', stdout=saida)
+
+        self.assertIn('25 importadas, 3 rejeitadas', saida.getvalue())
+        self.assertIn('linhas/s', saida.getvalue())
+        cliente = Cliente.objects.get(usuario__cpf=cpf_valido(10))
+        self.assertEqual(cliente.usuario.username, cpf_valido(10).replace('.', '').replace('-', ''))
+        self.assertEqual(cliente.usuario.data_nascimento, date(1990, 2, 1))
+        self.assertFalse(cliente.usuario.has_usable_password())
+        self.assertEqual(ler_estatisticas()['total_clientes'], 25)
+        self.assertFalse(os.path.exists(caminho + '.checkpoint'))
+        with open(caminho + '.rejeitados.ndjson', encoding='utf-8') as arquivo:
+            rejeitados = [json.loads(linha) for linha in arquivo]
+        self.assertEqual([r['linha'] for r in rejeitados], [26, 27, 28])
+        self.assertEqual(rejeitados[0]['erro'], 'CPF inválido.')
+
+    def test_estatisticas_do_banco_importado(self):
+        criar_usuario(1)
+        linhas = ['nome,sobrenome,sexo,cpf'] + [f'Cliente{i},Lima,F,{cpf_valido(i)}' for i in range(10, 13)]
+        caminho = self.escrever('clientes.csv', '\n'.join(linhas) + '\n')
+
+        call_command('import_clientes', caminho, '--database', 'replica', stdout=StringIO())
+
+        contadores = dict(Estatistica.objects.using('replica').values_list('chave', 'valor'))
+        self.assertEqual((contadores['usuarios'], contadores['clientes']), (3, 3))
+        self.assertEqual(ler_estatisticas()['total_usuarios'], 1)
+        self.assertEqual(ler_estatisticas()['total_clientes'], 0)
+
+    def test_retoma_do_checkpoint(self):
+        linhas = [json.dumps({'nome': f'P{i}', 'sobrenome': 'Reis', 'sexo': 'M', 'cpf': cpf_valido(i),
+                              'registro_profissional': f'REG-{i}', 'especialidade': 'Pediatria',
+                              'experiencia_anos': '3'})
+                  for i in range(50, 56)]
+        caminho = self.escrever('profissionais.ndjson', '\n'.join(linhas) + '\n')
+        with open(caminho + '.checkpoint', 'w', encoding='utf-8') as arquivo:
+            json.dump({'linhas': 4, 'importadas': 4, 'rejeitadas': 0}, arquivo)
+
+        saida = StringIO()
+        call_command('import_profissionais', caminho, '--retomar', stdout=saida)
+
+        self.assertIn('6 importadas, 0 rejeitadas', saida.getvalue())
+        self.assertEqual(
+            sorted(Profissional.objects.values_list('registro_profissional', flat=True)),
+            ['REG-54', 'REG-55'],
+        )
+        profissional = Profissional.objects.get(registro_profissional='REG-54')
+        self.assertEqual(profissional.experiencia_anos, 3)
+        self.assertEqual(profissional.busca, 'p54 reis pediatria reg-54')
+
+    def test_arquivo_inexistente(self):
+        with self.assertRaises(CommandError):
+            call_command('import_clientes', os.path.join(self.diretorio.name, 'nada.csv'))
+
+    def colunas_inseridas(self, importer_class, tabela):
+        """
+        Colunas do INSERT em `tabela` montado por carregar_copy
+        """
+        importer = importer_class(self.escrever('vazio.csv', ''))
+        with mock.patch.object(connections['default'], 'cursor') as cursor:
+            importer.carregar_copy([])
+        sql, params = next(
+            chamada.args for chamada in cursor.return_value.__enter__.return_value.execute.call_args_list
+            if 'INSERT INTO' in chamada.args[0]
+        )
+        self.assertEqual(sql.count('%s'), len(params))
+        colunas = re.search(rf'INSERT INTO {tabela} \((.*?)\)', sql, re.S).group(1)
+        return {coluna.strip() for coluna in colunas.split(',')}
+
+    def colunas_obrigatorias(self, model):
+        return {
+            campo.column for campo in model._meta.concrete_fields
+            if not campo.null and not campo.primary_key and campo.db_default is NOT_PROVIDED
+        }
+
+    def test_copy_preenche_colunas_obrigatorias(self):
+        colunas = self.colunas_inseridas(ClienteImporter, 'core_user')
+        self.assertEqual(self.colunas_obrigatorias(User) - colunas, set())
+
+        for importer_class in (ClienteImporter, ProfissionalImporter):
+            model = importer_class.model
+            colunas = self.colunas_inseridas(importer_class, model._meta.db_table)
+            self.assertEqual(self.colunas_obrigatorias(model) - colunas, set(), model.__name__)
+
+
+class ExportacaoTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        for indice in range(100, 130):
+            criar_profissional(indice, especialidade='Ortopedia' if indice % 2 else 'Neurologia')
+        criar_profissional(130, ativo=False)
+        criar_cliente(200, alergias='Dipirona, "látex"')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def conteudo(self, response):
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_exporta_profissionais_csv_com_filtros(self):
+        url = reverse('core:profissional-export')
+        with self.assertMaxQueries(1):
+            response = self.client.get(url, {'especialidade': 'orto'})
+            linhas = list(csv.DictReader(self.conteudo(response).splitlines()))
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('profissionais.csv', response['Content-Disposition'])
+        self.assertEqual(len(linhas), 15)
+        self.assertEqual(linhas[0]['especialidade'], 'Ortopedia')
+        self.assertEqual(linhas[0]['nome'], 'Nome00101')
+
+    def test_exporta_clientes_ndjson(self):
+        response = self.client.get(reverse('core:cliente-export'), {'formato': 'ndjson'})
+        linhas = [json.loads(linha) for linha in self.conteudo(response).splitlines()]
+        self.assertEqual(len(linhas), 1)
+        self.assertEqual(linhas[0]['alergias'], 'Dipirona, "látex"')
+        self.assertEqual(linhas[0]['username'], 'usuario200')
+
+    def test_exportacao_pode_ser_reimportada(self):
+        response = self.client.get(reverse('core:profissional-export'))
+        self.assertEqual(
+            next(csv.reader([self.conteudo(response).splitlines()[0]]))[1:-1],
+            [*CAMPOS_USUARIO, *ProfissionalImporter.campos_perfil],
+        )
+
+    def test_formato_invalido(self):
+        response = self.client.get(reverse('core:cliente-export'), {'formato': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_restrito_a_staff(self):
+        self.client.force_authenticate(criar_usuario(2))
+        response = self.client.get(reverse('core:cliente-export'))
+        self.assertEqual(response.status_code, 403)
+
+
+class FastSerializerTests(TestCase):
+    """
+    O FastSerializer deve produzir JSON idêntico byte a byte ao serializer DRF
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_profissional(100, formacao='Fisioterapia — USP', clinica='Clínica "Movimento"')
+        criar_profissional(101, experiencia_anos=12, ativo=False)
+        criar_cliente(200, alergias='látex\nDipirona')
+        cliente = criar_cliente(201)
+        cliente.usuario.data_nascimento = date(1985, 12, 31)
+        cliente.usuario.is_active = False
+        cliente.usuario.save()
+
+    def assertJsonIdentico(self, serializer_class, queryset):
+        renderer = JSONRenderer()
+        objetos = list(queryset)
+        esperado = renderer.render(serializer_class(objetos, many=True).data)
+        obtido = renderer.render(fast_serializer_for(serializer_class).many(objetos))
+        self.assertEqual(obtido, esperado)
+
+    def test_equivalencia(self):
+        casos = [
+            (UserSerializer, User.objects.all()),
+            (ProfissionalSerializer, Profissional.objects.select_related('usuario')),
+            (ClienteSerializer, Cliente.objects.select_related('usuario')),
+        ]
+        for serializer_class, queryset in casos:
+            with self.subTest(serializer=serializer_class.__name__):
+                self.assertJsonIdentico(serializer_class, queryset)
+
+    @override_settings(TIME_ZONE='America/Sao_Paulo')
+    def test_equivalencia_com_outro_fuso(self):
+        self.assertJsonIdentico(UserSerializer, User.objects.all())
+
+    @override_settings(USE_TZ=False)
+    def test_equivalencia_sem_timezone(self):
+        self.assertJsonIdentico(ClienteSerializer, Cliente.objects.select_related('usuario'))
+
+    def test_campos_write_only_ignorados(self):
+        fast = fast_serializer_for(UserCreateSerializer)
+        self.assertNotIn('password', [nome for nome, _ in fast.fields])
+
+    def test_listagem_da_api_usa_caminho_rapido(self):
+        admin = criar_usuario(1, is_staff=True)
+        client = APIClient()
+        client.force_authenticate(admin)
+        response = client.get(reverse('core:profissional-list'))
+        esperado = ProfissionalSerializer(
+            Profissional.objects.filter(ativo=True).select_related('usuario'), many=True
+        ).data
+        self.assertEqual(response.json()['results'], json.loads(JSONRenderer().render(esperado)))
+
+
+class SparseFieldsTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        for indice in range(100, 105):
+            criar_profissional(indice, formacao='x' * 500, horario_atendimento='y' * 500)
+        criar_cliente(200, historico_medico='z' * 500)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_fields_reduz_resposta_e_colunas(self):
+        url = reverse('core:profissional-list')
+        with self.assertMaxQueries(2) as context:
+            response = self.client.get(url, {'fields': 'id,nome_completo,especialidade'})
+        item = response.data['results'][0]
+        self.assertEqual(list(item), ['id', 'nome_completo', 'especialidade'])
+        self.assertEqual(item['nome_completo'], 'Nome00100 Silva')
+        sql = context.captured_queries[-1]['sql']
+        for coluna in ('formacao', 'horario_atendimento', 'endereco', 'busca'):
+            self.assertNotIn(coluna, sql)
+
+    def test_fields_aninhados(self):
+        response = self.client.get(
+            reverse('core:cliente-list'), {'fields': 'id,usuario.nome,usuario.email'}
+        )
+        self.assertEqual(response.data['results'][0]['usuario'],
+                         {'email': 'usuario200@example.com', 'nome': 'Nome00200'})
+
+    def test_exclude(self):
+        url = reverse('core:profissional-detail', args=[Profissional.objects.first().pk])
+        with self.assertMaxQueries(1) as context:
+            response = self.client.get(url, {'exclude': 'formacao,horario_atendimento,usuario.endereco'})
+        self.assertNotIn('formacao', response.data)
+        self.assertNotIn('endereco', response.data['usuario'])
+        self.assertIn('especialidade', response.data)
+        self.assertNotIn('formacao', context.captured_queries[0]['sql'])
+
+    def test_usuarios(self):
+        response = self.client.get(reverse('core:user-list'), {'fields': 'id,username'})
+        self.assertEqual(list(response.data['results'][0]), ['id', 'username'])
+
+    def test_cursor_com_fields_sem_consultas_extras(self):
+        for indice in range(110, 130):
+            criar_profissional(indice)
+        url = reverse('core:profissional-list')
+        primeira = self.client.get(url, {'cursor': '', 'fields': 'id'})
+        with self.assertMaxQueries(1):
+            response = self.client.get(primeira.data['next'])
+        self.assertEqual(list(response.data['results'][0]), ['id'])
+
+    def test_campo_invalido(self):
+        response = self.client.get(reverse('core:profissional-list'), {'fields': 'id,senha'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.data)
+        response = self.client.get(reverse('core:profissional-list'), {'fields': 'especialidade.x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        cls.profissional = criar_profissional(100)
+        criar_profissional(101)
+        cls.cliente = criar_cliente(200)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def revalidar(self, url, response, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_perfil(self):
+        url = reverse('core:user_profile')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(self.revalidar(url, response).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+
+        self.client.put(reverse('core:update_user_profile'), {'nome': 'Outro'}, format='json')
+        # force_authenticate mantém a instância; a autenticação por token a recarregaria
+        self.admin.refresh_from_db()
+        self.assertEqual(self.revalidar(url, response).status_code, 200)
+
+    def test_detalhe(self):
+        url = reverse('core:profissional-detail', args=[self.profissional.pk])
+        response = self.client.get(url)
+        with self.assertMaxQueries(1):
+            revalidacao = self.revalidar(url, response)
+        self.assertEqual(revalidacao.status_code, 304)
+        self.assertEqual(revalidacao['ETag'], response['ETag'])
+        self.assertEqual(revalidacao.content, b'')
+
+        self.profissional.especialidade = 'Ortopedia'
+        self.profissional.save()
+        self.assertEqual(self.revalidar(url, response).status_code, 200)
+
+    def test_detalhe_muda_com_usuario(self):
+        url = reverse('core:cliente-detail', args=[self.cliente.pk])
+        response = self.client.get(url)
+        usuario = User.objects.get(pk=self.cliente.usuario_id)
+        usuario.nome = 'Renomeado'
+        usuario.save()
+        self.assertEqual(self.revalidar(url, response).status_code, 200)
+
+    def test_lista(self):
+        url = reverse('core:profissional-list')
+        response = self.client.get(url)
+        with self.assertMaxQueries(1):
+            revalidacao = self.revalidar(url, response)
+        self.assertEqual(revalidacao.status_code, 304)
+
+        # ETag depende dos parâmetros da página
+        self.assertEqual(self.revalidar(url, response, fields='id').status_code, 200)
+
+        Profissional.objects.filter(pk=self.profissional.pk).delete()
+        self.assertEqual(self.revalidar(url, response).status_code, 200)
+
+    def test_lista_cursor_sem_count(self):
+        url = reverse('core:profissional-list')
+        response = self.client.get(url, {'cursor': ''})
+        with self.assertMaxQueries(1) as context:
+            revalidacao = self.revalidar(url, response, cursor='')
+        self.assertEqual(revalidacao.status_code, 304)
+        self.assertNotIn('COUNT', context.captured_queries[0]['sql'])
+
+        self.profissional.clinica = 'Nova'
+        self.profissional.save()
+        self.assertEqual(self.revalidar(url, response, cursor='').status_code, 200)
+
+    def test_lista_ignora_if_modified_since(self):
+        url = reverse('core:cliente-list')
+        response = self.client.get(url)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 200
+        )
+
+    def test_lista_muda_com_inclusao(self):
+        url = reverse('core:user-list')
+        response = self.client.get(url)
+        criar_cliente(201)
+        self.assertEqual(self.revalidar(url, response).status_code, 200)
+
+
+class CompressionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        for indice in range(100, 110):
+            criar_profissional(indice)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    @override_settings(RESPONSE_COMPRESSION=True, RESPONSE_COMPRESSION_MIN_SIZE=512)
+    def test_gzip(self):
+        import gzip
+
+        url = reverse('core:profissional-list')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content))['count'], 10)
+
+        pequena = self.client.get(reverse('core:user_profile'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(pequena.has_header('Content-Encoding'))
+
+    @override_settings(RESPONSE_COMPRESSION=True, RESPONSE_COMPRESSION_MIN_SIZE=512)
+    def test_sem_accept_encoding(self):
+        response = self.client.get(reverse('core:profissional-list'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_desativada_por_padrao(self):
+        response = self.client.get(reverse('core:profissional-list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+@override_settings(DIRECTORY_CACHE_ALIAS='directory')
+class DirectoryCacheTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        cls.profissional = criar_profissional(100, especialidade='Ortopedia')
+        cls.outro = criar_profissional(101, especialidade='Neurologia')
+
+    def setUp(self):
+        get_directory_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def ids(self, **params):
+        response = self.client.get(reverse('core:profissional-list'), params)
+        return [item['id'] for item in response.data['results']]
+
+    def test_lista_em_cache(self):
+        url = reverse('core:profissional-list')
+        primeira = self.client.get(url, {'especialidade': 'orto'})
+        with self.assertMaxQueries(0):
+            segunda = self.client.get(url, {'especialidade': 'orto'})
+        self.assertEqual(segunda.data, primeira.data)
+        self.assertEqual(segunda['ETag'], primeira['ETag'])
+
+        # Outros parâmetros e páginas usam outras chaves
+        with self.assertMaxQueries(2):
+            self.client.get(url, {'especialidade': 'neuro'})
+        with self.assertMaxQueries(2):
+            self.client.get(url, {'especialidade': 'orto', 'page_size': 1, 'page': 1})
+
+    def test_revalidacao_em_cache(self):
+        url = reverse('core:profissional-detail', args=[self.profissional.pk])
+        response = self.client.get(url)
+        with self.assertMaxQueries(0):
+            revalidacao = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidacao.status_code, 304)
+
+    def test_invalidacao_por_profissional(self):
+        self.assertEqual(self.ids(), [self.profissional.pk, self.outro.pk])
+        detalhe = reverse('core:profissional-detail', args=[self.outro.pk])
+        self.client.get(detalhe)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profissional.ativo = False
+            self.profissional.save()
+        self.assertEqual(self.ids(), [self.outro.pk])
+
+        # O detalhe dos demais profissionais continua em cache
+        with self.assertMaxQueries(0):
+            self.client.get(detalhe)
+
+        self.outro.delete()
+        self.assertEqual(self.ids(), [])
+        self.assertEqual(self.client.get(detalhe).status_code, 404)
+
+    def test_invalidacao_por_usuario(self):
+        url = reverse('core:profissional-detail', args=[self.profissional.pk])
+        self.client.get(url)
+        usuario = User.objects.get(pk=self.profissional.usuario_id)
+        usuario.nome = 'Renomeado'
+        usuario.save()
+        self.assertEqual(self.client.get(url).data['usuario']['nome'], 'Renomeado')
+        self.assertEqual(
+            self.client.get(reverse('core:profissional-list')).data['results'][-1]['usuario']['nome'],
+            'Renomeado',
+        )
+
+    def test_login_nao_invalida(self):
+        url = reverse('core:profissional-list')
+        self.client.get(url)
+        usuario = User.objects.get(pk=self.profissional.usuario_id)
+        usuario.save(update_fields=['last_login'])
+        with self.assertMaxQueries(0):
+            self.client.get(url)
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS, PASSWORD_HASHING_WORKERS=0)
+    def test_invalidacao_por_cadastro_em_lote(self):
+        self.assertEqual(len(self.ids()), 2)
+        payload = [{'usuario': payload_usuario(300, 'profissional'),
+                    'registro_profissional': 'CREFITO-300', 'especialidade': 'Ortopedia'}]
+        response = self.client.post(reverse('core:profissional-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(self.ids()), 3)
+
+    def test_recalculo_unico(self):
+        from threading import Thread
+
+        from .views import ProfissionalViewSet
+
+        view = ProfissionalViewSet()
+        chamadas = []
+
+        def calcular():
+            chamadas.append(1)
+            time.sleep(0.2)
+            view.validacao = (None, ('x',), False)
+            return Response({'ok': True})
+
+        request = Request(RequestFactory().get('/api/profissionais/'))
+        request.user = self.admin
+        request.accepted_media_type = 'application/json'
+        respostas = []
+        threads = [
+            Thread(target=lambda: respostas.append(
+                view.cached_response(request, ['profissionais:lista'], calcular)
+            ))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(chamadas), 1)
+        self.assertEqual([r.data for r in respostas], [{'ok': True}] * 5)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, PASSWORD_HASHING_WORKERS=0)
+class BenchmarkTests(TestCase):
+
+    def test_cpfs_validos_e_unicos(self):
+        indices = [*range(5000), 673331369, 19994107, INDICE_MAXIMO_CPF - 1]
+        cpfs = [cpf_bench(indice) for indice in indices]
+        self.assertEqual(len(set(cpfs)), len(cpfs))
+        self.assertTrue(all(normalizar_cpf(cpf) == cpf for cpf in cpfs))
+
+    def test_gerador_deterministico(self):
+        GeradorDados(200, semente=7).run()
+        primeira = list(User.objects.filter(username__startswith='bench').order_by('username')
+                        .values_list('username', 'nome', 'sobrenome', 'cpf', 'tipo_usuario'))
+        GeradorDados(200, semente=7).run()
+        segunda = list(User.objects.filter(username__startswith='bench').order_by('username')
+                       .values_list('username', 'nome', 'sobrenome', 'cpf', 'tipo_usuario'))
+        self.assertEqual(primeira, segunda)
+        self.assertEqual(len(primeira), 201)
+        self.assertEqual(
+            Profissional.objects.count() + Cliente.objects.count(), 200
+        )
+        self.assertEqual(ler_estatisticas()['total_usuarios'], 201)
+
+    def test_limpar_sem_sinais(self):
+        outro = criar_profissional(900)
+        GeradorDados(60, semente=3).run()
+        Token.objects.create(user=User.objects.get(username='bench_admin'))
+        self.assertTrue(HorarioDisponivel.objects.exists())
+        excluidos = RegistroExcluido.objects.count()
+
+        GeradorDados(0, lote=7).limpar()
+        self.assertEqual(list(User.objects.values_list('pk', flat=True)), [outro.usuario_id])
+        self.assertEqual(list(Profissional.objects.values_list('pk', flat=True)), [outro.pk])
+        self.assertFalse(Cliente.objects.exists())
+        self.assertFalse(HorarioDisponivel.objects.exists())
+        self.assertFalse(Token.objects.exists())
+        self.assertEqual(RegistroExcluido.objects.count(), excluidos)
+        estatisticas = ler_estatisticas()
+        self.assertEqual((estatisticas['total_usuarios'], estatisticas['total_profissionais']), (1, 1))
+
+    def test_comando(self):
+        saida = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        call_command(
+            'bench', usuarios=100, repeticoes=2, aquecimento=1, saida=saida,
+            rotas=['profissionais_lista', 'profissionais_detalhe', 'registro', 'login'],
+            stdout=StringIO(),
+        )
+        with open(saida, encoding='utf-8') as arquivo:
+            resultado = json.load(arquivo)
+        self.assertEqual(set(resultado['rotas']),
+                         {'profissionais_lista', 'profissionais_detalhe', 'registro', 'login'})
+        for medida in resultado['rotas'].values():
+            self.assertTrue(all(200 <= codigo < 300 for codigo in medida['status']))
+            self.assertLessEqual(medida['p50_ms'], medida['p99_ms'])
+        # Usuários criados pela rota de registro são removidos
+        self.assertFalse(User.objects.filter(username__startswith='bench_reg').exists())
+
+        call_command('bench', repeticoes=2, aquecimento=1, baseline=saida, tolerancia=1000,
+                     rotas=['profissionais_detalhe'], stdout=StringIO())
+
+    def test_comparacao(self):
+        baseline = {'rotas': {'lista': {'p95_ms': 10, 'pico_memoria_kb': 100, 'consultas': 2}}}
+        atual = {'rotas': {'lista': {'p95_ms': 11, 'pico_memoria_kb': 100, 'consultas': 2}}}
+        self.assertEqual(comparar(atual, baseline, tolerancia=0.2), [])
+        atual['rotas']['lista'].update(p95_ms=13, consultas=3)
+        self.assertEqual(
+            {regressao['metrica'] for regressao in comparar(atual, baseline, tolerancia=0.2)},
+            {'p95_ms', 'consultas'},
+        )
+
+    def test_baseline_com_regressao(self):
+        GeradorDados(50).run()
+        baseline = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        with open(baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump({'rotas': {'perfil': {'p95_ms': 0.0001, 'pico_memoria_kb': 0, 'consultas': 0}}}, arquivo)
+        with self.assertRaises(CommandError):
+            call_command('bench', repeticoes=2, aquecimento=0, baseline=baseline,
+                         rotas=['perfil'], stdout=StringIO())
+
+
+class RequestTimingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        criar_profissional(100)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def metricas(self, response):
+        return {
+            item.split(';')[0].strip(): item for item in response['Server-Timing'].split(',')
+        }
+
+    def test_server_timing(self):
+        response = self.client.get(reverse('core:profissional-list'))
+        metricas = self.metricas(response)
+        self.assertIn('desc="2 consultas"', metricas['db'])
+        self.assertEqual({'db', 'view', 'render', 'total'}, set(metricas))
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+    def test_fase_de_autenticacao(self):
+        self.admin.set_password('senha-forte-123')
+        self.admin.save()
+        response = APIClient().post(
+            reverse('core:login_user'),
+            {'username': self.admin.username, 'password': 'senha-forte-123'}, format='json',
+        )
+        self.assertIn('auth', self.metricas(response))
+
+    def test_log_estruturado(self):
+        with self.assertLogs('core.requests', 'INFO') as logs:
+            self.client.get(reverse('core:user_profile'))
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertEqual(registro['caminho'], '/api/auth/profile/')
+        self.assertEqual(registro['status'], 200)
+        self.assertEqual(registro['consultas'], 0)
+        self.assertNotIn('sql', registro)
+
+    @override_settings(REQUEST_TIMING_SLOW_MS=0)
+    def test_requisicao_lenta_registra_consultas(self):
+        with self.assertLogs('core.requests', 'WARNING') as logs:
+            self.client.get(reverse('core:cliente-list'))
+        registro = json.loads(logs.records[0].getMessage())
+        self.assertTrue(registro['lenta'])
+        self.assertEqual(len(registro['sql']), registro['consultas'])
+        self.assertLessEqual(len(registro['mais_lentas']), 3)
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_desativada(self):
+        response = self.client.get(reverse('core:user_profile'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+@override_settings(METRICS_TOKEN='segredo-do-coletor')
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        cls.token = Token.objects.create(user=cls.admin)
+
+    def metricas(self):
+        response = self.client.get(reverse('core:metrics'), HTTP_AUTHORIZATION='Bearer segredo-do-coletor')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        valores = {}
+        for linha in response.content.decode().splitlines():
+            if linha and not linha.startswith('#'):
+                serie, valor = linha.rsplit(' ', 1)
+                valores[serie] = float(valor)
+        return valores
+
+    def test_contadores_e_histogramas_por_rota(self):
+        antes = self.metricas()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        for _ in range(3):
+            client.get(reverse('core:health_check'))
+        depois = self.metricas()
+
+        serie = 'http_requests_total{route="core:health_check",method="GET",status="200"}'
+        self.assertEqual(depois[serie] - antes.get(serie, 0), 3)
+        contagem = 'http_request_duration_seconds_count{route="core:health_check",method="GET"}'
+        inf = 'http_request_duration_seconds_bucket{route="core:health_check",method="GET",le="+Inf"}'
+        self.assertEqual(depois[contagem], depois[inf])
+        self.assertIn('db_queries_per_request_sum{route="core:health_check"}', depois)
+
+        hits = 'auth_token_cache_total{result="hit"}'
+        self.assertGreaterEqual(depois[hits] - antes.get(hits, 0), 2)
+
+    @override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+    def test_tempo_de_hash_no_login(self):
+        self.admin.set_password('senha-forte-123')
+        self.admin.save()
+        self.client.post(reverse('core:login_user'),
+                         {'username': self.admin.username, 'password': 'senha-forte-123'})
+        self.assertIn(
+            'request_phase_duration_seconds_count{route="core:login_user",phase="auth"}',
+            self.metricas(),
+        )
+
+    def test_acesso_restrito(self):
+        url = reverse('core:metrics')
+        # Atrás de um proxy local todas as requisições chegam de 127.0.0.1
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer outro').status_code, 403)
+        self.assertEqual(
+            self.client.get(url, HTTP_AUTHORIZATION=f'Token {self.token.key}').status_code, 403
+        )
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer segredo-do-coletor').status_code, 200)
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_soma_entre_processos(self):
+        from .metrics import Registro
+
+        diretorio = tempfile.mkdtemp()
+        with override_settings(METRICS_DIR=diretorio):
+            registro = Registro()
+            registro.contador('requisicoes', 'Teste', ('route',))
+            registro.histograma('duracao', 'Teste', ('route',), buckets=(0.1, 1))
+            registro.incrementar('requisicoes', route='a')
+            registro.observar('duracao', 0.05, route='a')
+            # Valores gravados por outro worker
+            with open(os.path.join(diretorio, 'metricas_999999.json'), 'w') as arquivo:
+                json.dump({
+                    'requisicoes': {'["a"]': 2, '["b"]': 1},
+                    'duracao': {'["a"]': [[0, 1, 1], 5.5, 2]},
+                }, arquivo)
+            texto = registro.exportar()
+
+        self.assertIn('requisicoes{route="a"} 3', texto)
+        self.assertIn('requisicoes{route="b"} 1', texto)
+        self.assertIn('duracao_bucket{route="a",le="0.1"} 1', texto)
+        self.assertIn('duracao_bucket{route="a",le="1"} 2', texto)
+        self.assertIn('duracao_bucket{route="a",le="+Inf"} 3', texto)
+        self.assertIn('duracao_count{route="a"} 3', texto)
+        self.assertTrue(os.path.exists(os.path.join(diretorio, f'metricas_{os.getpid()}.json')))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class ExplainEndpointsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        criar_usuario(1, is_staff=True)
+        for indice in range(100, 110):
+            criar_profissional(indice)
+            criar_cliente(indice + 100)
+
+    def test_sem_varreduras_acima_do_limite(self):
+        saida = StringIO()
+        # core_estatistica (poucas linhas) é a única tabela varrida por inteiro
+        call_command('explain_endpoints', limite_linhas=20, stdout=saida)
+        self.assertIn('profissionais', saida.getvalue())
+        # A escrita do endpoint de registro é desfeita
+        self.assertFalse(User.objects.filter(username='explain_registro').exists())
+
+    def test_falha_com_varredura_completa(self):
+        erros = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('explain_endpoints', limite_linhas=5, stdout=StringIO(), stderr=erros)
+        self.assertIn('core_estatistica', erros.getvalue())
+
+    def test_json(self):
+        saida = StringIO()
+        call_command('explain_endpoints', json=True, stdout=saida)
+        resultado = json.loads(saida.getvalue())
+        endpoints = {item['endpoint']: item for item in resultado['resultados']}
+        self.assertEqual(endpoints['profissional_detalhe']['status'], 200)
+        self.assertEqual(resultado['violacoes'], [])
+
+    def test_varreduras_sqlite(self):
+        from .explain import varreduras_completas
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('Plano no formato do SQLite')
+        self.assertEqual(varreduras_completas([
+            'SCAN core_user',
+            'SCAN core_user USING COVERING INDEX core_user_atualizado_idx',
+            'SCAN core_profissional_busca VIRTUAL TABLE INDEX 0:M1',
+            'SEARCH core_user USING INTEGER PRIMARY KEY (rowid=?)',
+        ]), ['core_user'])
+
+
+class BenchConexoesTests(TransactionTestCase):
+    """
+    As threads do benchmark usam conexões próprias e só enxergam dados
+    confirmados, por isso sem a transação do TestCase
+    """
+
+    def test_modos(self):
+        GeradorDados(30).run()
+        banco = connections.settings['default']
+        original = dict(banco)
+        saida = os.path.join(tempfile.mkdtemp(), 'conexoes.json')
+        call_command('bench_conexoes', requisicoes=30, threads=2, saida=saida, stdout=StringIO())
+        with open(saida, encoding='utf-8') as arquivo:
+            resultado = json.load(arquivo)
+        modos = resultado['modos']
+        self.assertLessEqual({'sem_persistencia', 'persistente'}, set(modos))
+        for medida in modos.values():
+            self.assertEqual(medida['status'], [200])
+            self.assertGreater(medida['requisicoes_por_segundo'], 0)
+        # Conexões persistentes: no máximo uma por thread
+        self.assertLessEqual(modos['persistente']['conexoes'], 2)
+        self.assertEqual(dict(banco), original)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], PASSWORD_HASHERS=FAST_HASHERS)
+class ReplicaRouterTests(TransactionTestCase):
+    """
+    'replica' é uma base separada nos testes, atualizada só por `replicar`:
+    entre uma chamada e outra ela está atrasada em relação ao primário
+    """
+    databases = {'default', 'replica'}
+    tabelas_replicadas = (User, Profissional, Cliente, Estatistica)
+
+    def setUp(self):
+        caches['default'].clear()
+        self.admin = criar_usuario(1, is_staff=True)
+        self.profissional = criar_profissional(100)
+        self.cliente = criar_cliente(200)
+        self.replicar()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def replicar(self):
+        """
+        Copia para a réplica o estado atual do primário
+        """
+        with transaction.atomic(using='replica'), connections['replica'].cursor() as cursor:
+            for model in reversed(self.tabelas_replicadas):
+                cursor.execute(f'DELETE FROM {model._meta.db_table}')
+            for model in self.tabelas_replicadas:
+                model.objects.using('replica').bulk_create(model.objects.using('default').order_by('pk'))
+
+    def consultas(self, metodo, url, dados=None):
+        with CaptureQueriesContext(connections['default']) as primario, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(self.client, metodo)(url, dados, format='json')
+        return response, len(primario), len(replica)
+
+    def test_leituras_na_replica(self):
+        for url in (
+            reverse('core:profissional-list'),
+            reverse('core:profissional-detail', args=[self.profissional.pk]),
+            reverse('core:cliente-list'),
+            reverse('core:cliente-detail', args=[self.cliente.pk]),
+            reverse('core:user-list'),
+            reverse('core:user_stats'),
+        ):
+            response, primario, replica = self.consultas('get', url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(primario, 0, url)
+            self.assertGreater(replica, 0, url)
+
+    def test_escritas_no_primario(self):
+        response, primario, replica = self.consultas(
+            'patch', reverse('core:cliente-detail', args=[self.cliente.pk]), {'historico_medico': 'Lombalgia'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(primario, 0)
+        self.assertEqual(replica, 0)
+
+    def test_le_as_proprias_escritas(self):
+        outro = APIClient()
+        outro.force_authenticate(self.cliente.usuario)
+        url = reverse('core:cliente-detail', args=[self.cliente.pk])
+
+        response = self.client.patch(url, {'historico_medico': 'Lombalgia'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        # A réplica ainda não recebeu a alteração: quem escreveu lê do
+        # primário, os outros usuários leem o dado antigo da réplica
+        response, primario, replica = self.consultas('get', url)
+        self.assertEqual(response.data['historico_medico'], 'Lombalgia')
+        self.assertGreater(primario, 0)
+        self.assertEqual(replica, 0)
+        self.assertEqual(outro.get(url).data['historico_medico'], '')
+
+        self.replicar()
+        self.assertEqual(outro.get(url).data['historico_medico'], 'Lombalgia')
+
+        with override_settings(REPLICA_STICKY_SECONDS=0):
+            caches['default'].clear()
+            _, primario, replica = self.consultas('get', url)
+        self.assertEqual(primario, 0)
+
+    def test_perfil_nao_consulta_replica(self):
+        response, _, replica = self.consultas('get', reverse('core:user_profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(replica, 0)
+
+    def test_registro_marca_novo_usuario(self):
+        response = APIClient().post(reverse('core:register_user'), {
+            'username': 'novo', 'email': 'novo@example.com', 'password': 'senha-forte-123',
+            'password_confirmation': 'senha-forte-123', 'nome': 'Novo', 'sobrenome': 'Usuario',
+            'tipo_usuario': 'cliente', 'sexo': 'F', 'cpf': '529.982.247-25',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.client.force_authenticate(User.objects.get(username='novo'))
+        _, _, replica = self.consultas('get', reverse('core:cliente-list'))
+        self.assertEqual(replica, 0)
+
+    @override_settings(DIRECTORY_CACHE_ALIAS='directory')
+    def test_cache_do_diretorio_calculado_no_primario(self):
+        get_directory_cache().clear()
+        _, primario, replica = self.consultas('get', reverse('core:profissional-list'))
+        self.assertGreater(primario, 0)
+        self.assertEqual(replica, 0)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_sem_replicas(self):
+        _, primario, replica = self.consultas('get', reverse('core:cliente-list'))
+        self.assertGreater(primario, 0)
+        self.assertEqual(replica, 0)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SessoesTokensTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = criar_usuario(1)
+        cls.usuario.set_password('senha-forte-123')
+        cls.usuario.save()
+
+    def login(self):
+        return APIClient().post(reverse('core:login_user'), {
+            'username': self.usuario.username, 'password': 'senha-forte-123',
+        }, format='json')
+
+    def test_login_sem_sessao(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Session.objects.exists())
+        self.assertNotIn('sessionid', response.cookies)
+        self.usuario.refresh_from_db()
+        self.assertIsNotNone(self.usuario.last_login)
+
+    @override_settings(AUTH_TOKEN_ONLY=False)
+    def test_login_com_sessao(self):
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_limpeza(self):
+        agora = timezone.now()
+        store = SessionStore()
+        store.create()
+        expirada = SessionStore()
+        expirada.set_expiry(-1)
+        expirada.create()
+
+        ativo = Token.objects.create(user=self.usuario)
+        inativo = criar_usuario(2, is_active=False)
+        Token.objects.create(user=inativo)
+        antigo = criar_usuario(3, last_login=agora - timedelta(days=100))
+        Token.objects.filter(pk=Token.objects.create(user=antigo).pk).update(created=agora - timedelta(days=200))
+        recente = criar_usuario(4, last_login=agora - timedelta(days=5))
+        Token.objects.filter(pk=Token.objects.create(user=recente).pk).update(created=agora - timedelta(days=200))
+
+        saida = StringIO()
+        call_command('limpar_autenticacao', dias_tokens=30, lote=1, stdout=saida)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), [store.session_key])
+        self.assertEqual(
+            set(Token.objects.values_list('user__username', flat=True)),
+            {ativo.user.username, recente.username},
+        )
+        self.assertIn('1 sessão(ões)', saida.getvalue())
+        self.assertIn('2 token(s)', saida.getvalue())
+
+        # Sem --dias-tokens, só os tokens de usuários inativos
+        User.objects.filter(pk=recente.pk).update(is_active=False)
+        call_command('limpar_autenticacao', stdout=StringIO())
+        self.assertEqual(list(Token.objects.values_list('pk', flat=True)), [ativo.pk])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_limpeza_sem_sessoes_no_banco(self):
+        saida = StringIO()
+        call_command('limpar_autenticacao', stdout=saida)
+        self.assertIn('signed_cookies', saida.getvalue())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class SignedTokenTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = criar_usuario(1)
+        cls.usuario.set_password('senha-forte-123')
+        cls.usuario.save()
+
+    def setUp(self):
+        get_token_cache().clear()
+
+    def login(self):
+        response = APIClient().post(reverse('core:login_user'), {
+            'username': self.usuario.username, 'password': 'senha-forte-123',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['token']
+
+    def perfil(self, token):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return client.get(reverse('core:user_profile'))
+
+    def test_login_sem_token_no_banco(self):
+        token = self.login()
+        self.assertIn(':', token)
+        self.assertFalse(Token.objects.exists())
+        self.assertEqual(self.perfil(token).status_code, 200)
+        # Assinatura conferida em CPU e usuário em cache: nenhuma consulta
+        with self.assertNumQueries(0):
+            self.assertEqual(self.perfil(token).status_code, 200)
+
+    def test_registro(self):
+        response = APIClient().post(reverse('core:register_user'), {
+            'username': 'novo', 'email': 'novo@example.com', 'password': 'senha-forte-123',
+            'password_confirmation': 'senha-forte-123', 'nome': 'Novo', 'sobrenome': 'Usuario',
+            'tipo_usuario': 'cliente', 'sexo': 'F', 'cpf': '529.982.247-25',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.perfil(response.data['token']).data['username'], 'novo')
+
+    def test_logout_revoga(self):
+        token = self.login()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(client.post(reverse('core:logout_user')).status_code, 200)
+        self.assertEqual(self.perfil(token).status_code, 401)
+        self.assertEqual(self.perfil(self.login()).status_code, 200)
+
+    def test_troca_de_senha_revoga(self):
+        token = self.login()
+        self.assertEqual(self.perfil(token).status_code, 200)
+        self.usuario.refresh_from_db()
+        self.usuario.set_password('outra-senha-456')
+        self.usuario.save(update_fields=['password'])
+        self.assertEqual(self.perfil(token).status_code, 401)
+
+    def test_rehash_no_login_nao_revoga(self):
+        token = self.login()
+        User.objects.filter(pk=self.usuario.pk).update(
+            password=PBKDF2PasswordHasher().encode('senha-forte-123', 'sal', iterations=1)
+        )
+        with override_settings(PASSWORD_HASHERS=[*FAST_HASHERS, 'django.contrib.auth.hashers.PBKDF2PasswordHasher']):
+            # O login atualiza o hash para o algoritmo preferido
+            self.login()
+        self.assertTrue(User.objects.get(pk=self.usuario.pk).password.startswith('md5$'))
+        self.assertEqual(self.perfil(token).status_code, 200)
+
+    def test_expirado_ou_adulterado(self):
+        with override_settings(AUTH_SIGNED_TOKEN_TTL=-1):
+            expirado = self.login()
+        self.assertEqual(self.perfil(expirado).status_code, 401)
+
+        token = self.login()
+        dados, resto = token.split(':', 1)
+        self.assertEqual(self.perfil(dados[:-2] + 'xx:' + resto).status_code, 401)
+
+    def test_atualizar_perfil_com_usuario_em_cache(self):
+        token = self.login()
+        self.assertEqual(self.perfil(token).status_code, 200)
+        # Senha trocada em outro processo: o usuário em cache aqui é anterior
+        User.objects.filter(pk=self.usuario.pk).update(
+            password=make_password('outra-senha-456'), versao_token=F('versao_token') + 1, is_staff=True
+        )
+        versao = User.objects.get(pk=self.usuario.pk).versao_token
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        response = client.put(reverse('core:update_user_profile'), {'telefone': '11977776666'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        usuario = User.objects.get(pk=self.usuario.pk)
+        self.assertEqual(usuario.telefone, '11977776666')
+        self.assertTrue(usuario.check_password('outra-senha-456'))
+        self.assertEqual(usuario.versao_token, versao)
+        self.assertTrue(usuario.is_staff)
+
+    def test_usuario_inativo(self):
+        token = self.login()
+        User.objects.filter(pk=self.usuario.pk).update(is_active=False)
+        get_token_cache().clear()
+        self.assertEqual(self.perfil(token).status_code, 401)
+
+    def test_token_do_drf_continua_valido(self):
+        legado = Token.objects.create(user=self.usuario)
+        self.assertEqual(self.perfil(legado.key).status_code, 200)
+        with override_settings(AUTH_SIGNED_TOKENS=False):
+            self.assertEqual(self.login(), legado.key)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, PASSWORD_HASHING_WORKERS=0)
+class AsyncViewsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = criar_usuario(1)
+        cls.usuario.set_password('senha-forte-123')
+        cls.usuario.save()
+        cls.profissionais = [criar_profissional(indice) for indice in range(10, 35)]
+        cls.admin = criar_usuario(2, is_staff=True)
+        cls.admin.set_password('senha-forte-123')
+        cls.admin.save()
+
+    def setUp(self):
+        get_token_cache().clear()
+
+    async def login(self, username='usuario1', password='senha-forte-123'):
+        return await self.async_client.post(
+            reverse('core:async_login_user'),
+            {'username': username, 'password': password}, content_type='application/json',
+        )
+
+    async def get(self, nome, token, *args, dados=None, etag=None):
+        cabecalhos = {'Authorization': f'Token {token}'}
+        if etag:
+            cabecalhos['If-None-Match'] = etag
+        return await self.async_client.get(reverse(nome, args=args), dados, headers=cabecalhos)
+
+    async def test_login_verifica_senha_no_pool(self):
+        with mock.patch.object(hashing, 'executar_no_pool', wraps=hashing.executar_no_pool) as pool:
+            response = await self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(pool.call_count, 1)
+        token = response.json()['token']
+        self.assertEqual(response.json()['user']['username'], 'usuario1')
+        # O token vale também para as rotas síncronas
+        perfil = await self.get('core:user_profile', token)
+        self.assertEqual(perfil.json()['username'], 'usuario1')
+
+    async def test_login_invalido(self):
+        for username, password in (('usuario1', 'errada'), ('inexistente', 'senha-forte-123')):
+            response = await self.login(username, password)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'non_field_errors': ['Credenciais inválidas.']})
+        response = await self.async_client.post(
+            reverse('core:async_login_user'), {}, content_type='application/json'
+        )
+        self.assertEqual(set(response.json()), {'username', 'password'})
+
+    async def test_registro(self):
+        dados = {
+            'username': 'novo', 'email': 'novo@example.com', 'password': 'senha-forte-123',
+            'password_confirmation': 'senha-forte-123', 'nome': 'Novo', 'sobrenome': 'Usuario',
+            'tipo_usuario': 'cliente', 'sexo': 'F', 'cpf': '529.982.247-25',
+        }
+        with mock.patch.object(hashing, 'executar_no_pool', wraps=hashing.executar_no_pool) as pool:
+            response = await self.async_client.post(
+                reverse('core:async_register_user'), dados, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(pool.call_count, 1)
+        user = await User.objects.aget(username='novo')
+        self.assertTrue(await user.acheck_password('senha-forte-123'))
+        perfil = await self.get('core:async_user_profile', response.json()['token'])
+        self.assertEqual(perfil.json()['username'], 'novo')
+
+        response = await self.async_client.post(
+            reverse('core:async_register_user'), {**dados, 'cpf': '111.444.777-35'},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('username', response.json())
+
+    async def test_perfil(self):
+        token = (await self.login()).json()['token']
+        response = await self.get('core:async_user_profile', token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['username'], 'usuario1')
+        response = await self.get('core:async_user_profile', token, etag=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get(reverse('core:async_user_profile'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Token')
+        response = await self.get('core:async_user_profile', 'invalido:token')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_listagem_igual_a_sincrona(self):
+        token = (await self.login()).json()['token']
+        for query in ({}, {'page': 2}, {'page_size': 5, 'fields': 'id,usuario.nome'}, {'especialidade': 'orto'}):
+            with self.subTest(query=query):
+                assincrona = await self.get('core:async_profissional_list', token, dados=query)
+                sincrona = await self.get('core:profissional-list', token, dados=query)
+                self.assertEqual(assincrona.status_code, 200)
+                dados, esperado = assincrona.json(), sincrona.json()
+                self.assertEqual(dados['count'], esperado['count'])
+                self.assertEqual(dados['results'], esperado['results'])
+                self.assertEqual(dados['next'] is None, esperado['next'] is None)
+
+        response = await self.get('core:async_profissional_list', token)
+        self.assertEqual(response.json()['count'], 25)
+        self.assertIn('/api/async/profissionais/?page=2', response.json()['next'])
+        response = await self.get(
+            'core:async_profissional_list', token, etag=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+        response = await self.get('core:async_profissional_list', token, dados={'page': 9})
+        self.assertEqual(response.status_code, 404)
+        response = await self.get('core:async_profissional_list', token, dados={'fields': 'inexistente'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_cursor_usa_a_viewset_sincrona(self):
+        token = (await self.login()).json()['token']
+        response = await self.get('core:async_profissional_list', token, dados={'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('count', response.json())
+        self.assertEqual(len(response.json()['results']), 20)
+
+    async def test_detalhe(self):
+        token = (await self.login()).json()['token']
+        profissional = self.profissionais[0]
+        response = await self.get('core:async_profissional_detail', token, profissional.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), (await self.get('core:profissional-detail', token, profissional.pk)).json())
+        response = await self.get(
+            'core:async_profissional_detail', token, profissional.pk, etag=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+        response = await self.get('core:async_profissional_detail', token, 999999)
+        self.assertEqual(response.status_code, 404)
+
+    async def test_permissoes_da_viewset(self):
+        token = (await self.login()).json()['token']
+        response = await self.get('core:async_user_list', token)
+        self.assertEqual(response.status_code, 403)
+        token = (await self.login('usuario2')).json()['token']
+        response = await self.get('core:async_user_list', token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 27)
+
+
+def payload_registro(**extra):
+    return {
+        'username': 'novo', 'email': 'novo@example.com', 'password': 'senha-forte-123',
+        'password_confirmation': 'senha-forte-123', 'nome': 'Novo', 'sobrenome': 'Usuario',
+        'tipo_usuario': 'cliente', 'sexo': 'F', 'cpf': '529.982.247-25', **extra,
+    }
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class RegistroTests(TestCase):
+    """
+    Registro em uma transação: hash antes do INSERT, uma escrita por tabela
+    e unicidade pela constraint do banco
+    """
+
+    def registrar(self):
+        with CaptureQueriesContext(connection) as context:
+            response = APIClient().post(reverse('core:register_user'), payload_registro(), format='json')
+        self.assertEqual(response.status_code, 201)
+        return [query['sql'] for query in context.captured_queries]
+
+    def test_consultas_do_registro(self):
+        sql = self.registrar()
+        # SAVEPOINT/RELEASE só existem aqui porque o teste já roda em uma
+        # transação; em produção são BEGIN/COMMIT da própria conexão
+        self.assertEqual(len(sql), 5, '\n'.join(sql))
+        self.assertTrue(sql[0].startswith('SAVEPOINT') and sql[-1].startswith('RELEASE SAVEPOINT'))
+        self.assertTrue(sql[1].startswith('INSERT INTO "core_user"'))
+        # Estatísticas (sinal post_save): garante as chaves e incrementa
+        self.assertTrue(all('core_estatistica' in consulta for consulta in sql[2:4]))
+        self.assertFalse([consulta for consulta in sql if consulta.startswith('SELECT')])
+
+        user = User.objects.get(username='novo')
+        self.assertTrue(user.check_password('senha-forte-123'))
+        self.assertEqual(user.versao_token, 0)
+
+    @override_settings(AUTH_SIGNED_TOKENS=False)
+    def test_token_do_drf_na_mesma_transacao(self):
+        sql = self.registrar()
+        self.assertEqual(len(sql), 6, '\n'.join(sql))
+        self.assertTrue(sql[4].startswith('INSERT INTO "authtoken_token"'))
+        self.assertTrue(sql[5].startswith('RELEASE SAVEPOINT'))
+        self.assertTrue(Token.objects.filter(user__username='novo').exists())
+
+    def test_duplicado_pela_constraint(self):
+        criar_usuario(1)
+        casos = (
+            ({'username': 'usuario1'}, 'username'),
+            ({'cpf': '001.001.001-01'}, 'cpf'),
+        )
+        for extra, campo in casos:
+            with self.subTest(campo=campo):
+                with CaptureQueriesContext(connection) as context:
+                    response = APIClient().post(
+                        reverse('core:register_user'), payload_registro(**extra), format='json'
+                    )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.data), [campo])
+                self.assertFalse([q for q in context.captured_queries if q['sql'].startswith('SELECT')])
+        self.assertEqual(User.objects.count(), 1)
+
+    @override_settings(AUTH_SIGNED_TOKENS=False)
+    def test_falha_no_token_desfaz_o_usuario(self):
+        with mock.patch.object(Token.objects, 'create', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                APIClient().post(reverse('core:register_user'), payload_registro(), format='json')
+        self.assertFalse(User.objects.filter(username='novo').exists())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class RegistroPerfilTransacaoTests(TransactionTestCase):
+    """
+    Cadastro de profissional pela ViewSet: sem transação externa, a violação
+    de unicidade desfaz também o usuário já inserido
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(criar_usuario(1, is_staff=True))
+
+    def cadastrar(self, registro, **usuario):
+        return self.client.post(reverse('core:profissional-list'), {
+            'usuario': payload_registro(**usuario), 'registro_profissional': registro,
+            'especialidade': 'Ortopedia',
+        }, format='json')
+
+    def test_registro_profissional_duplicado(self):
+        # BEGIN, usuário + estatísticas, profissional + estatísticas, COMMIT
+        with self.assertNumQueries(8):
+            self.assertEqual(self.cadastrar('CREFITO-1').status_code, 201)
+        response = self.cadastrar('CREFITO-1', username='outro', cpf='111.444.777-35')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data), ['registro_profissional'])
+        self.assertFalse(User.objects.filter(username='outro').exists())
+
+        response = self.cadastrar('CREFITO-2', cpf='111.444.777-35')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['usuario']), ['username'])
+        self.assertEqual(Profissional.objects.count(), 1)
+
+
+class DisponibilidadeTests(TestCase):
+    """
+    Horários estruturados e a consulta "quem atende no intervalo"
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        cls.joao = criar_profissional(100, horario_atendimento='Seg a Sex, 8h às 18h')
+        cls.maria = criar_profissional(
+            101, especialidade='Neurologia', horario_atendimento='Seg, Qua 14:00-20:00; Sáb 8h-12h'
+        )
+        cls.sem_horario = criar_profissional(102, horario_atendimento='Combinar por telefone')
+        call_command('interpretar_horarios', stdout=StringIO())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def momento(self, dia, hora_):
+        # 2026-10-19 é uma segunda-feira
+        return datetime(2026, 10, 19 + dia, hora_, tzinfo=fuso_agenda())
+
+    def disponiveis(self, inicio, fim, **params):
+        response = self.client.get(
+            reverse('core:profissional-disponiveis'), {'inicio': inicio, 'fim': fim, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return sorted(item['id'] for item in response.data['results'])
+
+    def test_interpretar_horario(self):
+        self.assertEqual(interpretar_horario('Seg a Sex, 8h às 18h'), [
+            (dia, hora(8), hora(18)) for dia in range(5)
+        ])
+        self.assertEqual(interpretar_horario('Segunda, Quarta e Sexta 14:00-20:00; Sábado 8h-12h'), [
+            (0, hora(14), hora(20)), (2, hora(14), hora(20)), (4, hora(14), hora(20)), (5, hora(8), hora(12)),
+        ])
+        self.assertEqual(interpretar_horario('Sex a Seg 9h30 - 12h'), [
+            (dia, hora(9, 30), hora(12)) for dia in (0, 4, 5, 6)
+        ])
+        self.assertEqual(interpretar_horario('Fins de semana, das 8 às 12'), [
+            (5, hora(8), hora(12)), (6, hora(8), hora(12)),
+        ])
+        self.assertEqual(interpretar_horario('Atendimento domiciliar, combinar'), [])
+        self.assertEqual(interpretar_horario('Seg a Sex'), [])
+
+    def test_horarios_gerados_do_texto(self):
+        self.assertEqual(self.joao.horarios.count(), 5)
+        self.assertEqual(self.maria.horarios.count(), 3)
+        self.assertFalse(self.sem_horario.horarios.exists())
+        horario = self.maria.horarios.get(dia_semana=5)
+        self.assertEqual((horario.inicio_semana, horario.fim_semana), (5 * 1440 + 480, 5 * 1440 + 720))
+
+    def test_comando_nao_duplica_e_substitui(self):
+        saida = StringIO()
+        call_command('interpretar_horarios', stdout=saida)
+        self.assertEqual(HorarioDisponivel.objects.count(), 8)
+        Profissional.objects.filter(pk=self.joao.pk).update(horario_atendimento='Sábado 9h-13h')
+        call_command('interpretar_horarios', '--substituir', stdout=saida)
+        self.assertEqual(list(self.joao.horarios.values_list('dia_semana', flat=True)), [5])
+        self.assertEqual(HorarioDisponivel.objects.count(), 4)
+
+    def test_horario_semanal_cobre_o_intervalo(self):
+        self.assertEqual(self.disponiveis(self.momento(0, 15), self.momento(0, 16)), [self.joao.pk, self.maria.pk])
+        self.assertEqual(self.disponiveis(self.momento(0, 9), self.momento(0, 10)), [self.joao.pk])
+        # Cobertura parcial não basta
+        self.assertEqual(self.disponiveis(self.momento(0, 17), self.momento(0, 19)), [self.maria.pk])
+        self.assertEqual(self.disponiveis(self.momento(6, 9), self.momento(6, 10)), [])
+
+    def test_data_sem_fuso_usa_o_fuso_da_agenda(self):
+        self.assertEqual(self.disponiveis('2026-10-24T09:00', '2026-10-24T10:00'), [self.maria.pk])
+        # 12h UTC = 9h em São Paulo
+        self.assertEqual(self.disponiveis('2026-10-24T12:00Z', '2026-10-24T13:00Z'), [self.maria.pk])
+
+    def test_bloqueio_e_horario_extra(self):
+        ExcecaoDisponibilidade.objects.create(
+            profissional=self.joao, inicio=self.momento(0, 15), fim=self.momento(0, 17), motivo='Congresso'
+        )
+        ExcecaoDisponibilidade.objects.create(
+            profissional=self.maria, inicio=self.momento(1, 8), fim=self.momento(1, 12), disponivel=True
+        )
+        self.assertEqual(self.disponiveis(self.momento(0, 14), self.momento(0, 16)), [self.maria.pk])
+        self.assertEqual(self.disponiveis(self.momento(0, 10), self.momento(0, 11)), [self.joao.pk])
+        self.assertEqual(self.disponiveis(self.momento(1, 9), self.momento(1, 10)), [self.joao.pk, self.maria.pk])
+        # Na semana seguinte o extra não vale mais
+        self.assertEqual(self.disponiveis(self.momento(8, 9), self.momento(8, 10)), [self.joao.pk])
+
+    def test_filtros_da_listagem(self):
+        inicio, fim = self.momento(0, 15), self.momento(0, 16)
+        self.assertEqual(self.disponiveis(inicio, fim, especialidade='neuro'), [self.maria.pk])
+        self.assertEqual(self.disponiveis(inicio, fim, q='ortopedia'), [self.joao.pk])
+
+    def test_intervalo_invalido(self):
+        url = reverse('core:profissional-disponiveis')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data), {'inicio', 'fim'})
+        for inicio, fim in [
+            ('2026-10-19T10:00', '2026-10-19T09:00'),
+            ('2026-10-19T10:00', '2026-10-20T10:01'),
+            ('2026-10-19T10:00', 'amanhã'),
+        ]:
+            response = self.client.get(url, {'inicio': inicio, 'fim': fim})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('fim', response.data)
+
+    def test_consultas(self):
+        with self.assertNumQueries(2):
+            self.client.get(
+                reverse('core:profissional-disponiveis'), {'inicio': self.momento(0, 15), 'fim': self.momento(0, 16)}
+            )
+
+
+def em(dia, hora_, minuto=0):
+    # 2030-01-07 é uma segunda-feira
+    return datetime(2030, 1, 7 + dia, hora_, minuto, tzinfo=fuso_agenda())
+
+
+class AgendamentoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        cls.profissional = criar_profissional(100, horario_atendimento='Seg a Sex, 8h às 18h')
+        cls.outro = criar_profissional(101)
+        cls.cliente = criar_cliente(200)
+        cls.outro_cliente = criar_cliente(201)
+        call_command('interpretar_horarios', stdout=StringIO())
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.cliente.usuario)
+
+    def agendar(self, inicio, fim, profissional=None, cliente=None):
+        return self.client.post(reverse('core:agendamento-list'), {
+            'profissional': (profissional or self.profissional).pk,
+            'cliente': (cliente or self.cliente).pk,
+            'inicio': inicio.isoformat(), 'fim': fim.isoformat(),
+        }, format='json')
+
+    def criar(self, inicio, fim, profissional=None, cliente=None):
+        return gravar(Agendamento(
+            profissional=profissional or self.profissional, cliente=cliente or self.cliente, inicio=inicio, fim=fim,
+        ))
+
+    def test_agendar(self):
+        response = self.agendar(em(0, 10), em(0, 11))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['status'], 'agendado')
+        self.assertEqual(Agendamento.objects.get().cliente_id, self.cliente.pk)
+
+    def test_sobreposicao_recusada(self):
+        self.criar(em(0, 10), em(0, 11))
+        for inicio, fim in [(em(0, 10), em(0, 11)), (em(0, 9, 30), em(0, 10, 30)),
+                            (em(0, 10, 15), em(0, 10, 45)), (em(0, 9), em(0, 12))]:
+            response = self.agendar(inicio, fim)
+            self.assertEqual(response.status_code, 409)
+            self.assertIn('error', response.data)
+        self.assertEqual(Agendamento.objects.count(), 1)
+
+    def test_horarios_adjacentes_e_outro_profissional(self):
+        self.criar(em(0, 10), em(0, 11))
+        self.assertEqual(self.agendar(em(0, 11), em(0, 12)).status_code, 201)
+        self.assertEqual(self.agendar(em(0, 9), em(0, 10)).status_code, 201)
+        self.assertEqual(self.agendar(em(0, 10), em(0, 11), profissional=self.outro).status_code, 201)
+
+    def test_conflito_garantido_pelo_banco(self):
+        self.criar(em(0, 10), em(0, 11))
+        with self.assertRaises(ConflitoAgenda):
+            self.criar(em(0, 10, 30), em(0, 11, 30), cliente=self.outro_cliente)
+        # Mesmo sem passar por core.agendamentos
+        with self.assertRaisesMessage(IntegrityError, 'core_agendamento_sem_conflito'):
+            with transaction.atomic():
+                Agendamento.objects.bulk_create([Agendamento(
+                    profissional=self.profissional, cliente=self.cliente, inicio=em(0, 9), fim=em(0, 12),
+                )])
+        with self.assertRaisesMessage(IntegrityError, 'core_agendamento_duracao_maxima'):
+            with transaction.atomic():
+                Agendamento.objects.create(
+                    profissional=self.profissional, cliente=self.cliente, inicio=em(1, 0), fim=em(2, 1),
+                )
+
+    def test_cancelar_libera_o_horario(self):
+        agendamento = self.criar(em(0, 10), em(0, 11))
+        url = reverse('core:agendamento-cancelar', args=[agendamento.pk])
+        response = self.client.post(url)
+        self.assertEqual(response.data['status'], 'cancelado')
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.agendar(em(0, 10), em(0, 11)).status_code, 201)
+
+    def test_remarcar(self):
+        agendamento = self.criar(em(0, 10), em(0, 11))
+        self.criar(em(0, 14), em(0, 15), cliente=self.outro_cliente)
+        url = reverse('core:agendamento-remarcar', args=[agendamento.pk])
+        # Sobrepor o próprio horário não é conflito
+        response = self.client.post(url, {'inicio': em(0, 10, 30), 'fim': em(0, 11, 30)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(url, {'inicio': em(0, 14, 30), 'fim': em(0, 15, 30)}, format='json')
+        self.assertEqual(response.status_code, 409)
+        agendamento.refresh_from_db()
+        self.assertEqual((agendamento.inicio, agendamento.fim), (em(0, 10, 30), em(0, 11, 30)))
+
+    def test_validacao(self):
+        self.assertIn('fim', self.agendar(em(0, 11), em(0, 10)).data)
+        self.assertIn('fim', self.agendar(em(0, 8), em(0, 21)).data)
+        passado = timezone.now() - timedelta(days=1)
+        self.assertIn('inicio', self.agendar(passado, passado + timedelta(hours=1)).data)
+        response = self.agendar(em(0, 10), em(0, 11), cliente=self.outro_cliente)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+
+    def test_listagem_so_de_quem_participa(self):
+        meu = self.criar(em(0, 10), em(0, 11))
+        self.criar(em(0, 12), em(0, 13), cliente=self.outro_cliente)
+        response = self.client.get(reverse('core:agendamento-list'))
+        self.assertEqual([item['id'] for item in response.data['results']], [meu.pk])
+        self.client.force_authenticate(self.profissional.usuario)
+        response = self.client.get(reverse('core:agendamento-list'))
+        self.assertEqual(response.data['count'], 2)
+
+    def test_agenda_do_dia_e_da_semana(self):
+        segunda = self.criar(em(0, 10), em(0, 11))
+        terca = self.criar(em(1, 9), em(1, 10), cliente=self.outro_cliente)
+        self.criar(em(7, 9), em(7, 10))
+        cancelado = self.criar(em(2, 9), em(2, 10))
+        cancelar(cancelado)
+        url = reverse('core:profissional-agenda', args=[self.profissional.pk])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'data': '2030-01-07'})
+        self.assertEqual([item['id'] for item in response.data['agendamentos']], [segunda.pk])
+
+        response = self.client.get(url, {'data': '2030-01-09', 'periodo': 'semana'})
+        agendamentos = response.data['agendamentos']
+        self.assertEqual(len(agendamentos), 2)
+        # Agendamento de outro cliente: só o horário
+        self.assertEqual(agendamentos[1], HorarioOcupadoSerializer(terca).data)
+        self.assertEqual(self.client.get(url, {'data': 'ontem'}).status_code, 400)
+
+    def test_agendado_sai_dos_disponiveis(self):
+        self.criar(em(0, 10), em(0, 11))
+        url = reverse('core:profissional-disponiveis')
+        response = self.client.get(url, {'inicio': em(0, 10, 30), 'fim': em(0, 11)})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(url, {'inicio': em(0, 11), 'fim': em(0, 12)})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.profissional.pk])
+
+
+class AgendamentoConcorrenciaTests(TransactionTestCase):
+    """
+    Reservas simultâneas em conexões próprias, sem a transação do TestCase
+    """
+
+    def test_reservas_paralelas_sem_sobreposicao(self):
+        from threading import Barrier, Thread
+
+        profissional = criar_profissional(100)
+        clientes = [criar_cliente(200 + indice) for indice in range(8)]
+        barreira = Barrier(len(clientes))
+        resultados = []
+
+        def reservar(indice, cliente):
+            # Inícios a cada 15 minutos, uma hora cada
+            inicio = em(0, 10, 15 * (indice % 4))
+            barreira.wait()
+            try:
+                while True:
+                    try:
+                        gravar(Agendamento(
+                            profissional=profissional, cliente=cliente, inicio=inicio, fim=inicio + timedelta(hours=1),
+                        ))
+                        resultados.append('ok')
+                        break
+                    except ConflitoAgenda:
+                        resultados.append('conflito')
+                        break
+                    except OperationalError:
+                        # Banco em memória compartilhado: sem espera pelo lock
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        threads = [Thread(target=reservar, args=(indice, cliente)) for indice, cliente in enumerate(clientes)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Todos os intervalos se sobrepõem: exatamente uma reserva passa
+        self.assertEqual(sorted(resultados), ['conflito'] * (len(clientes) - 1) + ['ok'])
+        self.assertEqual(Agendamento.objects.count(), 1)
+
+
+@override_settings(SYNC_SAFETY_SECONDS=0)
+class DeltaSyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = criar_usuario(1, is_staff=True)
+        cls.profissionais = [criar_profissional(indice) for indice in range(100, 125)]
+        cls.cliente = criar_cliente(200)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def sync(self, url_name='core:profissional-sync', **params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def sincronizar_tudo(self, url_name='core:profissional-sync'):
+        ids, cursor = [], None
+        while True:
+            dados = self.sync(url_name, **({'cursor': cursor} if cursor else {}))
+            ids += [item['id'] for item in dados['results']]
+            cursor = dados['cursor']
+            if not dados['has_more']:
+                return ids, cursor
+
+    def test_sincronizacao_completa_em_paginas(self):
+        primeira = self.sync()
+        self.assertEqual(len(primeira['results']), 20)
+        self.assertTrue(primeira['has_more'])
+        ids, cursor = self.sincronizar_tudo()
+        self.assertEqual(sorted(ids), sorted(p.pk for p in self.profissionais))
+
+    def test_cliente_em_dia_custa_uma_consulta(self):
+        ids, cursor = self.sincronizar_tudo()
+        with self.assertNumQueries(1):
+            dados = self.sync(cursor=cursor)
+        self.assertEqual((dados['results'], dados['deleted'], dados['has_more']), ([], [], False))
+        self.assertEqual(dados['cursor'], cursor)
+
+    def test_alteracoes_desde_o_cursor(self):
+        ids, cursor = self.sincronizar_tudo()
+        profissional = self.profissionais[3]
+        profissional.especialidade = 'Neurologia'
+        profissional.save()
+        usuario = self.profissionais[7].usuario
+        usuario.nome = 'Renomeado'
+        usuario.save()
+        with self.assertNumQueries(2):
+            dados = self.sync(cursor=cursor)
+        self.assertEqual([item['id'] for item in dados['results']], [profissional.pk, self.profissionais[7].pk])
+        self.assertEqual(dados['results'][1]['usuario']['nome'], 'Renomeado')
+
+    def test_login_nao_gera_alteracao(self):
+        ids, cursor = self.sincronizar_tudo()
+        usuario = self.profissionais[0].usuario
+        usuario.last_login = timezone.now()
+        usuario.save(update_fields=['last_login'])
+        self.assertEqual(self.sync(cursor=cursor)['results'], [])
+
+    def test_desativados_e_excluidos_como_removidos(self):
+        ids, cursor = self.sincronizar_tudo()
+        inativo, excluido = self.profissionais[1], self.profissionais[2]
+        inativo.ativo = False
+        inativo.save()
+        excluido.usuario.delete()
+        dados = self.sync(cursor=cursor)
+        self.assertEqual(dados['results'], [])
+        self.assertEqual(dados['deleted'], [inativo.pk, excluido.pk])
+        # Reativado volta como registro
+        inativo.ativo = True
+        inativo.save()
+        self.assertEqual([item['id'] for item in self.sync(cursor=dados['cursor'])['results']], [inativo.pk])
+
+    def test_clientes(self):
+        ids, cursor = self.sincronizar_tudo('core:cliente-sync')
+        self.assertEqual(ids, [self.cliente.pk])
+        Cliente.objects.filter(pk=self.cliente.pk).delete()
+        dados = self.sync('core:cliente-sync', cursor=cursor)
+        self.assertEqual(dados['deleted'], [self.cliente.pk])
+
+    def test_updated_since(self):
+        profissional = self.profissionais[5]
+        limite = timezone.now()
+        profissional.save()
+        dados = self.sync(updated_since=limite.isoformat())
+        self.assertEqual([item['id'] for item in dados['results']], [profissional.pk])
+
+    def test_parametros_invalidos(self):
+        response = self.client.get(reverse('core:profissional-sync'), {'updated_since': 'ontem'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('updated_since', response.data)
+        response = self.client.get(reverse('core:profissional-sync'), {'cursor': 'invalido'})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(SYNC_SAFETY_SECONDS=10)
+    def test_commit_atrasado_nao_fica_para_tras(self):
+        agora = timezone.now()
+        Profissional.objects.update(atualizado_em=agora - timedelta(minutes=5))
+        recente = self.profissionais[0]
+        Profissional.objects.filter(pk=recente.pk).update(atualizado_em=agora - timedelta(seconds=2))
+        with mock.patch('core.sync.timezone.now', return_value=agora):
+            ids, cursor = self.sincronizar_tudo()
+        # Dentro da janela: ainda não entregue
+        self.assertNotIn(recente.pk, ids)
+        self.assertEqual(len(ids), 24)
+
+        # Transação que começou antes da leitura e só confirmou depois
+        atrasado = self.profissionais[1]
+        Profissional.objects.filter(pk=atrasado.pk).update(atualizado_em=agora - timedelta(seconds=5))
+        with mock.patch('core.sync.timezone.now', return_value=agora + timedelta(seconds=20)):
+            dados = self.sync(cursor=cursor)
+        self.assertEqual([item['id'] for item in dados['results']], [atrasado.pk, recente.pk])
@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core import signing
+from rest_framework import exceptions
+
+
+SALT = 'core.tokens'
+
+
+def tokens_assinados():
+    return getattr(settings, 'AUTH_SIGNED_TOKENS', True)
+
+
+def eh_token_assinado(chave):
+    """
+    Tokens do DRF são 40 dígitos hexadecimais; os assinados têm ':'
+    """
+    return ':' in chave
+
+
+def emitir_token(user):
+    """
+    Token assinado (HMAC com a SECRET_KEY) com o id do usuário, a versão
+    atual dos seus tokens e a expiração; a emissão fica no timestamp do
+    próprio TimestampSigner
+    """
+    ttl = getattr(settings, 'AUTH_SIGNED_TOKEN_TTL', 7 * 24 * 3600)
+    return signing.dumps(
+        {'u': user.pk, 'v': user.versao_token, 'e': int(time.time()) + ttl},
+        salt=SALT, compress=False,
+    )
+
+
+def verificar_token(chave):
+    """
+    Valida assinatura e expiração sem consultar o banco; devolve
+    (id do usuário, versão)
+    """
+    try:
+        dados = signing.loads(chave, salt=SALT)
+        user_id, versao, expira = dados['u'], dados['v'], dados['e']
+    except (signing.BadSignature, KeyError, TypeError):
+        raise exceptions.AuthenticationFailed('Token inválido.')
+    if expira < time.time():
+        raise exceptions.AuthenticationFailed('Token expirado.')
+    return user_id, versao
+
@@ -1,13 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
-from . import views
+from . import async_views, views
 
 # Configuração do router para ViewSets
 router = DefaultRouter()
 router.register(r'usuarios', views.UserViewSet)
 router.register(r'profissionais', views.ProfissionalViewSet)
 router.register(r'clientes', views.ClienteViewSet)
+router.register(r'agendamentos', views.AgendamentoViewSet)
 
 app_name = 'core'
 
@@ -28,6 +29,20 @@ urlpatterns = [
     # Estatísticas (apenas para administradores)
     path('stats/users/', views.user_stats, name='user_stats'),
     
+    # Métricas (Prometheus)
+    path('metrics/', views.metrics, name='metrics'),
+    
+    # Variantes assíncronas (ASGI) das rotas mais acessadas
+    path('async/auth/register/', async_views.register_user, name='async_register_user'),
+    path('async/auth/login/', async_views.login_user, name='async_login_user'),
+    path('async/auth/profile/', async_views.user_profile, name='async_user_profile'),
+    path('async/usuarios/', async_views.leitura_assincrona(views.UserViewSet, 'list'), name='async_user_list'),
+    path('async/usuarios/<int:pk>/', async_views.leitura_assincrona(views.UserViewSet, 'retrieve'), name='async_user_detail'),
+    path('async/profissionais/', async_views.leitura_assincrona(views.ProfissionalViewSet, 'list'), name='async_profissional_list'),
+    path('async/profissionais/<int:pk>/', async_views.leitura_assincrona(views.ProfissionalViewSet, 'retrieve'), name='async_profissional_detail'),
+    path('async/clientes/', async_views.leitura_assincrona(views.ClienteViewSet, 'list'), name='async_cliente_list'),
+    path('async/clientes/<int:pk>/', async_views.leitura_assincrona(views.ClienteViewSet, 'retrieve'), name='async_cliente_detail'),
+    
     # ViewSets
     path('', include(router.urls)),
 ] 
\ No newline at end of file
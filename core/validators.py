@@ -0,0 +1,30 @@
+import re
+
+
+def digitos_verificadores_cpf(base):
+    """
+    Calcula os dois dígitos verificadores para os 9 primeiros dígitos do CPF
+    """
+    digitos = [int(d) for d in base]
+    for tamanho in (9, 10):
+        soma = sum(d * peso for d, peso in zip(digitos, range(tamanho + 1, 1, -1)))
+        resto = soma * 10 % 11
+        digitos.append(0 if resto == 10 else resto)
+    return f'{digitos[9]}{digitos[10]}'
+
+
+def formatar_cpf(digitos):
+    return f'{digitos[:3]}.{digitos[3:6]}.{digitos[6:9]}-{digitos[9:]}'
+
+
+def normalizar_cpf(valor):
+    """
+    Retorna o CPF no formato 000.000.000-00 se for válido, ou None.
+    Aceita o valor com ou sem pontuação.
+    """
+    digitos = re.sub(r'[.\-\s]', '', valor or '')
+    if len(digitos) != 11 or not digitos.isdigit() or digitos == digitos[0] * 11:
+        return None
+    if digitos_verificadores_cpf(digitos[:9]) != digitos[9:]:
+        return None
+    return formatar_cpf(digitos)
@@ -1,16 +1,39 @@
+import hmac
+
 from django.shortcuts import render
-from rest_framework.decorators import api_view, permission_classes
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import Http404, HttpResponse
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework import status, viewsets, permissions
+from rest_framework import mixins, serializers, status, viewsets, permissions
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import login, logout
+from django.contrib.auth.signals import user_logged_in
 from .serializers import (
     HealthCheckSerializer, UserSerializer, UserCreateSerializer, UserUpdateSerializer,
     ProfissionalSerializer, ProfissionalCreateSerializer,
-    ClienteSerializer, ClienteCreateSerializer, LoginSerializer
+    ClienteSerializer, ClienteCreateSerializer, LoginSerializer,
+    AgendamentoSerializer, HorarioOcupadoSerializer, RemarcacaoSerializer
 )
-from .models import User, Profissional, Cliente
+from .agendamentos import ConflitoAgenda, agenda, cancelar, janela_da_agenda, remarcar
+from .authentication import revogar_tokens
+from .bulk import BulkRegistration
+from .conditional import ConditionalGetMixin, aplicar_validadores, gerar_etag, nao_modificado
+from .directory_cache import CachedResponseMixin
+from .disponibilidade import filtrar_disponiveis, intervalo_da_consulta
+from .exporters import FORMATOS, exportar
+from .fast_serializers import FastListMixin
+from .metrics import registro
+from .routers import ReplicaReadMixin, leitura_no_primario, leitura_replica, marcar_escrita
+from .sparse_fields import SparseFieldsMixin
+from .models import User, Profissional, Cliente, Agendamento
+from .search import buscar_profissionais
+from .stats import ler_estatisticas
+from .sync import DeltaSyncMixin
+from .tokens import emitir_token, tokens_assinados
 
 
 # Create your views here.
@@ -25,6 +48,54 @@ def health_check(request):
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+def coletor_autorizado(request):
+    """
+    Coletor com `Authorization: Bearer <METRICS_TOKEN>` ou IP listado em
+    METRICS_ALLOWED_IPS
+    """
+    segredo = getattr(settings, 'METRICS_TOKEN', None)
+    if segredo:
+        partes = request.META.get('HTTP_AUTHORIZATION', '').split()
+        if len(partes) == 2 and partes[0].lower() == 'bearer' and hmac.compare_digest(
+            partes[1].encode(), segredo.encode()
+        ):
+            return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', [])
+
+
+def metrics(request):
+    """
+    Métricas no formato de texto do Prometheus. Acesso para administradores
+    ou para o coletor (METRICS_TOKEN)
+    """
+    if not (request.user.is_staff or coletor_autorizado(request)):
+        return HttpResponse('Acesso negado', status=403, content_type='text/plain; charset=utf-8')
+    return HttpResponse(registro.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def token_de_acesso(user):
+    """
+    Token assinado (core.tokens) ou, com AUTH_SIGNED_TOKENS = False, o token do DRF
+    """
+    if tokens_assinados():
+        return emitir_token(user)
+    token, created = Token.objects.get_or_create(user=user)
+    return token.key
+
+
+def registrar(serializer, **kwargs):
+    """
+    Cria o usuário e o seu token em uma única transação; username/cpf
+    duplicados chegam como ValidationError da constraint do banco
+    """
+    with transaction.atomic():
+        user = serializer.save(**kwargs)
+        # Usuário novo: INSERT direto, sem o SELECT do get_or_create
+        token = emitir_token(user) if tokens_assinados() else Token.objects.create(user=user).key
+    marcar_escrita(user)
+    return user, token
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register_user(request):
@@ -33,11 +104,10 @@ def register_user(request):
     """
     serializer = UserCreateSerializer(data=request.data)
     if serializer.is_valid():
-        user = serializer.save()
-        token, created = Token.objects.get_or_create(user=user)
+        user, token = registrar(serializer)
         return Response({
             'user': UserSerializer(user).data,
-            'token': token.key
+            'token': token
         }, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -51,11 +121,15 @@ def login_user(request):
     serializer = LoginSerializer(data=request.data)
     if serializer.is_valid():
         user = serializer.validated_data['user']
-        login(request, user)
-        token, created = Token.objects.get_or_create(user=user)
+        if getattr(settings, 'AUTH_TOKEN_ONLY', True):
+            # Sem sessão: o cliente se identifica só pelo token. O sinal
+            # mantém o last_login atualizado, como o login()
+            user_logged_in.send(sender=user.__class__, request=request, user=user)
+        else:
+            login(request, user)
         return Response({
             'user': UserSerializer(user).data,
-            'token': token.key
+            'token': token_de_acesso(user)
         }, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -66,6 +140,7 @@ def logout_user(request):
     """
     Logout de usuários
     """
+    revogar_tokens(request.user)
     logout(request)
     return Response({'message': 'Logout realizado com sucesso'}, status=status.HTTP_200_OK)
 
@@ -76,8 +151,13 @@ def user_profile(request):
     """
     Perfil do usuário logado
     """
+    ultima = request.user.atualizado_em
+    etag = gerar_etag(request, ultima)
+    response = nao_modificado(request, etag, ultima)
+    if response is not None:
+        return response
     serializer = UserSerializer(request.user)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return aplicar_validadores(Response(serializer.data, status=status.HTTP_200_OK), etag, ultima)
 
 
 @api_view(['PUT'])
@@ -86,18 +166,68 @@ def update_user_profile(request):
     """
     Atualização do perfil do usuário logado
     """
-    serializer = UserUpdateSerializer(request.user, data=request.data, partial=True)
+    # request.user pode ter saído do cache de autenticação: gravá-lo
+    # restauraria senha, is_active e versao_token antigos
+    with leitura_no_primario():
+        usuario = User.objects.get(pk=request.user.pk)
+    serializer = UserUpdateSerializer(usuario, data=request.data, partial=True)
     if serializer.is_valid():
         serializer.save()
-        return Response(UserSerializer(request.user).data, status=status.HTTP_200_OK)
+        return Response(UserSerializer(usuario).data, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+def bulk_register(request, serializer_class):
+    """
+    Executa um cadastro em lote e monta a resposta com o resultado de cada item
+    """
+    itens = request.data
+    if not isinstance(itens, list):
+        return Response(
+            {'error': 'Envie uma lista de cadastros.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    limite = getattr(settings, 'BULK_REGISTER_MAX_ITEMS', 5000)
+    if len(itens) > limite:
+        return Response(
+            {'error': f'Máximo de {limite} cadastros por requisição.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    resultados = BulkRegistration(serializer_class).run(itens)
+    criados = sum(1 for resultado in resultados if resultado['status'] == 'criado')
+    if criados == len(resultados):
+        codigo = status.HTTP_201_CREATED
+    elif criados:
+        codigo = status.HTTP_207_MULTI_STATUS
+    else:
+        codigo = status.HTTP_400_BAD_REQUEST
+    return Response({
+        'criados': criados,
+        'erros': len(resultados) - criados,
+        'resultados': resultados,
+    }, status=codigo)
+
+
+def export_directory(viewset, request, nome_arquivo):
+    """
+    Exporta o queryset filtrado da ViewSet em CSV ou NDJSON (streaming)
+    """
+    formato = request.query_params.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return Response(
+            {'error': f'Formato inválido. Use: {", ".join(FORMATOS)}.'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    queryset = viewset.filter_queryset(viewset.get_queryset())
+    return exportar(queryset, formato, nome_arquivo)
+
+
+class UserViewSet(ReplicaReadMixin, ConditionalGetMixin, SparseFieldsMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciamento de usuários (apenas para administradores)
     """
-    queryset = User.objects.all()
+    queryset = User.objects.order_by('nome', 'sobrenome', 'id')
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAdminUser]
     
@@ -109,53 +239,207 @@ class UserViewSet(viewsets.ModelViewSet):
         return UserSerializer
 
 
-class ProfissionalViewSet(viewsets.ModelViewSet):
+class ProfissionalViewSet(ReplicaReadMixin, DeltaSyncMixin, CachedResponseMixin, ConditionalGetMixin, SparseFieldsMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciamento de profissionais
     """
     queryset = Profissional.objects.all()
     serializer_class = ProfissionalSerializer
     permission_classes = [permissions.IsAuthenticated]
+    validator_fields = ('atualizado_em', 'usuario__atualizado_em')
+    cache_resource = 'profissionais'
+    sync_resource = 'profissionais'
+    replica_actions = ('list', 'retrieve', 'disponiveis', 'agenda')
     
     def get_serializer_class(self):
         if self.action == 'create':
             return ProfissionalCreateSerializer
         return ProfissionalSerializer
     
+    def get_sync_queryset(self):
+        return Profissional.objects.select_related('usuario')
+    
     def get_queryset(self):
         """
-        Filtra profissionais ativos por padrão
+        Filtra profissionais ativos por padrão, com busca textual via `?q=`
         """
-        queryset = Profissional.objects.filter(ativo=True)
+        queryset = (
+            Profissional.objects.filter(ativo=True)
+            .select_related('usuario')
+            .order_by('usuario__nome', 'usuario__sobrenome', 'id')
+        )
         especialidade = self.request.query_params.get('especialidade', None)
         if especialidade:
             queryset = queryset.filter(especialidade__icontains=especialidade)
+        termo = self.request.query_params.get('q', None)
+        if termo:
+            queryset = buscar_profissionais(queryset, termo)
         return queryset
+    
+    @action(detail=False, methods=['get'])
+    def disponiveis(self, request):
+        """
+        Profissionais que atendem durante todo o intervalo `?inicio=&fim=`
+        (ISO 8601, até 24 horas), com os mesmos filtros da listagem
+        """
+        inicio, fim = intervalo_da_consulta(request.query_params)
+        queryset = filtrar_disponiveis(self.filter_queryset(self.get_queryset()), inicio, fim)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def agenda(self, request, pk=None):
+        """
+        Agenda do profissional no dia ou na semana de `?data=`
+        (`?periodo=dia|semana`), em uma consulta. Terceiros veem só os
+        horários ocupados
+        """
+        if not pk.isdigit():
+            raise Http404
+        inicio, fim = janela_da_agenda(request.query_params)
+        agendamentos = agenda(pk, inicio, fim).annotate(
+            usuario_profissional=F('profissional__usuario_id'), usuario_cliente=F('cliente__usuario_id'),
+        )
+        campo = serializers.DateTimeField()
+        return Response({
+            'inicio': campo.to_representation(inicio),
+            'fim': campo.to_representation(fim),
+            'agendamentos': [
+                AgendamentoSerializer(agendamento).data
+                if request.user.is_staff
+                or request.user.pk in (agendamento.usuario_profissional, agendamento.usuario_cliente)
+                else HorarioOcupadoSerializer(agendamento).data
+                for agendamento in agendamentos
+            ],
+        })
+    
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk(self, request):
+        """
+        Cadastro em lote de profissionais
+        """
+        return bulk_register(request, ProfissionalCreateSerializer)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """
+        Exportação de profissionais em CSV ou NDJSON (`?formato=`)
+        """
+        return export_directory(self, request, 'profissionais')
 
 
-class ClienteViewSet(viewsets.ModelViewSet):
+class ClienteViewSet(ReplicaReadMixin, DeltaSyncMixin, ConditionalGetMixin, SparseFieldsMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciamento de clientes
     """
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    validator_fields = ('atualizado_em', 'usuario__atualizado_em')
+    sync_resource = 'clientes'
     
     def get_serializer_class(self):
         if self.action == 'create':
             return ClienteCreateSerializer
         return ClienteSerializer
     
+    def get_sync_queryset(self):
+        return Cliente.objects.select_related('usuario')
+    
     def get_queryset(self):
         """
         Filtra clientes ativos por padrão
         """
-        queryset = Cliente.objects.filter(ativo=True)
+        queryset = (
+            Cliente.objects.filter(ativo=True)
+            .select_related('usuario')
+            .order_by('usuario__nome', 'usuario__sobrenome', 'id')
+        )
         return queryset
+    
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk(self, request):
+        """
+        Cadastro em lote de clientes
+        """
+        return bulk_register(request, ClienteCreateSerializer)
+    
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """
+        Exportação de clientes em CSV ou NDJSON (`?formato=`)
+        """
+        return export_directory(self, request, 'clientes')
+
+
+def conflito_agenda(exc):
+    return Response({'error': str(exc)}, status=status.HTTP_409_CONFLICT)
+
+
+class AgendamentoViewSet(ReplicaReadMixin, mixins.CreateModelMixin, mixins.ListModelMixin,
+                         mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    ViewSet para agendamentos: criação, cancelamento e remarcação. A
+    sobreposição na agenda do profissional é recusada pelo banco (409)
+    """
+    queryset = Agendamento.objects.all()
+    serializer_class = AgendamentoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        """
+        Agendamentos dos quais o usuário participa (todos, para
+        administradores), com filtro opcional `?status=`
+        """
+        queryset = Agendamento.objects.order_by('inicio', 'id')
+        user = self.request.user
+        if not user.is_staff:
+            queryset = queryset.filter(Q(profissional__usuario=user) | Q(cliente__usuario=user))
+        situacao = self.request.query_params.get('status', None)
+        if situacao:
+            queryset = queryset.filter(status=situacao)
+        return queryset
+    
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except ConflitoAgenda as exc:
+            return conflito_agenda(exc)
+    
+    @action(detail=True, methods=['post'])
+    def cancelar(self, request, pk=None):
+        """
+        Cancela o agendamento, liberando o horário
+        """
+        agendamento = self.get_object()
+        if agendamento.status == 'cancelado':
+            return Response({'error': 'Agendamento já cancelado.'}, status=status.HTTP_400_BAD_REQUEST)
+        cancelar(agendamento)
+        return Response(self.get_serializer(agendamento).data)
+    
+    @action(detail=True, methods=['post'])
+    def remarcar(self, request, pk=None):
+        """
+        Move o agendamento para `inicio`/`fim`
+        """
+        agendamento = self.get_object()
+        if agendamento.status == 'cancelado':
+            return Response(
+                {'error': 'Agendamento cancelado não pode ser remarcado.'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = RemarcacaoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            remarcar(agendamento, **serializer.validated_data)
+        except ConflitoAgenda as exc:
+            return conflito_agenda(exc)
+        return Response(self.get_serializer(agendamento).data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@leitura_replica
 def user_stats(request):
     """
     Estatísticas de usuários (apenas para administradores)
@@ -166,14 +450,4 @@ def user_stats(request):
             status=status.HTTP_403_FORBIDDEN
         )
     
-    total_users = User.objects.count()
-    total_profissionais = Profissional.objects.filter(ativo=True).count()
-    total_clientes = Cliente.objects.filter(ativo=True).count()
-    
-    return Response({
-        'total_usuarios': total_users,
-        'total_profissionais': total_profissionais,
-        'total_clientes': total_clientes,
-        'usuarios_ativos': User.objects.filter(is_active=True).count(),
-        'usuarios_inativos': User.objects.filter(is_active=False).count(),
-    }, status=status.HTTP_200_OK)
+    return Response(ler_estatisticas(), status=status.HTTP_200_OK)
@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Em produção, defina DJANGO_SETTINGS_MODULE=fisio_connect_core.settings_prod
+(pool de conexões com o PostgreSQL por processo do uvicorn).
 """
 
 import os
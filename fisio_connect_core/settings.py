@@ -38,15 +38,19 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'rest_framework.authtoken',
     'core',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaStickinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -79,9 +83,26 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Réplica de leitura: localmente, o próprio arquivo do primário (ver
+    # settings_replica para duas bases); nos testes, uma base própria que os
+    # testes preenchem copiando o primário, para simular o atraso da
+    # replicação. Só recebe leituras se listada em DATABASE_REPLICAS
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    },
 }
 
+# Leituras das views somente leitura vão para uma das réplicas; escritas e
+# as leituras de quem escreveu nos últimos REPLICA_STICKY_SECONDS segundos
+# ficam no primário. A marcação usa o cache REPLICA_STICKY_CACHE_ALIAS,
+# que precisa ser compartilhado entre os processos
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_STICKY_SECONDS = 10
+REPLICA_STICKY_CACHE_ALIAS = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -113,6 +134,9 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Fuso dos horários semanais de atendimento (core.disponibilidade)
+AGENDA_TIME_ZONE = 'America/Sao_Paulo'
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
@@ -127,15 +151,124 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'core.User'
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    # Resolução token→usuário: LRU limitado com TTL. Com vários workers,
+    # use um cache compartilhado para que a invalidação alcance todos
+    'auth_tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auth-tokens',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Respostas do diretório de profissionais. Para compartilhar entre
+    # processos, troque por FileBasedCache ou um cache externo, ex.:
+    # 'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    # 'LOCATION': 'redis://127.0.0.1:6379/1',
+    'directory': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'directory',
+        'TIMEOUT': 600,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
+AUTH_TOKEN_CACHE_ALIAS = 'auth_tokens'
+
+# Login e cadastro emitem tokens assinados (HMAC), verificados sem consulta
+# ao banco, que expiram em AUTH_SIGNED_TOKEN_TTL segundos e são revogados
+# no logout e na troca de senha. Tokens do DRF já emitidos continuam válidos
+AUTH_SIGNED_TOKENS = True
+AUTH_SIGNED_TOKEN_TTL = 7 * 24 * 3600
+
+# Cache do diretório (None desativa) e espera máxima, em segundos, pela
+# requisição que está recalculando uma entrada
+DIRECTORY_CACHE_ALIAS = 'directory'
+DIRECTORY_CACHE_LOCK_WAIT = 2
+
+# Login da API só por token, sem criar sessão no banco. As sessões ficam
+# para o admin e a API navegável; para que também não escrevam no banco,
+# use 'django.contrib.sessions.backends.signed_cookies' ou
+# 'django.contrib.sessions.backends.cache' (com cache compartilhado)
+AUTH_TOKEN_ONLY = True
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# `manage.py limpar_autenticacao` remove tokens de usuários inativos e,
+# se definido, tokens sem login há mais de N dias
+AUTH_TOKEN_STALE_DAYS = None
+
+# Sincronização incremental (`/sync/`): alterações só são entregues depois
+# de SYNC_SAFETY_SECONDS segundos, prazo maior que a transação de escrita
+# mais longa, para que um commit atrasado não fique para trás do cursor
+SYNC_SAFETY_SECONDS = 10
+
+# Cadastro em lote
+BULK_REGISTER_MAX_ITEMS = 5000
+BULK_REGISTER_CHUNK_SIZE = 500
+
+# Processos para hashing de senhas em paralelo (None = número de CPUs, 0 = sem pool)
+PASSWORD_HASHING_WORKERS = None
+
+# Compressão gzip/brotli de respostas grandes (desativada por padrão)
+RESPONSE_COMPRESSION = False
+RESPONSE_COMPRESSION_MIN_SIZE = 1024
+
+# Instrumentação por requisição (Server-Timing e log JSON em core.requests)
+REQUEST_TIMING = True
+REQUEST_TIMING_HEADER = True
+REQUEST_TIMING_SLOW_MS = 500
+REQUEST_TIMING_TOP_QUERIES = 3
+REQUEST_TIMING_MAX_QUERIES = 200
+
+# Métricas Prometheus em /api/metrics/. Com vários workers (gunicorn,
+# uvicorn), aponte METRICS_DIR para um diretório comum, limpo a cada deploy.
+# Acesso para administradores ou coletores com `Authorization: Bearer
+# <METRICS_TOKEN>`. METRICS_ALLOWED_IPS compara o REMOTE_ADDR: atrás de um
+# proxy reverso ele é o do proxy, e liberar esse IP libera todos
+METRICS_ENABLED = True
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = None
+METRICS_ALLOWED_IPS = []
+
+# Requisições lentas são registradas como WARNING; use INFO em
+# core.requests para registrar todas
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 # Django REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'core.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.DirectoryPagination',
     'PAGE_SIZE': 20,
 }
@@ -0,0 +1,114 @@
+"""
+Django settings for fisio_connect_core project - Production with PostgreSQL.
+
+Use com DJANGO_SETTINGS_MODULE=fisio_connect_core.settings_prod, tanto no
+wsgi.py (gunicorn) quanto no asgi.py (uvicorn/daphne). Os valores vêm de
+variáveis de ambiente (ver env.example).
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *
+
+
+def _env_bool(nome, padrao):
+    return os.environ.get(nome, str(padrao)).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _env_int(nome, padrao):
+    return int(os.environ.get(nome, padrao))
+
+
+def _env_float(nome, padrao):
+    return float(os.environ.get(nome, padrao))
+
+
+SECRET_KEY = os.environ['SECRET_KEY']
+DEBUG = _env_bool('DEBUG', False)
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+# Database
+# https://docs.djangoproject.com/en/5.1/ref/databases/#connection-management
+#
+# Com DB_POOL (padrão), cada processo mantém um pool psycopg 3 de
+# DB_POOL_MIN_SIZE a DB_POOL_MAX_SIZE conexões, compartilhado pelas threads
+# do worker. O pool funciona igual sob WSGI e ASGI; dimensione
+# DB_POOL_MAX_SIZE >= threads por worker e workers * DB_POOL_MAX_SIZE abaixo
+# do max_connections do PostgreSQL. Requisições que esperam mais que
+# DB_POOL_TIMEOUT segundos por uma conexão falham.
+#
+# Sem pool (DB_POOL=False, ex.: atrás de um PgBouncer), as conexões são
+# persistentes por DB_CONN_MAX_AGE segundos. Em ambos os casos a conexão é
+# verificada antes de ser reutilizada, descartando as que o servidor fechou.
+DB_POOL = _env_bool('DB_POOL', True)
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'fisio_connect'),
+        'USER': os.environ.get('DB_USER', 'fisio_user'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': _env_int('DB_CONNECT_TIMEOUT', 5),
+        },
+    }
+}
+
+if DB_POOL:
+    from psycopg_pool import ConnectionPool
+
+    # O pool não aceita conexões persistentes (CONN_MAX_AGE deve ser 0)
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': _env_int('DB_POOL_MIN_SIZE', 2),
+        'max_size': _env_int('DB_POOL_MAX_SIZE', 10),
+        'timeout': _env_float('DB_POOL_TIMEOUT', 10),
+        'max_lifetime': _env_float('DB_POOL_MAX_LIFETIME', 1800),
+        'max_idle': _env_float('DB_POOL_MAX_IDLE', 300),
+        # Testa a conexão ao retirá-la do pool
+        'check': ConnectionPool.check_connection,
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = _env_int('DB_CONN_MAX_AGE', 60)
+
+# Réplicas de leitura (ex.: DB_REPLICA_HOSTS=replica1,replica2), com as
+# mesmas credenciais e um pool próprio cada
+DATABASE_REPLICAS = []
+for indice, host in enumerate(h.strip() for h in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if h.strip()):
+    alias = f'replica_{indice + 1}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host, 'OPTIONS': dict(DATABASES['default']['OPTIONS'])}
+    DATABASE_REPLICAS.append(alias)
+
+# Cache compartilhado entre os workers. Obrigatório: com caches locais, a
+# invalidação de um worker (troca de senha, logout, alteração de um
+# profissional) não alcança os outros, que seguiriam aceitando tokens
+# revogados e servindo o diretório antigo até o TIMEOUT
+if not os.environ.get('REDIS_URL'):
+    raise ImproperlyConfigured('Defina REDIS_URL: os caches precisam ser compartilhados entre os workers.')
+
+CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+        'KEY_PREFIX': alias,
+        'TIMEOUT': config.get('TIMEOUT', 300),
+    }
+    for alias, config in CACHES.items()
+}
+
+# Sessões do admin fora do banco, no cache compartilhado
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE') or 'django.contrib.sessions.backends.cache'
+AUTH_TOKEN_STALE_DAYS = _env_int('AUTH_TOKEN_STALE_DAYS', 90)
+
+# Métricas somadas entre os workers; o coletor se autentica com METRICS_TOKEN
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
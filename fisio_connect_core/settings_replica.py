@@ -0,0 +1,19 @@
+"""
+Django settings for fisio_connect_core project - Primary/replica with two SQLite databases.
+
+Sem replicação de verdade, a réplica é uma cópia do primário feita à mão,
+o que permite observar o roteamento e a leitura das próprias escritas:
+
+    python manage.py migrate --settings=fisio_connect_core.settings_replica
+    cp db.sqlite3 db_replica.sqlite3
+    python manage.py runserver --settings=fisio_connect_core.settings_replica
+"""
+
+from .settings import *
+
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'db_replica.sqlite3',
+}
+
+DATABASE_REPLICAS = ['replica']
@@ -5,6 +5,9 @@ It exposes the WSGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
+
+Em produção, defina DJANGO_SETTINGS_MODULE=fisio_connect_core.settings_prod
+(pool de conexões com o PostgreSQL por processo do gunicorn).
 """
 
 import os